@@ -0,0 +1,318 @@
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from commute_loader import (DATA_FILE, DAYS, DEFAULT_CHUNK_SIZE, DIRECTIONS, NUMERIC_COLUMNS, iter_range_chunks,
+                            last_complete_line_end)
+
+# Persistent per-group statistics for analysis.py. commute_data.csv only grows
+# by appended rows, so the cache remembers the byte offset it has read up to and
+# only parses what was appended since. Summaries are built from the stored
+# moments and quantile sketches without touching the CSV.
+
+CACHE_FILE = '../commute_aggregates.json'
+CACHE_VERSION = 2
+
+GROUPINGS = ['trip_direction', 'traffic_condition', 'day_of_week']
+GROUP_COLUMNS = ['trip_duration', 'fuel_efficiency_l_per_100km', 'co2_emissions_kg']
+OVERALL = '__all__'
+
+GROUP_ORDER = {
+    'trip_direction': DIRECTIONS,
+    'traffic_condition': [0, 1, 2],
+    'day_of_week': DAYS,
+}
+
+SUMMARY_STATS = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with log-spaced buckets (relative error <= alpha).
+
+    Bucket i holds values in (gamma^(i-1), gamma^i]; negative values use a
+    mirrored set of buckets and zeros are counted separately. Two sketches
+    merge by adding bucket counts, so the result doesn't depend on the order
+    rows arrived in.
+    """
+
+    def __init__(self, alpha=0.01):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+
+    @property
+    def count(self):
+        return self.zeros + sum(self.positive.values()) + sum(self.negative.values())
+
+    def _add_to(self, buckets, values):
+        keys = np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+        unique, counts = np.unique(keys, return_counts=True)
+        for key, count in zip(unique.tolist(), counts.tolist()):
+            buckets[key] = buckets.get(key, 0) + count
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self._add_to(self.positive, values[values > 0])
+        self._add_to(self.negative, -values[values < 0])
+        self.zeros += int(np.count_nonzero(values == 0))
+
+    def merge(self, other):
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+        self.zeros += other.zeros
+        return self
+
+    def ordered_keys(self, values):
+        """
+        Bucket of each value as an int64 that sorts the way the values do:
+        negatives below zero below positives (NaN is treated as zero)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        magnitude = np.abs(values)
+        nonzero = magnitude > 0
+        keys = np.zeros(len(values), dtype=np.int64)
+        # Keys of positive magnitudes are far below 2**32, so the offset keeps the three ranges apart
+        offset = np.ceil(np.log(magnitude[nonzero]) / self._log_gamma).astype(np.int64) + (1 << 32)
+        keys[nonzero] = np.where(values[nonzero] > 0, offset, -offset)
+        return keys
+
+    def ordered_values(self, keys):
+        """Representative value of each ordered_keys bucket (inverse of ordered_keys up to alpha)"""
+        keys = np.asarray(keys, dtype=np.int64)
+        magnitude = np.abs(keys)
+        values = np.zeros(len(keys))
+        nonzero = magnitude > 0
+        values[nonzero] = np.sign(keys[nonzero]) * self._bucket_value(magnitude[nonzero] - (1 << 32))
+        return values
+
+    def _bucket_value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        total = self.count
+        if total == 0:
+            return float('nan')
+        rank = q * (total - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._bucket_value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._bucket_value(key)
+        return self._bucket_value(max(self.positive))
+
+    def to_dict(self):
+        return {
+            'alpha': self.alpha,
+            'positive': {str(k): v for k, v in self.positive.items()},
+            'negative': {str(k): v for k, v in self.negative.items()},
+            'zeros': self.zeros,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['alpha'])
+        sketch.positive = {int(k): v for k, v in data['positive'].items()}
+        sketch.negative = {int(k): v for k, v in data['negative'].items()}
+        sketch.zeros = data['zeros']
+        return sketch
+
+
+class ColumnStats:
+    """count / sum / sum of squares / min / max plus a quantile sketch"""
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch()
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.sum_sq += float(np.dot(values, values))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.sketch.update(values)
+
+    def merge(self, other):
+        self.count += other.count
+        self.sum += other.sum
+        self.sum_sq += other.sum_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def describe(self):
+        """Same fields as pandas describe(); quantiles come from the sketch"""
+        n = self.count
+        if n == 0:
+            return dict.fromkeys(SUMMARY_STATS, float('nan')) | {'count': 0}
+        mean = self.sum / n
+        var = (self.sum_sq - n * mean * mean) / (n - 1) if n > 1 else float('nan')
+        # The sketch's bucket midpoints can land just past the exact extremes
+        quantiles = [min(max(self.sketch.quantile(q), self.min), self.max) for q in (0.25, 0.50, 0.75)]
+        return {
+            'count': n,
+            'mean': mean,
+            'std': math.sqrt(max(var, 0.0)) if n > 1 else float('nan'),
+            'min': self.min,
+            '25%': quantiles[0],
+            '50%': quantiles[1],
+            '75%': quantiles[2],
+            'max': self.max,
+        }
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'sum_sq': self.sum_sq,
+                'min': self.min, 'max': self.max, 'sketch': self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count = data['count']
+        stats.sum = data['sum']
+        stats.sum_sq = data['sum_sq']
+        stats.min = data['min']
+        stats.max = data['max']
+        stats.sketch = QuantileSketch.from_dict(data['sketch'])
+        return stats
+
+
+class AggregateCache:
+    """Per-group statistics of commute_data.csv, updated from appended rows only"""
+
+    def __init__(self, csv_path=DATA_FILE, cache_path=CACHE_FILE):
+        self.csv_path = csv_path
+        self.cache_path = cache_path
+        self._reset()
+        if os.path.exists(cache_path):
+            self._load()
+
+    def _reset(self):
+        self.offset = 0
+        self.header = None
+        self.n_rows = 0
+        self.stats = {}
+
+    def _load(self):
+        with open(self.cache_path) as f:
+            data = json.load(f)
+        if data.get('version') != CACHE_VERSION:
+            return
+        self.offset = data['offset']
+        self.header = data['header']
+        self.n_rows = data['n_rows']
+        self.stats = {
+            grouping: {
+                group: {column: ColumnStats.from_dict(values) for column, values in columns.items()}
+                for group, columns in groups.items()
+            }
+            for grouping, groups in data['stats'].items()
+        }
+
+    def save(self):
+        data = {
+            'version': CACHE_VERSION,
+            'csv_path': self.csv_path,
+            'offset': self.offset,
+            'header': self.header,
+            'n_rows': self.n_rows,
+            'stats': {
+                grouping: {
+                    group: {column: stats.to_dict() for column, stats in columns.items()}
+                    for group, columns in groups.items()
+                }
+                for grouping, groups in self.stats.items()
+            },
+        }
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _column_stats(self, grouping, group, column):
+        groups = self.stats.setdefault(grouping, {})
+        columns = groups.setdefault(str(group), {})
+        if column not in columns:
+            columns[column] = ColumnStats()
+        return columns[column]
+
+    def _add_chunk(self, chunk):
+        for column in NUMERIC_COLUMNS:
+            self._column_stats(OVERALL, OVERALL, column).update(chunk[column].to_numpy())
+        for grouping in GROUPINGS:
+            for group, rows in chunk.groupby(grouping, observed=True):
+                for column in GROUP_COLUMNS:
+                    self._column_stats(grouping, group, column).update(rows[column].to_numpy())
+        self.n_rows += len(chunk)
+
+    def update(self, chunksize=DEFAULT_CHUNK_SIZE, save=True):
+        """Fold rows appended since the last update into the cache; returns the row count added"""
+        size = os.path.getsize(self.csv_path)
+        with open(self.csv_path, 'rb') as f:
+            header = f.readline().decode().strip()
+            # A different header or a shorter file means the CSV was rewritten
+            if header != self.header or size < self.offset:
+                self._reset()
+                self.header = header
+                self.offset = f.tell()
+
+            end = last_complete_line_end(f, size)
+        if end <= self.offset:
+            return 0
+
+        before = self.n_rows
+        names = header.split(',')
+        usecols = [c for c in names if c in NUMERIC_COLUMNS or c in GROUPINGS]
+        for chunk in iter_range_chunks(self.csv_path, self.offset, end, names, chunksize=chunksize,
+                                       usecols=usecols, derived=False):
+            self._add_chunk(chunk)
+        self.offset = end
+
+        if save:
+            self.save()
+        return self.n_rows - before
+
+    def summary(self, grouping=OVERALL):
+        """describe()-style table for a grouping, or for all rows by default"""
+        if grouping == OVERALL:
+            columns = self.stats.get(OVERALL, {}).get(OVERALL, {})
+            return pd.DataFrame({column: stats.describe() for column, stats in columns.items()})
+
+        groups = self.stats.get(grouping, {})
+        order = [g for g in map(str, GROUP_ORDER.get(grouping, [])) if g in groups]
+        order += sorted(g for g in groups if g not in order)
+        rows = {}
+        for group in order:
+            row = {}
+            for column in GROUP_COLUMNS:
+                if column in groups[group]:
+                    for stat, value in groups[group][column].describe().items():
+                        row[(column, stat)] = value
+            rows[group] = row
+        table = pd.DataFrame.from_dict(rows, orient='index')
+        table.index.name = grouping
+        return table
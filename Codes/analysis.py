@@ -4,39 +4,30 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
 
-# Load data
-df = pd.read_csv('../commute_data.csv')
+from aggregate_cache import AggregateCache
 
-# Convert date to datetime
-df['date'] = pd.to_datetime(df['date'])
-# Extract time components
-df['departure_hour'] = pd.to_datetime(df['departure_time'], format='%H:%M').dt.hour
+# Group statistics come from a persistent cache that only reads rows appended
+# since the last run (quartiles are approximate, within 1% relative error)
+cache = AggregateCache()
+new_rows = cache.update()
+print(f"Aggregate cache: {cache.n_rows} trips ({new_rows} new since last run)\n")
 
 # Basic statistics
 print("Overall Statistics:")
-stats_summary = df[['trip_duration', 'distance_km', 'fuel_efficiency_l_per_100km', 
-                   'fuel_used_l', 'co2_emissions_kg']].describe()
+stats_summary = cache.summary()
 print(stats_summary)
 
 # Statistics by trip direction
 print("\nStatistics by Trip Direction:")
-direction_stats = df.groupby('trip_direction')[['trip_duration', 'fuel_efficiency_l_per_100km', 
-                                              'co2_emissions_kg']].describe()
+direction_stats = cache.summary('trip_direction')
 print(direction_stats)
 
 # Statistics by traffic condition
 print("\nStatistics by Traffic Condition:")
-traffic_stats = df.groupby('traffic_condition')[['trip_duration', 'fuel_efficiency_l_per_100km', 
-                                               'co2_emissions_kg']].describe()
+traffic_stats = cache.summary('traffic_condition')
 print(traffic_stats)
 
 # Statistics by day of week
 print("\nStatistics by Day of Week:")
-day_stats = df.groupby('day_of_week')[['trip_duration', 'fuel_efficiency_l_per_100km', 
-                                     'co2_emissions_kg']].describe()
+day_stats = cache.summary('day_of_week')
 print(day_stats)
-
-
-
-
-
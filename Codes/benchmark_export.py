@@ -0,0 +1,75 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from benchmark_inference import make_trips
+from carbon_model import BatchPredictor, build_model, load_checkpoint
+from model_export import export_model, load_exported
+
+# Float checkpoint (BatchPredictor) versus the exported TorchScript artifacts,
+# float32 and dynamic int8: single-trip latency, batch throughput, file size
+# and prediction error relative to the float model.
+
+MODEL_FILE = '../commute_carbon_pytorch_model.pt'
+LATENCY_CALLS = 5000
+BATCH_TRIPS = 2_000_000
+CHUNK_SIZE = 65536
+
+
+def latency_us(score, trip):
+    for _ in range(100):  # warm-up
+        score(trip)
+    start = time.perf_counter()
+    for _ in range(LATENCY_CALLS):
+        score(trip)
+    return (time.perf_counter() - start) / LATENCY_CALLS * 1e6
+
+
+def chunked(module, trips):
+    with torch.inference_mode():
+        return np.concatenate([
+            module(torch.from_numpy(trips[start:start + CHUNK_SIZE])).reshape(-1).numpy()
+            for start in range(0, len(trips), CHUNK_SIZE)
+        ])
+
+
+def main():
+    checkpoint = load_checkpoint(MODEL_FILE)
+    model = build_model(checkpoint)
+    mean, scale = checkpoint['scaler_mean'].numpy(), checkpoint['scaler_scale'].numpy()
+    trips = make_trips(BATCH_TRIPS)
+    one_trip = trips[:1]
+
+    predictor = BatchPredictor(model, mean, scale, chunk_size=CHUNK_SIZE)
+    reference = predictor.predict(trips)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        candidates = [('Float checkpoint', MODEL_FILE, predictor.predict, predictor.predict)]
+        for label, quantize in [('TorchScript fp32', False), ('TorchScript int8', True)]:
+            path = export_model(model, mean, scale, os.path.join(tmp, f'{quantize}.pt'), quantize=quantize)
+            module, _ = load_exported(path)
+
+            def single(trip, module=module):
+                with torch.inference_mode():
+                    return module(torch.from_numpy(trip))
+
+            candidates.append((label, path, single, lambda data, module=module: chunked(module, data)))
+
+        print(f"{'Model':<18}{'Size':>10}{'Latency':>13}{'Throughput':>18}{'Max error':>13}{'Mean error':>13}")
+        for label, path, single, batch in candidates:
+            size_kib = os.path.getsize(path) / 1024
+            latency = latency_us(single, one_trip)
+            batch(trips[:1000])  # warm-up
+            start = time.perf_counter()
+            predictions = batch(trips)
+            rate = BATCH_TRIPS / (time.perf_counter() - start)
+            error = np.abs(predictions - reference)
+            print(f"{label:<18}{size_kib:>7.1f}KiB{latency:>10.1f} us{rate:>13,.0f} r/s"
+                  f"{error.max():>10.2e} kg{error.mean():>10.2e} kg")
+
+
+if __name__ == '__main__':
+    main()
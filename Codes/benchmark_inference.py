@@ -0,0 +1,67 @@
+import time
+
+import numpy as np
+import torch
+
+from carbon_model import BatchPredictor, build_model, load_checkpoint
+
+# Compares the old one-trip-per-call predict_co2 path with BatchPredictor
+
+MODEL_FILE = '../commute_carbon_pytorch_model.pt'
+PER_ROW_TRIPS = 5000
+BATCH_TRIPS = 2_000_000
+
+
+def make_trips(n, seed=0):
+    # Random trips spanning the ranges seen in commute_data.csv
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(0, 3, n),
+        rng.uniform(25, 100, n),
+        rng.uniform(33, 42, n),
+        rng.uniform(3.0, 6.0, n),
+    ]).astype(np.float32)
+
+
+def per_row_predict(model, mean, scale, trip):
+    # Same work the original predict_co2 did for every trip
+    input_data = np.array([trip])
+    input_scaled = (input_data - mean) / scale
+    input_tensor = torch.tensor(input_scaled, dtype=torch.float32)
+    model.eval()
+    with torch.no_grad():
+        prediction = model(input_tensor)
+    return prediction.item()
+
+
+def main():
+    checkpoint = load_checkpoint(MODEL_FILE)
+    model = build_model(checkpoint)
+    mean, scale = checkpoint['scaler_mean'].numpy(), checkpoint['scaler_scale'].numpy()
+
+    trips = make_trips(BATCH_TRIPS)
+
+    start = time.perf_counter()
+    per_row = [per_row_predict(model, mean, scale, trip) for trip in trips[:PER_ROW_TRIPS]]
+    per_row_time = time.perf_counter() - start
+
+    predictor = BatchPredictor(model, mean, scale)
+    predictor.predict(trips[:1000])  # warm-up
+    start = time.perf_counter()
+    batched = predictor.predict(trips)
+    batch_time = time.perf_counter() - start
+
+    max_diff = np.max(np.abs(batched[:PER_ROW_TRIPS] - np.array(per_row)))
+    per_row_rate = PER_ROW_TRIPS / per_row_time
+    batch_rate = BATCH_TRIPS / batch_time
+
+    print(f"Per-row predict_co2: {PER_ROW_TRIPS:,} trips in {per_row_time:.2f}s "
+          f"({per_row_rate:,.0f} rows/sec)")
+    print(f"BatchPredictor:      {BATCH_TRIPS:,} trips in {batch_time:.2f}s "
+          f"({batch_rate:,.0f} rows/sec)")
+    print(f"Speed-up: {batch_rate / per_row_rate:.0f}x")
+    print(f"Max difference between paths: {max_diff:.2e} kg")
+
+
+if __name__ == '__main__':
+    main()
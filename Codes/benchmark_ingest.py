@@ -0,0 +1,90 @@
+import csv
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+from trip_ingest import FIELDNAMES, TripWriter
+
+# Several producer processes append trips to one CSV, first with the old
+# open-per-row pattern from collect_daily_data, then with TripWriter.
+
+PRODUCERS = 4
+TRIPS_PER_PRODUCER = 20000
+
+
+def make_record(producer, i):
+    return {
+        'date': '2025-04-01', 'departure_time': '08:15', 'trip_direction': 'Home to Campus',
+        'trip_duration': 45, 'distance_km': 39.5, 'fuel_efficiency_l_per_100km': 4.2,
+        'fuel_used_l': 1.659, 'traffic_condition': 1, 'day_of_week': 'Tuesday',
+        # Unique per producer and row (and within TripWriter's validation tolerance)
+        'co2_emissions_kg': 3.83229 + producer * 1e-3 + i * 1e-7,
+    }
+
+
+def legacy_producer(path, producer):
+    for i in range(TRIPS_PER_PRODUCER):
+        data = make_record(producer, i)
+        file_exists = os.path.isfile(path)
+        with open(path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=data.keys())
+            if not file_exists:
+                writer.writeheader()
+            writer.writerow(data)
+
+
+def batched_producer(path, producer, queue):
+    with TripWriter(path, batch_size=2000) as writer:
+        for i in range(TRIPS_PER_PRODUCER):
+            writer.add(make_record(producer, i))
+    queue.put(writer.stats())
+
+
+def check_file(path):
+    # Count headers and rows that don't have exactly the expected fields
+    headers = bad = rows = 0
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if row == FIELDNAMES:
+                headers += 1
+            elif len(row) != len(FIELDNAMES):
+                bad += 1
+            else:
+                rows += 1
+    return headers, rows, bad
+
+
+def run(target, path, with_queue=False):
+    queue = mp.Queue()
+    args = [(path, p, queue) if with_queue else (path, p) for p in range(PRODUCERS)]
+    processes = [mp.Process(target=target, args=a) for a in args]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    seconds = time.perf_counter() - start
+    stats = [queue.get() for _ in processes] if with_queue else []
+    return seconds, stats
+
+
+def main():
+    total = PRODUCERS * TRIPS_PER_PRODUCER
+    print(f"{PRODUCERS} producers x {TRIPS_PER_PRODUCER:,} trips")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, target, with_queue in [('open per row', legacy_producer, False),
+                                         ('TripWriter', batched_producer, True)]:
+            path = os.path.join(tmp, name.replace(' ', '_') + '.csv')
+            seconds, stats = run(target, path, with_queue)
+            headers, rows, bad = check_file(path)
+            print(f"  {name:<13} {seconds:6.2f}s  {total / seconds:10,.0f} rows/sec  "
+                  f"headers={headers} rows={rows} malformed={bad}")
+            for s in stats[:1]:
+                print(f"    flush latency p50 {s['flush_p50'] * 1000:.2f} ms, "
+                      f"p95 {s['flush_p95'] * 1000:.2f} ms, max {s['flush_max'] * 1000:.2f} ms "
+                      f"({s['flushes']} flushes per producer)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import time
+
+import numpy as np
+
+from benchmark_inference import make_trips
+from carbon_model import CarbonPredictor
+from prediction_table import PredictionTable
+
+# Network (CarbonPredictor) versus the interpolated lookup table: single-trip
+# latency, batch throughput and interpolation error.
+
+MODEL_FILE = '../commute_carbon_pytorch_model.pt'
+SINGLE_CALLS = 20000
+BATCH_TRIPS = 2_000_000
+
+
+def per_call_us(fn, trips):
+    start = time.perf_counter()
+    for trip in trips:
+        fn(*trip)
+    return (time.perf_counter() - start) / len(trips) * 1e6
+
+
+def main():
+    predictor = CarbonPredictor.load(MODEL_FILE)
+    start = time.perf_counter()
+    table = PredictionTable.build(predictor.predict)
+    build_time = time.perf_counter() - start
+
+    trips = make_trips(BATCH_TRIPS)
+    singles = trips[:SINGLE_CALLS].tolist()
+
+    network_us = per_call_us(predictor.predict_one, singles)
+    table_us = per_call_us(table.predict_one, singles)
+
+    start = time.perf_counter()
+    network = predictor.predict(trips)
+    network_rate = BATCH_TRIPS / (time.perf_counter() - start)
+    start = time.perf_counter()
+    interpolated = table.predict(trips)
+    table_rate = BATCH_TRIPS / (time.perf_counter() - start)
+
+    # Off-grid trips come back NaN from the table; score only the rest
+    error = np.abs(interpolated - network)
+    outside = int(np.isnan(error).sum())
+    print(f"Table: {table.values.size:,} points, built in {build_time:.2f}s")
+    print(f"Single trip: network {network_us:8.1f} us, table {table_us:8.1f} us")
+    print(f"Batch:       network {network_rate:12,.0f} rows/sec, table {table_rate:12,.0f} rows/sec")
+    print(f"Interpolation error: max {np.nanmax(error):.2e} kg, mean {np.nanmean(error):.2e} kg, "
+          f"{outside:,} trips outside the grid")
+
+
+if __name__ == '__main__':
+    main()
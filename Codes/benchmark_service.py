@@ -0,0 +1,97 @@
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# Local load generator for prediction_service.py. Starts the service in a
+# subprocess, then drives it with many concurrent keep-alive clients, once
+# with batching disabled (max batch 1) and once with micro-batching.
+
+CLIENTS = 64
+REQUESTS_PER_CLIENT = 100
+CONFIGS = [(1, 0.0), (256, 2.0)]  # (max_batch_size, max_wait_ms)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':')[1])
+    return json.loads(await reader.readexactly(length))
+
+
+async def client(port, seed, latencies):
+    rng = np.random.default_rng(seed)
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for _ in range(REQUESTS_PER_CLIENT):
+        trip = {'traffic_condition': int(rng.integers(0, 3)), 'trip_duration': float(rng.uniform(25, 100)),
+                'distance_km': float(rng.uniform(33, 42)), 'fuel_efficiency_l_per_100km': float(rng.uniform(3, 6))}
+        start = time.perf_counter()
+        await request(reader, writer, 'POST', '/predict', trip)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def wait_until_ready(port, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            await request(reader, writer, 'GET', '/health')
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Service did not start")
+
+
+async def run_load(port):
+    await wait_until_ready(port)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, seed, latencies) for seed in range(CLIENTS)))
+    seconds = time.perf_counter() - start
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    stats = await request(reader, writer, 'GET', '/stats')
+    writer.close()
+    return seconds, np.array(latencies) * 1000, stats
+
+
+def main():
+    total = CLIENTS * REQUESTS_PER_CLIENT
+    print(f"{CLIENTS} concurrent clients x {REQUESTS_PER_CLIENT} requests")
+    for max_batch, max_wait in CONFIGS:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, 'prediction_service.py', '--port', str(port),
+                                   '--max-batch-size', str(max_batch), '--max-wait-ms', str(max_wait)],
+                                  stdout=subprocess.DEVNULL)
+        try:
+            seconds, latencies, stats = asyncio.run(run_load(port))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"  max batch {max_batch:4d}, max wait {max_wait:.1f} ms: {total / seconds:8,.0f} req/sec, "
+              f"client p50 {np.percentile(latencies, 50):6.2f} ms, p99 {np.percentile(latencies, 99):6.2f} ms, "
+              f"mean batch {stats['mean_batch_size']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
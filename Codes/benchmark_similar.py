@@ -0,0 +1,69 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from similar_trips import SimilarTripIndex
+
+# Per-query cost of the boolean-mask scan predict_carbon_pytorch.py used for
+# "similar trips" versus SimilarTripIndex, on a few million synthetic trips.
+
+N_TRIPS = 3_000_000
+SCAN_QUERIES = 20
+INDEX_QUERIES = 20000
+
+
+def make_trips(n, seed=0):
+    rng = np.random.default_rng(seed)
+    traffic = rng.integers(0, 3, n)
+    distance = rng.uniform(33, 42, n)
+    efficiency = 3.6 + 0.4 * traffic + rng.normal(0, 0.4, n)
+    return pd.DataFrame({
+        'traffic_condition': traffic,
+        'trip_duration': 35 + 15 * traffic + rng.normal(0, 8, n),
+        'distance_km': distance,
+        'fuel_efficiency_l_per_100km': efficiency,
+        'co2_emissions_kg': distance * efficiency / 100 * 2.31,
+    })
+
+
+def scan_average(df, traffic, duration):
+    similar_trips = df[
+        (df['traffic_condition'] == traffic) &
+        (df['trip_duration'].between(duration * 0.8, duration * 1.2))
+    ]
+    return similar_trips['co2_emissions_kg'].mean()
+
+
+def main():
+    df = make_trips(N_TRIPS)
+    rng = np.random.default_rng(1)
+    queries = np.column_stack([rng.integers(0, 3, INDEX_QUERIES), rng.uniform(30, 80, INDEX_QUERIES),
+                               rng.uniform(33, 42, INDEX_QUERIES), rng.uniform(3, 6, INDEX_QUERIES)])
+
+    start = time.perf_counter()
+    index = SimilarTripIndex(df)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scanned = [scan_average(df, int(q[0]), q[1]) for q in queries[:SCAN_QUERIES]]
+    scan_ms = (time.perf_counter() - start) / SCAN_QUERIES * 1000
+
+    start = time.perf_counter()
+    indexed = [index.duration_window(int(q[0]), q[1])[0] for q in queries]
+    window_ms = (time.perf_counter() - start) / INDEX_QUERIES * 1000
+
+    start = time.perf_counter()
+    for q in queries:
+        index.nearest(int(q[0]), q[1], q[2], q[3], k=5)
+    knn_ms = (time.perf_counter() - start) / INDEX_QUERIES * 1000
+
+    assert np.allclose(scanned, indexed[:SCAN_QUERIES])
+    print(f"{N_TRIPS:,} trips, index built in {build_time:.2f}s")
+    print(f"  Boolean-mask scan average:  {scan_ms:10.3f} ms/query")
+    print(f"  Index duration-window avg:  {window_ms:10.3f} ms/query")
+    print(f"  Index 5 nearest trips:      {knn_ms:10.3f} ms/query")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import subprocess
+import sys
+import time
+
+# Measures how long a fresh process takes to produce its first prediction.
+# Each case runs in its own interpreter so import costs are counted.
+
+MODEL_FILE = '../commute_carbon_pytorch_model.pt'
+REPEATS = 5
+
+# What a worker had to do before: the training script's imports plus
+# unpickling a checkpoint that carries a sklearn StandardScaler
+LEGACY = f"""
+import pandas as pd
+import numpy as np
+import torch
+from sklearn.preprocessing import StandardScaler
+import matplotlib.pyplot as plt
+from carbon_model import CarbonFootprintNN
+checkpoint = torch.load({MODEL_FILE!r}, weights_only=False)
+scaler = StandardScaler()
+scaler.mean_ = checkpoint['scaler_mean'].numpy()
+scaler.scale_ = checkpoint['scaler_scale'].numpy()
+model = CarbonFootprintNN(checkpoint['input_dim'])
+model.load_state_dict(checkpoint['model_state_dict'])
+model.eval()
+with torch.no_grad():
+    x = torch.tensor(scaler.transform(np.array([[1, 50, 40, 4.5]])), dtype=torch.float32)
+    model(x).item()
+"""
+
+PREDICTOR = f"""
+import sys
+from carbon_model import CarbonPredictor
+CarbonPredictor.load({MODEL_FILE!r}).predict_one(1, 50, 40, 4.5)
+heavy = [name for name in ('pandas', 'sklearn', 'matplotlib') if name in sys.modules]
+assert not heavy, heavy
+"""
+
+# Floor: the cost of importing torch alone
+TORCH_ONLY = "import torch"
+
+
+def time_process(code):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    results = [
+        ("import torch only", time_process(TORCH_ONLY)),
+        ("Legacy script imports + load", time_process(LEGACY)),
+        ("CarbonPredictor.load", time_process(PREDICTOR)),
+    ]
+    print(f"Best of {REPEATS} runs, time to first prediction:")
+    for name, seconds in results:
+        print(f"  {name:<30} {seconds * 1000:8.0f} ms")
+    torch_only = results[0][1]
+    print("Startup beyond importing torch:")
+    for name, seconds in results[1:]:
+        print(f"  {name:<30} {(seconds - torch_only) * 1000:8.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
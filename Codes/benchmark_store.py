@@ -0,0 +1,81 @@
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic_data import write_csv
+import trip_store
+
+# Load time and peak RSS of read_csv versus the memory-mapped trip store.
+# Every case runs in a fresh interpreter so peak RSS isn't shared.
+
+N_TRIPS = 2_000_000
+COLUMNS = ['traffic_condition', 'co2_emissions_kg']
+
+
+def peak_rss_mb():
+    # VmHWM is reset on exec; ru_maxrss would include the parent's peak on Linux
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(case, path):
+    start = time.perf_counter()
+    if case == 'read_csv':
+        df = pd.read_csv(path)
+        means = df.groupby('traffic_condition')['co2_emissions_kg'].mean()
+    elif case == 'read_csv_usecols':
+        df = pd.read_csv(path, usecols=COLUMNS)
+        means = df.groupby('traffic_condition')['co2_emissions_kg'].mean()
+    else:
+        arrays = trip_store.load_columns(COLUMNS, store_dir=path)
+        traffic, co2 = arrays['traffic_condition'], arrays['co2_emissions_kg']
+        means = np.bincount(traffic, weights=co2, minlength=3) / np.bincount(traffic, minlength=3)
+    seconds = time.perf_counter() - start
+    peak_mb = peak_rss_mb()
+    print(f"{seconds:.3f} {peak_mb:.0f}")
+
+
+def measure(case, path):
+    output = subprocess.run(
+        [sys.executable, __file__, case, path], check=True, capture_output=True, text=True
+    ).stdout.split()
+    return float(output[0]), float(output[1])
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'trips.csv')
+        store_dir = os.path.join(tmp, 'store')
+
+        print(f"Writing {N_TRIPS:,} synthetic trips...")
+        write_csv(csv_path, N_TRIPS)
+        start = time.perf_counter()
+        trip_store.convert_csv(csv_path, store_dir, chunksize=500_000,
+                               quarantine_path=os.path.join(tmp, 'quarantine.csv'))
+        print(f"One-off conversion to columnar store: {time.perf_counter() - start:.1f}s")
+        print(f"CSV size {os.path.getsize(csv_path) / 1e6:.0f} MB, "
+              f"store size {sum(os.path.getsize(os.path.join(store_dir, f)) for f in os.listdir(store_dir)) / 1e6:.0f} MB")
+
+        print(f"\nLoading {COLUMNS} and averaging CO2 per traffic level:")
+        for case, path in [('read_csv', csv_path), ('read_csv_usecols', csv_path), ('trip_store', store_dir)]:
+            seconds, peak_mb = measure(case, path)
+            print(f"  {case:<18} {seconds:7.3f}s  peak RSS {peak_mb:7.0f} MB")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        run_case(sys.argv[1], sys.argv[2])
+    else:
+        main()
@@ -0,0 +1,208 @@
+import argparse
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark_store import peak_rss_mb
+
+# End-to-end benchmark on synthetic trips (synthetic_data.py) at several
+# volumes: CSV generation, ingestion into the columnar store, incremental
+# aggregation, hypothesis tests, training and batch inference. Every stage
+# runs in a fresh interpreter so its peak RSS is its own.
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '100m': 100_000_000}
+DEFAULT_SIZES = ['10k', '1m']  # 100m writes a ~7 GB CSV; ask for it explicitly
+STAGES = ['generate', 'ingest', 'aggregate', 'hypothesis', 'train', 'stream_train', 'inference']
+RESULTS_FILE = '../benchmark_results.json'
+MODEL_FILE = '../commute_carbon_pytorch_model.pt'
+
+HYPOTHESIS_RESAMPLES = 200
+TRAIN_EPOCHS = 2
+TRAIN_BATCH_SIZE = 4096
+STREAM_WORKERS = 2
+INFERENCE_CHUNK = 1_000_000
+
+# Imported before a stage's timer starts, so seconds exclude interpreter/library start-up
+STAGE_IMPORTS = {
+    'generate': ['synthetic_data'],
+    'ingest': ['trip_store'],
+    'aggregate': ['aggregate_cache'],
+    'hypothesis': ['trip_store', 'hypothesis_engine'],
+    'train': ['torch', 'trip_store', 'carbon_model', 'trainer'],
+    'stream_train': ['torch', 'trip_store', 'carbon_model', 'streaming_training'],
+    'inference': ['torch', 'trip_store', 'carbon_model'],
+}
+
+
+def _paths(workdir):
+    return os.path.join(workdir, 'trips.csv'), os.path.join(workdir, 'store')
+
+
+def stage_generate(n, workdir):
+    from synthetic_data import write_csv
+    csv_path, _ = _paths(workdir)
+    write_csv(csv_path, n)
+    return {'csv_mb': os.path.getsize(csv_path) / 1e6}
+
+
+def stage_ingest(n, workdir):
+    import trip_store
+    csv_path, store_dir = _paths(workdir)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    # Includes the validation pass (trip_validation.py)
+    trip_store.convert_csv(csv_path, store_dir, chunksize=500_000,
+                           quarantine_path=os.path.join(workdir, 'quarantine.csv'))
+    validation = trip_store.read_meta(store_dir)['validation']
+    return {'store_mb': sum(os.path.getsize(os.path.join(store_dir, f)) for f in os.listdir(store_dir)) / 1e6,
+            'quarantined': validation['quarantined'], 'validate_rows_per_sec': validation['rows_per_sec']}
+
+
+def stage_aggregate(n, workdir):
+    from aggregate_cache import GROUPINGS, AggregateCache
+    csv_path, _ = _paths(workdir)
+    cache = AggregateCache(csv_path, cache_path=os.path.join(workdir, 'aggregates.json'))
+    cache.update()
+    for grouping in GROUPINGS:
+        cache.summary(grouping)
+    return {}
+
+
+def stage_hypothesis(n, workdir):
+    import pandas as pd
+    import trip_store
+    from commute_loader import TRAFFIC_LABELS
+    from hypothesis_engine import run_tests
+
+    _, store_dir = _paths(workdir)
+    df = trip_store.load_frame(['traffic_condition', 'trip_direction', 'day_of_week', 'departure_hour',
+                                'fuel_efficiency_l_per_100km', 'co2_emissions_kg'], store_dir)
+    df['traffic_label'] = pd.Categorical.from_codes(df['traffic_condition'], categories=list(TRAFFIC_LABELS.values()))
+    results = run_tests(df, methods=('classic', 'permutation'), n_resamples=HYPOTHESIS_RESAMPLES)
+    return {'tests': len(results)}
+
+
+def _feature_arrays(store_dir):
+    import trip_store
+    from carbon_model import FEATURES
+    arrays = trip_store.load_columns(FEATURES + ['co2_emissions_kg'], store_dir)
+    return [arrays[name] for name in FEATURES], arrays['co2_emissions_kg']
+
+
+def stage_train(n, workdir):
+    import torch
+    from carbon_model import CarbonFootprintNN
+    from trainer import train_model
+
+    _, store_dir = _paths(workdir)
+    columns, target = _feature_arrays(store_dir)
+    X = np.column_stack(columns).astype(np.float32)
+    mean, scale = X.mean(axis=0), X.std(axis=0)
+    X -= mean
+    X /= scale
+    X = torch.from_numpy(X)
+    y = torch.from_numpy(np.asarray(target, dtype=np.float32)).reshape(-1, 1)
+
+    n_train = int(0.9 * len(X))
+    torch.manual_seed(0)
+    model = CarbonFootprintNN(X.shape[1])
+    history = train_model(model, X[:n_train], y[:n_train], X[n_train:], y[n_train:],
+                          num_epochs=TRAIN_EPOCHS, batch_size=TRAIN_BATCH_SIZE)
+    return {'train_rows_per_sec': TRAIN_EPOCHS * n_train / history['wall_time'],
+            'test_loss': history['test_losses'][-1]}
+
+
+def stage_stream_train(n, workdir):
+    # Peak RSS covers the training process only; each DataLoader worker holds
+    # about one chunk plus its shuffle buffer
+    import torch
+    from carbon_model import CarbonFootprintNN
+    from streaming_training import TripStream, scaler_stats, train_streaming
+
+    _, store_dir = _paths(workdir)
+    mean, scale, _ = scaler_stats(store_dir)
+    torch.manual_seed(0)
+    model = CarbonFootprintNN(len(mean))
+    dataset = TripStream(store_dir, mean, scale, batch_size=TRAIN_BATCH_SIZE)
+    history = train_streaming(model, dataset, num_epochs=TRAIN_EPOCHS, num_workers=STREAM_WORKERS, log_every=None)
+    return {'train_rows_per_sec': history['rows_per_sec'], 'train_loss': history['train_losses'][-1]}
+
+
+def stage_inference(n, workdir):
+    from carbon_model import CarbonPredictor
+
+    _, store_dir = _paths(workdir)
+    predictor = CarbonPredictor.load(MODEL_FILE)
+    columns, _ = _feature_arrays(store_dir)
+    n_stored = len(columns[0])  # n minus any quarantined trips
+    total = 0.0
+    for start in range(0, n_stored, INFERENCE_CHUNK):
+        X = np.column_stack([c[start:start + INFERENCE_CHUNK] for c in columns]).astype(np.float32)
+        total += float(predictor.predict(X).sum(dtype=np.float64))
+    return {'mean_prediction': total / n_stored}
+
+
+def run_stage(stage, n, workdir):
+    """Run one stage in this process and print its result as one JSON line"""
+    for module in STAGE_IMPORTS[stage]:
+        importlib.import_module(module)
+    start = time.perf_counter()
+    extra = globals()[f'stage_{stage}'](n, workdir)
+    seconds = time.perf_counter() - start
+    print(json.dumps({'seconds': seconds, 'peak_rss_mb': peak_rss_mb(), **extra}))
+
+
+def measure(stage, n, workdir):
+    output = subprocess.run(
+        [sys.executable, __file__, '--run-stage', stage, '--rows', str(n), '--workdir', workdir],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic trips")
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=DEFAULT_SIZES)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--workdir', help="Directory for generated data (default: a temporary directory)")
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument('--run-stage', choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument('--rows', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        run_stage(args.run_stage, args.rows, args.workdir)
+        return
+
+    results = {}
+    for size in args.sizes:
+        n = SIZES[size]
+        workdir = os.path.join(args.workdir, size) if args.workdir else tempfile.mkdtemp(prefix=f'bench-{size}-')
+        os.makedirs(workdir, exist_ok=True)
+        print(f"\n{n:,} trips ({workdir})")
+        print(f"  {'Stage':<12}{'Seconds':>10}{'Rows/sec':>14}{'Peak RSS':>12}")
+        results[size] = {}
+        try:
+            for stage in args.stages:
+                result = measure(stage, n, workdir)
+                results[size][stage] = result
+                print(f"  {stage:<12}{result['seconds']:>10.2f}{n / result['seconds']:>14,.0f}"
+                      f"{result['peak_rss_mb']:>9.0f} MB")
+        finally:
+            if not args.workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'sizes': {size: SIZES[size] for size in results}, 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import TensorDataset, DataLoader
+
+from carbon_model import CarbonFootprintNN
+from trainer import train_model
+
+# Compares the original DataLoader loop (batch_size=4, loss.item() per step)
+# with train_model in mini-batch and full-batch mode on the same data.
+
+N_TRIPS = 20000
+EPOCHS = 3
+FULL_BATCH_EPOCHS = 200
+
+
+def make_dataset(n, seed=0):
+    # Scaled synthetic trips; CO2 follows distance * efficiency / 100 * 2.31
+    rng = np.random.default_rng(seed)
+    traffic = rng.integers(0, 3, n)
+    duration = 35 + 15 * traffic + rng.normal(0, 8, n)
+    distance = rng.uniform(33, 42, n)
+    efficiency = 3.6 + 0.4 * traffic + rng.normal(0, 0.4, n)
+    X = np.column_stack([traffic, duration, distance, efficiency])
+    y = distance * efficiency / 100 * 2.31
+    X = (X - X.mean(axis=0)) / X.std(axis=0)
+    X = torch.tensor(X, dtype=torch.float32)
+    y = torch.tensor(y, dtype=torch.float32).reshape(-1, 1)
+    split = int(0.8 * n)
+    return X[:split], y[:split], X[split:], y[split:]
+
+
+def legacy_train(X_train, y_train, X_test, y_test, num_epochs, batch_size=4):
+    # The loop predict_carbon_pytorch.py used before train_model
+    torch.manual_seed(42)
+    model = CarbonFootprintNN(X_train.shape[1])
+    criterion = nn.MSELoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.001, weight_decay=1e-5)
+    train_loader = DataLoader(TensorDataset(X_train, y_train), batch_size=batch_size, shuffle=True)
+    test_loader = DataLoader(TensorDataset(X_test, y_test), batch_size=batch_size)
+
+    start = time.perf_counter()
+    for epoch in range(num_epochs):
+        model.train()
+        train_loss = 0.0
+        for inputs, targets in train_loader:
+            outputs = model(inputs)
+            loss = criterion(outputs, targets)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            train_loss += loss.item()
+
+        model.eval()
+        test_loss = 0.0
+        with torch.no_grad():
+            for inputs, targets in test_loader:
+                test_loss += criterion(model(inputs), targets).item()
+    return time.perf_counter() - start, test_loss / len(test_loader)
+
+
+def run_trainer(data, num_epochs, **kwargs):
+    torch.manual_seed(42)
+    model = CarbonFootprintNN(data[0].shape[1])
+    history = train_model(model, *data, num_epochs=num_epochs, **kwargs)
+    return history
+
+
+def report(name, epochs, seconds, test_loss):
+    print(f"  {name:<36} {epochs:5d} epochs  {seconds:7.2f}s  "
+          f"{epochs / seconds:8.2f} epochs/sec  test MSE {test_loss:.4f}")
+
+
+def main():
+    data = make_dataset(N_TRIPS)
+    print(f"{N_TRIPS:,} synthetic trips, torch threads: {torch.get_num_threads()}")
+
+    seconds, test_loss = legacy_train(*data, num_epochs=EPOCHS)
+    report("DataLoader loop, batch_size=4", EPOCHS, seconds, test_loss)
+
+    history = run_trainer(data, EPOCHS, batch_size=4)
+    report("train_model, batch_size=4", history['epochs_run'], history['wall_time'], history['test_losses'][-1])
+
+    history = run_trainer(data, FULL_BATCH_EPOCHS, batch_size=1024, lr=0.01)
+    report("train_model, batch_size=1024", history['epochs_run'], history['wall_time'], history['best_test_loss'])
+
+    history = run_trainer(data, FULL_BATCH_EPOCHS, batch_size=None, lr=0.01, patience=20)
+    report("train_model, full batch + early stop", history['epochs_run'], history['wall_time'], history['best_test_loss'])
+
+
+if __name__ == '__main__':
+    main()
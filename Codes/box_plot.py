@@ -4,17 +4,27 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
 
-# Load data
-df = pd.read_csv('../commute_data.csv')
+from feature_pipeline import load_features
 
-plt.figure(figsize=(8, 6))
-sns.boxplot(x='traffic_condition', y='co2_emissions_kg', data=df,
-            order=['low', 'moderate', 'high'],
-            palette={'low': 'green', 'moderate': 'orange', 'high': 'red'})
-plt.title('Carbon Emissions by Traffic Level')
-plt.xlabel('Traffic Condition')
-plt.ylabel('CO2 Emissions (kg)')
-plt.grid(True, linestyle='--', alpha=0.3)
-plt.tight_layout()
-plt.savefig('emissions_boxplot.png', dpi=300)
-plt.show()
+
+def plot_emissions_boxplot(df):
+    """Box plot of CO2 emissions per traffic level"""
+    fig = plt.figure(figsize=(8, 6))
+    sns.boxplot(x='traffic_label', y='co2_emissions_kg', data=df,
+                order=['Low', 'Moderate', 'High'],
+                palette={'Low': 'green', 'Moderate': 'orange', 'High': 'red'})
+    plt.title('Carbon Emissions by Traffic Level')
+    plt.xlabel('Traffic Condition')
+    plt.ylabel('CO2 Emissions (kg)')
+    plt.grid(True, linestyle='--', alpha=0.3)
+    plt.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    # Load data
+    df = load_features()
+
+    plot_emissions_boxplot(df)
+    plt.savefig('emissions_boxplot.png', dpi=300)
+    plt.show()
@@ -0,0 +1,261 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from hypothesis_engine import DEPARTURE_PERIODS
+
+# Monte Carlo estimate of a campus's annual commuting emissions and of what
+# reduction strategies would save. Each replicate first refits the sampling
+# distributions to a bootstrap resample of the recorded trips, so the
+# intervals carry the uncertainty of fitting them to a few dozen trips, and
+# then samples a student body:
+#   - per student: commute distance and a baseline fuel efficiency
+#   - per trip: departure hours, the traffic level for that time of day
+#     and the trip duration for that traffic level
+# Every trip is scored through the trained model. Strategies are applied to
+# the same fit and random draws as the baseline, so their savings are
+# paired differences. Replicates run in a process pool and
+# trips are scored in large vectorized batches.
+
+MODEL_FILE = '../commute_carbon_pytorch_model.pt'
+SCHOOL_DAYS = 180
+TRIPS_PER_DAY = 2  # to campus and back
+DEFAULT_STUDENTS = 10000
+DEFAULT_REPLICATES = 100
+DEFAULT_DAYS_SAMPLED = 5  # commuting days simulated per student, scaled up to SCHOOL_DAYS
+STUDENT_CHUNK = 20000
+CARPOOL_SHARE = 0.25
+ECO_DRIVING_SAVING = 0.10
+
+PERIOD_EDGES = [high for _, high in DEPARTURE_PERIODS.values()][:-1]
+TRIP_COLUMNS = ['traffic_condition', 'trip_duration', 'fuel_efficiency_l_per_100km', 'distance_km',
+                'departure_hour', 'trip_direction']
+
+
+def fit_population(df):
+    """Sampling distributions fitted to recorded trips (needs departure_hour)"""
+    traffic = df['traffic_condition'].to_numpy()
+    duration = df['trip_duration'].to_numpy(dtype=np.float64)
+    efficiency = df['fuel_efficiency_l_per_100km'].to_numpy(dtype=np.float64)
+    distance = df['distance_km'].to_numpy(dtype=np.float64)
+    hours = df['departure_hour'].to_numpy()
+    direction = np.asarray(df['trip_direction'].astype(str) == 'Campus to Home', dtype=np.int64)
+    period = np.digitize(hours, PERIOD_EDGES)
+
+    levels = np.arange(3)
+    # Traffic mix per departure period, with add-one smoothing for sparse periods
+    counts = np.ones((len(DEPARTURE_PERIODS), 3))
+    np.add.at(counts, (period, traffic), 1)
+
+    def per_level(values, stat, fallback):
+        return np.array([stat(values[traffic == t]) if (traffic == t).sum() > 1 else fallback for t in levels])
+
+    efficiency_mean = per_level(efficiency, np.mean, efficiency.mean())
+    return {
+        'hours': [hours[direction == d] if (direction == d).any() else hours for d in (0, 1)],
+        'traffic_probs': counts / counts.sum(axis=1, keepdims=True),
+        'duration_mean': per_level(duration, np.mean, duration.mean()),
+        'duration_std': per_level(duration, np.std, duration.std()),
+        'efficiency_offset': efficiency_mean - efficiency.mean(),
+        'efficiency_mean': efficiency.mean(),
+        'efficiency_std': efficiency.std(),
+        'distance_mean': distance.mean(),
+        'distance_std': distance.std(),
+    }
+
+
+def _traffic_from_uniform(probs, u):
+    """Inverse-CDF draw of a traffic level per row of probs"""
+    cdf = np.cumsum(probs, axis=1)
+    return np.minimum((u[:, None] > cdf).sum(axis=1), probs.shape[1] - 1)
+
+
+def sample_trips(population, n_students, days, rng):
+    """Random draws for n_students x days of commuting; every scenario is built from the same draws"""
+    distance = np.clip(rng.normal(population['distance_mean'], population['distance_std'], n_students), 1.0, None)
+    student_efficiency = np.clip(rng.normal(population['efficiency_mean'], population['efficiency_std'],
+                                            n_students), 2.0, None)
+    carpool = rng.random(n_students) < CARPOOL_SHARE
+
+    per_student = days * TRIPS_PER_DAY
+    student = np.repeat(np.arange(n_students), per_student)
+    direction = np.tile(np.arange(TRIPS_PER_DAY), n_students * days)
+    hours = np.empty(len(student), dtype=np.int64)
+    for d in range(TRIPS_PER_DAY):
+        rows = direction == d
+        hours[rows] = rng.choice(population['hours'][d], rows.sum())
+
+    return {
+        'period': np.digitize(hours, PERIOD_EDGES),
+        'u': rng.random(len(student)),
+        'z': rng.standard_normal(len(student)),
+        'distance': distance[student].astype(np.float32),
+        'efficiency': student_efficiency[student],
+        'carpool': carpool[student],
+    }
+
+
+def _trips(population, draws, probs, efficiency_factor=1.0, weight=None):
+    """Model inputs and per-trip weights for one scenario"""
+    traffic = _traffic_from_uniform(probs[draws['period']], draws['u'])
+    duration = np.clip(population['duration_mean'][traffic] + population['duration_std'][traffic] * draws['z'],
+                       5.0, None)
+    efficiency = (draws['efficiency'] + population['efficiency_offset'][traffic]) * efficiency_factor
+    X = np.column_stack([traffic, duration, draws['distance'], efficiency]).astype(np.float32)
+    return X, (np.ones(len(X)) if weight is None else weight)
+
+
+def _baseline(population, draws):
+    return _trips(population, draws, population['traffic_probs'])
+
+
+def _avoid_high_traffic(population, draws):
+    # Everyone leaves when traffic is at most moderate, keeping each period's low/moderate mix
+    probs = population['traffic_probs'][:, :2]
+    probs = np.column_stack([probs / probs.sum(axis=1, keepdims=True), np.zeros(len(probs))])
+    return _trips(population, draws, probs)
+
+
+def _off_peak(population, draws):
+    # Everyone leaves in the period with the lowest expected traffic level
+    probs = population['traffic_probs']
+    best = probs[np.argmin(probs @ np.arange(probs.shape[1]))]
+    return _trips(population, draws, np.broadcast_to(best, probs.shape))
+
+
+def _eco_driving(population, draws):
+    return _trips(population, draws, population['traffic_probs'], efficiency_factor=1 - ECO_DRIVING_SAVING)
+
+
+def _carpool(population, draws):
+    # Carpooling students share each trip with one other student
+    weight = np.where(draws['carpool'], 0.5, 1.0)
+    return _trips(population, draws, population['traffic_probs'], weight=weight)
+
+
+STRATEGIES = {
+    'Avoid high traffic': _avoid_high_traffic,
+    'Off-peak departures': _off_peak,
+    f'Eco-driving (-{ECO_DRIVING_SAVING:.0%} fuel)': _eco_driving,
+    f'Carpooling ({CARPOOL_SHARE:.0%} of students)': _carpool,
+}
+BASELINE = 'Current commuting'
+
+_worker = {}
+
+
+def _init_worker(predictor, trips, threads=None):
+    if threads is not None:
+        import torch
+        torch.set_num_threads(threads)
+    _worker.update(predictor=predictor, trips=trips)
+
+
+def _run_replicates(task):
+    """Annual tonnes per scenario for each replicate seed in task"""
+    seeds, n_students, days, school_days, strategies, bootstrap = task
+    predictor, trips = _worker['predictor'], _worker['trips']
+    scenarios = {BASELINE: _baseline, **{name: STRATEGIES[name] for name in strategies}}
+    totals = np.zeros((len(seeds), len(scenarios)))
+    trips_scored = 0
+    population = None if bootstrap else fit_population(trips)
+    for i, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        if bootstrap:
+            population = fit_population(trips.iloc[rng.integers(0, len(trips), len(trips))])
+        for start in range(0, n_students, STUDENT_CHUNK):
+            draws = sample_trips(population, min(STUDENT_CHUNK, n_students - start), days, rng)
+            for j, scenario in enumerate(scenarios.values()):
+                X, weight = scenario(population, draws)
+                totals[i, j] += float(np.dot(predictor.predict(X), weight))
+                trips_scored += len(X)
+    return totals * (school_days / days) / 1000, trips_scored
+
+
+def simulate(predictor, trips, n_students=DEFAULT_STUDENTS, school_days=SCHOOL_DAYS,
+             n_replicates=DEFAULT_REPLICATES, days_sampled=DEFAULT_DAYS_SAMPLED, strategies=None,
+             max_workers=None, seed=42, bootstrap=True):
+    """
+    Run the Monte Carlo simulation on the recorded trips (a loaded commute
+    DataFrame). predictor scores an (n, 4) FEATURES array (e.g.
+    BatchPredictor); it must be picklable when max_workers > 1. With
+    bootstrap=False every replicate uses one fit to all of trips.
+    Returns {'tonnes': DataFrame (replicate x scenario), 'trips_scored', 'seconds'}.
+    """
+    strategies = list(STRATEGIES) if strategies is None else list(strategies)
+    trips = trips[TRIP_COLUMNS].reset_index(drop=True)
+    days = min(days_sampled, school_days)
+    seeds = np.random.SeedSequence(seed).spawn(n_replicates)
+    max_workers = max_workers or min(n_replicates, os.cpu_count() or 1)
+    tasks = [(seeds[i::max_workers], n_students, days, school_days, strategies, bootstrap)
+             for i in range(max_workers)]
+
+    start = time.perf_counter()
+    if max_workers == 1:
+        _init_worker(predictor, trips)
+        results = [_run_replicates(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(predictor, trips, 1)) as pool:
+            results = list(pool.map(_run_replicates, tasks))
+    seconds = time.perf_counter() - start
+
+    tonnes = pd.DataFrame(np.concatenate([totals for totals, _ in results]), columns=[BASELINE, *strategies])
+    trips_scored = sum(n for _, n in results)
+    return {'tonnes': tonnes, 'n_students': n_students, 'school_days': school_days,
+            'trips_scored': trips_scored, 'seconds': seconds, 'trips_per_sec': trips_scored / seconds}
+
+
+def confidence_interval(values, level=0.95):
+    """(mean, low, high) percentile interval over replicates"""
+    values = np.asarray(values, dtype=np.float64)
+    tail = (1 - level) / 2 * 100
+    return float(values.mean()), float(np.percentile(values, tail)), float(np.percentile(values, 100 - tail))
+
+
+def summarize(result, level=0.95):
+    """Annual tonnes and savings versus the baseline per scenario, with intervals"""
+    tonnes = result['tonnes']
+    rows = {}
+    for scenario in tonnes.columns:
+        annual = confidence_interval(tonnes[scenario], level)
+        saving = confidence_interval(tonnes[BASELINE] - tonnes[scenario], level)
+        share = confidence_interval((tonnes[BASELINE] - tonnes[scenario]) / tonnes[BASELINE] * 100, level)
+        rows[scenario] = {
+            'annual_t': annual[0], 'annual_t_low': annual[1], 'annual_t_high': annual[2],
+            'saving_t': saving[0], 'saving_t_low': saving[1], 'saving_t_high': saving[2],
+            'saving_pct': share[0],
+        }
+    table = pd.DataFrame.from_dict(rows, orient='index')
+    table.index.name = 'scenario'
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo campus commuting emissions and reduction strategies")
+    parser.add_argument('--checkpoint', default=MODEL_FILE)
+    parser.add_argument('--students', type=int, default=DEFAULT_STUDENTS)
+    parser.add_argument('--replicates', type=int, default=DEFAULT_REPLICATES)
+    parser.add_argument('--days-sampled', type=int, default=DEFAULT_DAYS_SAMPLED)
+    parser.add_argument('--school-days', type=int, default=SCHOOL_DAYS)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    from carbon_model import CarbonPredictor
+    from commute_loader import load_commute_data
+
+    predictor = CarbonPredictor.load(args.checkpoint)
+    result = simulate(predictor, load_commute_data(), args.students, args.school_days, args.replicates,
+                      args.days_sampled, max_workers=args.workers)
+    print(f"{args.replicates} replicates of {args.students:,} students: {result['trips_scored']:,} trips scored "
+          f"in {result['seconds']:.1f}s ({result['trips_per_sec']:,.0f} trips/sec)\n")
+    with pd.option_context('display.width', 140):
+        print(summarize(result).round(2).to_string())
+
+
+if __name__ == '__main__':
+    main()
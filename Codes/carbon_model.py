@@ -0,0 +1,193 @@
+import copy
+import itertools
+import pickle
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+import profiling
+
+# Feature order expected by the model (same order the scaler was fitted on)
+FEATURES = ['traffic_condition', 'trip_duration', 'distance_km', 'fuel_efficiency_l_per_100km']
+
+# Default number of rows scored per forward pass
+DEFAULT_CHUNK_SIZE = 65536
+
+
+# Default architecture: 32-16-1 with dropout after the first hidden layer
+DEFAULT_HIDDEN_DIMS = (32, 16)
+DEFAULT_DROPOUT = 0.2
+
+
+class CarbonFootprintNN(nn.Module):
+    """Neural network model for predicting CO2 emissions"""
+
+    def __init__(self, input_dim, hidden_dims=DEFAULT_HIDDEN_DIMS, dropout=DEFAULT_DROPOUT):
+        super(CarbonFootprintNN, self).__init__()
+        self.hidden_dims = tuple(hidden_dims)
+        self.dropout_p = dropout
+        # Layers are named layer1..layerN so the default model keeps the
+        # state_dict keys of existing checkpoints
+        sizes = [input_dim, *self.hidden_dims, 1]
+        self.n_layers = len(sizes) - 1
+        for i in range(self.n_layers):
+            setattr(self, f'layer{i + 1}', nn.Linear(sizes[i], sizes[i + 1]))
+        self.relu = nn.ReLU()
+        self.dropout = nn.Dropout(dropout)  # Add dropout for regularization
+
+    def forward(self, x):
+        for i in range(1, self.n_layers):
+            x = self.relu(getattr(self, f'layer{i}')(x))
+            # Dropout follows every hidden layer except the last one
+            if i < self.n_layers - 1:
+                x = self.dropout(x)
+        return getattr(self, f'layer{self.n_layers}')(x)
+
+
+def fold_scaler(model, mean, scale):
+    """Return a copy of model whose first layer also applies (x - mean) / scale"""
+    folded = copy.deepcopy(model)
+    first = folded.layer1
+    mean = torch.as_tensor(np.asarray(mean), dtype=first.weight.dtype)
+    scale = torch.as_tensor(np.asarray(scale), dtype=first.weight.dtype)
+
+    # W((x - m) / s) + b  ==  (W / s) x + (b - (W / s) m)
+    with torch.no_grad():
+        first.weight.div_(scale)
+        first.bias.sub_(first.weight @ mean)
+    folded.eval()
+    return folded
+
+
+class BatchPredictor:
+    """Scores many trips at once with a scaler-folded copy of the model"""
+
+    def __init__(self, model, mean, scale, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.model = fold_scaler(model, mean, scale)
+        self.chunk_size = chunk_size
+        self.n_features = self.model.layer1.in_features
+        # Reused for every chunk so scoring doesn't allocate per call
+        self._buffer = torch.empty((chunk_size, self.n_features), dtype=torch.float32)
+
+    def _score_chunk(self, chunk):
+        n = len(chunk)
+        inputs = self._buffer[:n]
+        inputs.copy_(torch.from_numpy(chunk))
+        return self.model(inputs).reshape(-1).numpy()
+
+    def _array_chunks(self, X):
+        for start in range(0, len(X), self.chunk_size):
+            yield np.ascontiguousarray(X[start:start + self.chunk_size])
+
+    def _record_chunks(self, records):
+        records = iter(records)
+        while True:
+            batch = list(itertools.islice(records, self.chunk_size))
+            if not batch:
+                return
+            if isinstance(batch[0], dict):
+                batch = [[record[name] for name in FEATURES] for record in batch]
+            yield np.asarray(batch, dtype=np.float32)
+
+    def _chunks(self, data):
+        # DataFrames are detected by duck typing so pandas is never imported here
+        if hasattr(data, 'columns') and hasattr(data, 'to_numpy'):
+            data = data[FEATURES].to_numpy(dtype=np.float32)
+        if isinstance(data, np.ndarray):
+            if data.ndim == 1:
+                data = data.reshape(1, -1)
+            return self._array_chunks(data)
+        return self._record_chunks(data)
+
+    def predict_chunks(self, data):
+        """Yield predictions chunk by chunk (keeps memory bounded for iterators)"""
+        with torch.inference_mode():
+            for chunk in self._chunks(data):
+                with profiling.span('inference', rows=len(chunk)):
+                    scores = self._score_chunk(chunk)
+                yield scores
+
+    def predict(self, data):
+        """
+        Predict CO2 emissions (kg) for a DataFrame, a 2D array with FEATURES
+        columns, or an iterable of records (dicts keyed by FEATURES or tuples).
+        """
+        parts = list(self.predict_chunks(data))
+        if not parts:
+            return np.empty(0, dtype=np.float32)
+        return np.concatenate(parts)
+
+
+def save_checkpoint(path, model, mean, scale, features=FEATURES, **extra):
+    """Save model weights with the scaler statistics stored as plain tensors"""
+    checkpoint = {
+        'model_state_dict': model.state_dict(),
+        'input_dim': model.layer1.in_features,
+        'hidden_dims': list(model.hidden_dims),
+        'dropout': model.dropout_p,
+        'features': list(features),
+        'scaler_mean': torch.as_tensor(np.asarray(mean), dtype=torch.float64),
+        'scaler_scale': torch.as_tensor(np.asarray(scale), dtype=torch.float64),
+    }
+    checkpoint.update(extra)
+    with profiling.span('torch.save'):
+        torch.save(checkpoint, path)
+
+
+def load_checkpoint(path):
+    """
+    Load a checkpoint written by save_checkpoint. Older checkpoints that pickled
+    a sklearn StandardScaler are still accepted; only they need sklearn.
+    """
+    try:
+        checkpoint = torch.load(path, weights_only=True)
+    except pickle.UnpicklingError:
+        checkpoint = torch.load(path, weights_only=False)
+    if 'scaler' in checkpoint:
+        scaler = checkpoint.pop('scaler')
+        checkpoint['scaler_mean'] = torch.as_tensor(scaler.mean_, dtype=torch.float64)
+        checkpoint['scaler_scale'] = torch.as_tensor(scaler.scale_, dtype=torch.float64)
+    return checkpoint
+
+
+def build_model(checkpoint):
+    """Rebuild the CarbonFootprintNN stored in a loaded checkpoint"""
+    model = CarbonFootprintNN(
+        checkpoint['input_dim'],
+        hidden_dims=checkpoint.get('hidden_dims', DEFAULT_HIDDEN_DIMS),
+        dropout=checkpoint.get('dropout', DEFAULT_DROPOUT),
+    )
+    model.load_state_dict(checkpoint['model_state_dict'])
+    model.eval()
+    return model
+
+
+def convert_legacy_checkpoint(path, out_path=None):
+    """Rewrite a sklearn-scaler checkpoint in the tensor-only format"""
+    checkpoint = load_checkpoint(path)
+    torch.save(checkpoint, out_path or path)
+
+
+class CarbonPredictor(BatchPredictor):
+    """BatchPredictor that can be restored directly from a saved checkpoint"""
+
+    def __init__(self, model, mean, scale, features=FEATURES, chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(model, mean, scale, chunk_size=chunk_size)
+        self.features = list(features)
+
+    @classmethod
+    def load(cls, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        checkpoint = load_checkpoint(path)
+        model = build_model(checkpoint)
+        return cls(
+            model,
+            checkpoint['scaler_mean'].numpy(),
+            checkpoint['scaler_scale'].numpy(),
+            features=checkpoint['features'],
+            chunk_size=chunk_size,
+        )
+
+    def predict_one(self, traffic_condition, trip_duration, distance_km, fuel_efficiency):
+        trip = np.array([[traffic_condition, trip_duration, distance_km, fuel_efficiency]], dtype=np.float32)
+        return float(self.predict(trip)[0])
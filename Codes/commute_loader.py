@@ -0,0 +1,230 @@
+import hashlib
+import io
+import os
+
+import pandas as pd
+
+import profiling
+
+# Shared loading code for every script in Codes/. The CSV is read in chunks
+# with compact dtypes and the derived columns are added per chunk, so callers
+# that aggregate chunk by chunk never hold the whole file in memory. Trips
+# are validated once, when they are written (TripWriter) or converted
+# (trip_store.convert_csv); pass validate=True to also drop invalid rows on
+# a read, at the cost of parsing every column.
+
+DATA_FILE = '../commute_data.csv'
+DEFAULT_CHUNK_SIZE = 100_000
+
+DIRECTIONS = ['Home to Campus', 'Campus to Home']
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Traffic is stored as 0/1/2, but dsa_script.py writes low/moderate/high
+TRAFFIC_LABELS = {0: 'Low', 1: 'Moderate', 2: 'High'}
+TRAFFIC_CODES = {
+    '0': 0, '1': 1, '2': 2,
+    'low': 0, 'moderate': 1, 'high': 2,
+}
+UNKNOWN_TRAFFIC = -1
+
+NUMERIC_COLUMNS = ['trip_duration', 'distance_km', 'fuel_efficiency_l_per_100km',
+                   'fuel_used_l', 'co2_emissions_kg']
+
+DTYPES = {
+    'date': 'string',
+    'departure_time': 'string',
+    'trip_direction': pd.CategoricalDtype(DIRECTIONS),
+    'trip_duration': 'float32',
+    'distance_km': 'float32',
+    'fuel_efficiency_l_per_100km': 'float32',
+    'fuel_used_l': 'float32',
+    'traffic_condition': 'string',
+    'day_of_week': pd.CategoricalDtype(DAYS),
+    'co2_emissions_kg': 'float32',
+}
+
+DERIVED_COLUMNS = ['departure_hour', 'avg_speed', 'co2_per_km', 'traffic_label', 'direction_binary']
+# CSV columns each derived column is computed from
+DERIVED_INPUTS = {
+    'departure_hour': ['departure_time'],
+    'avg_speed': ['distance_km', 'trip_duration'],
+    'co2_per_km': ['co2_emissions_kg', 'distance_km'],
+    'traffic_label': ['traffic_condition'],
+    'direction_binary': ['trip_direction'],
+}
+
+
+def normalize_traffic(values):
+    """Map 0/1/2 or low/moderate/high (any case) to int8 codes, unknown -> -1"""
+    codes = values.astype('string').str.strip().str.lower().map(TRAFFIC_CODES)
+    return codes.fillna(UNKNOWN_TRAFFIC).astype('int8')
+
+
+def departure_hours(times):
+    """Hour of an 'HH:MM' string, without a full datetime parse"""
+    # Parsed once per distinct time (at most 1440 of them), then gathered
+    codes, uniques = pd.factorize(times, use_na_sentinel=False)
+    uniques = pd.Series(uniques, dtype='string')
+    hours = pd.to_numeric(uniques.str.split(':', n=1).str[0], errors='coerce').fillna(-1).astype('int8')
+    return pd.Series(hours.to_numpy()[codes], index=times.index, dtype='int8')
+
+
+def add_derived_features(df):
+    """Add the derived columns the analysis and model scripts share (in place)"""
+    if 'traffic_condition' in df and df['traffic_condition'].dtype != 'int8':
+        df['traffic_condition'] = normalize_traffic(df['traffic_condition'])
+    if 'date' in df and not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d', errors='coerce')
+
+    if 'departure_time' in df:
+        df['departure_hour'] = departure_hours(df['departure_time'])
+    if 'distance_km' in df and 'trip_duration' in df:
+        df['avg_speed'] = df['distance_km'] / (df['trip_duration'] / 60)
+    if 'co2_emissions_kg' in df and 'distance_km' in df:
+        df['co2_per_km'] = df['co2_emissions_kg'] / df['distance_km']
+    if 'traffic_condition' in df:
+        labels = pd.Categorical.from_codes(
+            df['traffic_condition'],
+            categories=list(TRAFFIC_LABELS.values()),
+            ordered=True,
+        )
+        df['traffic_label'] = pd.Series(labels, index=df.index)
+    if 'trip_direction' in df:
+        df['direction_binary'] = (df['trip_direction'] == 'Home to Campus').astype('int8')
+    return df
+
+
+def iter_chunks(path=DATA_FILE, chunksize=DEFAULT_CHUNK_SIZE, usecols=None, derived=True, names=None,
+                validate=False):
+    """
+    Yield DataFrame chunks of the commute CSV with compact dtypes.
+
+    path may also be an open file. usecols limits the columns that are
+    parsed; derived columns are only added when their inputs were loaded.
+    Pass names when reading a header-less slice of the file (e.g. from a
+    saved offset). With validate, rows that fail trip_validation's checks
+    (duplicates only within this call) are dropped; every column has to be
+    parsed to check a row, so usecols then only trims the result.
+    """
+    if validate:
+        yield from _iter_valid_chunks(path, chunksize, usecols, derived, names)
+        return
+    dtypes = DTYPES if usecols is None else {c: DTYPES[c] for c in usecols if c in DTYPES}
+    header = 'infer' if names is None else None
+    reader = pd.read_csv(path, dtype=dtypes, usecols=usecols, chunksize=chunksize,
+                         names=names, header=header)
+    with reader:
+        for chunk in profiling.iterate('csv_load', reader):
+            if derived:
+                with profiling.span('derived_features'):
+                    add_derived_features(chunk)
+            elif 'traffic_condition' in chunk:
+                chunk['traffic_condition'] = normalize_traffic(chunk['traffic_condition'])
+            yield chunk
+
+
+def _iter_valid_chunks(path, chunksize, usecols, derived, names):
+    # Imported here: trip_validation builds on this module
+    from trip_validation import TripValidator
+
+    validator = TripValidator()
+    loaded = set(DTYPES if usecols is None else usecols)
+    keep = set(loaded)
+    if derived:
+        keep.update(column for column, inputs in DERIVED_INPUTS.items() if loaded.issuperset(inputs))
+    header = 'infer' if names is None else None
+    reader = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize, names=names, header=header)
+    with reader:
+        for raw in profiling.iterate('csv_load', reader):
+            with profiling.span('validation'):
+                clean, _ = validator.validate(raw)
+            if len(clean):
+                yield clean[[column for column in clean.columns if column in keep]]
+
+
+class BoundedReader(io.RawIOBase):
+    """Read-only view of a file between two byte offsets"""
+
+    def __init__(self, f, end):
+        self._f = f
+        self._end = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        remaining = self._end - self._f.tell()
+        if remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:remaining]
+        return self._f.readinto(view)
+
+
+def last_complete_line_end(f, size):
+    """Offset just past the last newline, so a half-written row is left for later"""
+    position = size
+    block = 65536
+    while position > 0:
+        start = max(0, position - block)
+        f.seek(start)
+        data = f.read(position - start)
+        index = data.rfind(b'\n')
+        if index >= 0:
+            return start + index + 1
+        position = start
+    return 0
+
+
+def csv_layout(path):
+    """(column names, first data byte, end of the last complete row)"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        names = f.readline().decode().strip().split(',')
+        start = f.tell()
+        return names, start, max(last_complete_line_end(f, size), start)
+
+
+def csv_ranges(path, n_parts):
+    """
+    Split the data rows of a CSV into at most n_parts byte ranges that end on
+    line breaks; returns (column names, [(start, end), ...]) for iter_range_chunks
+    """
+    names, start, end = csv_layout(path)
+    bounds = [start]
+    with open(path, 'rb') as f:
+        for i in range(1, n_parts):
+            f.seek(start + (end - start) * i // n_parts)
+            f.readline()
+            bounds.append(min(max(f.tell(), bounds[-1]), end))
+    bounds.append(end)
+    return names, [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def iter_range_chunks(path, start, end, names, chunksize=DEFAULT_CHUNK_SIZE, usecols=None, derived=True,
+                      validate=False):
+    """
+    iter_chunks over the header-less rows between byte offsets start and end,
+    e.g. the rows appended since a saved offset (names is the CSV header)
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        reader = io.BufferedReader(BoundedReader(f, end))
+        yield from iter_chunks(reader, chunksize=chunksize, usecols=usecols, derived=derived, names=names,
+                               validate=validate)
+
+
+def file_hash(path, block_size=1 << 20):
+    """SHA-1 of a file's contents"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_commute_data(path=DATA_FILE, chunksize=DEFAULT_CHUNK_SIZE, usecols=None, derived=True, validate=False):
+    """Load the whole CSV (for data that fits in memory) via iter_chunks"""
+    chunks = list(iter_chunks(path, chunksize=chunksize, usecols=usecols, derived=derived, validate=validate))
+    if not chunks:
+        return pd.read_csv(path, dtype=DTYPES, usecols=usecols, nrows=0)
+    return pd.concat(chunks, ignore_index=True)
@@ -0,0 +1,269 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from aggregate_cache import SUMMARY_STATS, ColumnStats, QuantileSketch
+from commute_loader import DATA_FILE, DEFAULT_CHUNK_SIZE, NUMERIC_COLUMNS, csv_ranges, iter_range_chunks
+from feature_pipeline import FeaturePipeline
+
+# One-pass correlation matrices and summaries, chunk by chunk. Each
+# accumulator keeps:
+#   - the row count, column means and the co-moment matrix
+#     sum((x - mean)(x - mean)^T), combined across chunks and workers with
+#     Chan et al.'s update, for covariance and Pearson correlation
+#   - counts per quantile-sketch bucket (relative width alpha) for every
+#     column, and per pair of buckets for every pair of columns. Ranks are
+#     assigned per bucket (mid-rank) at the end, so Spearman correlation is
+#     exact up to values that share a bucket being treated as ties.
+#   - a ColumnStats per column for describe()-style summaries
+# Everything merges by addition, so the CSV is split into byte ranges that
+# are summarized in parallel and merged, per cohort, without ever loading the
+# whole file.
+
+DEFAULT_COHORTS = ['trip_direction', 'day_of_week', 'traffic_label']
+DEFAULT_ALPHA = 0.001
+OVERALL = 'all'
+METHODS = ['pearson', 'spearman']
+
+
+def _merge_counts(keys, counts, new_keys, new_counts):
+    """Add two (keys (m, d) int64, counts (m,)) histograms, keeping keys unique and sorted"""
+    keys = np.concatenate([keys, new_keys])
+    counts = np.concatenate([counts, new_counts])
+    if len(keys) == 0:
+        return keys, counts
+    order = np.lexsort(keys.T[::-1])
+    keys, counts = keys[order], counts[order]
+    starts = np.flatnonzero(np.concatenate([[True], (keys[1:] != keys[:-1]).any(axis=1)]))
+    return keys[starts], np.add.reduceat(counts, starts)
+
+
+def _pair_histogram(first, second):
+    """
+    Counts of each (first, second) key combination, from the (unique keys,
+    inverse) of each column; the pair is packed into one int64 so a 1-D
+    unique does the work
+    """
+    (keys_a, inverse_a), (keys_b, inverse_b) = first, second
+    packed, counts = np.unique(inverse_a * len(keys_b) + inverse_b, return_counts=True)
+    keys = np.column_stack([keys_a[packed // len(keys_b)], keys_b[packed % len(keys_b)]])
+    return keys, counts.astype(np.int64)
+
+
+class CorrelationStats:
+    """Mergeable moments and rank histograms of a set of numeric columns"""
+
+    def __init__(self, columns=NUMERIC_COLUMNS, alpha=DEFAULT_ALPHA):
+        self.columns = list(columns)
+        self.alpha = alpha
+        k = len(self.columns)
+        self.count = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))
+        self._sketch = QuantileSketch(alpha)
+        self.pairs = [(i, j) for i in range(k) for j in range(i + 1, k)]
+        empty = (np.empty((0, 1), dtype=np.int64), np.empty(0, dtype=np.int64))
+        self.marginals = [empty] * k
+        self.joint = [(np.empty((0, 2), dtype=np.int64), np.empty(0, dtype=np.int64))] * len(self.pairs)
+        self.summaries = [ColumnStats() for _ in self.columns]
+
+    def update(self, data):
+        """Fold in a DataFrame (with these columns) or an (n, k) array"""
+        if isinstance(data, pd.DataFrame):
+            X = data[self.columns].to_numpy(dtype=np.float64)
+        else:
+            X = np.asarray(data, dtype=np.float64).reshape(-1, len(self.columns))
+        for column, summary in enumerate(self.summaries):
+            summary.update(X[:, column])
+        # Correlations use rows with every column present
+        X = X[~np.isnan(X).any(axis=1)]
+        n = len(X)
+        if n == 0:
+            return self
+
+        batch_mean = X.mean(axis=0)
+        centered = X - batch_mean
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.comoment += centered.T @ centered + np.outer(delta, delta) * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+
+        # Bucket keys per column as (unique keys, inverse), shared by its marginal and every pair
+        buckets = [np.unique(self._sketch.ordered_keys(X[:, column]), return_inverse=True)
+                   for column in range(X.shape[1])]
+        for column, (keys, inverse) in enumerate(buckets):
+            counts = np.bincount(inverse, minlength=len(keys)).astype(np.int64)
+            self.marginals[column] = _merge_counts(*self.marginals[column], keys[:, None], counts)
+        for p, (i, j) in enumerate(self.pairs):
+            self.joint[p] = _merge_counts(*self.joint[p], *_pair_histogram(buckets[i], buckets[j]))
+        return self
+
+    def merge(self, other):
+        if other.count:
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            self.comoment += other.comoment + np.outer(delta, delta) * self.count * other.count / total
+            self.mean += delta * other.count / total
+            self.count = total
+            self.marginals = [_merge_counts(*mine, *theirs) for mine, theirs in zip(self.marginals, other.marginals)]
+            self.joint = [_merge_counts(*mine, *theirs) for mine, theirs in zip(self.joint, other.joint)]
+        for mine, theirs in zip(self.summaries, other.summaries):
+            mine.merge(theirs)
+        return self
+
+    def _frame(self, matrix):
+        return pd.DataFrame(matrix, index=self.columns, columns=self.columns)
+
+    def covariance(self, ddof=1):
+        if self.count <= ddof:
+            return self._frame(np.full_like(self.comoment, np.nan))
+        return self._frame(self.comoment / (self.count - ddof))
+
+    def pearson(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(np.diag(self.comoment))
+            matrix = self.comoment / np.outer(std, std)
+        np.fill_diagonal(matrix, np.where(std > 0, 1.0, np.nan))
+        return self._frame(np.clip(matrix, -1, 1))
+
+    def _bucket_ranks(self, column):
+        """Mid-rank of every bucket of a column, as a (sorted keys, ranks) pair"""
+        keys, counts = self.marginals[column]
+        before = np.cumsum(counts) - counts
+        return keys[:, 0], before + (counts + 1) / 2
+
+    def spearman(self):
+        """Spearman correlation from per-bucket mid-ranks (values within alpha of each other tie)"""
+        k = len(self.columns)
+        matrix = np.full((k, k), np.nan)
+        if self.count < 2:
+            return self._frame(matrix)
+        ranks = [self._bucket_ranks(column) for column in range(k)]
+        mean_rank = (self.count + 1) / 2
+        # Sum of squared deviations of the ranks per column (smaller than n(n^2-1)/12 when there are ties)
+        spread = []
+        for column, (keys, rank) in enumerate(ranks):
+            spread.append(float(np.dot(self.marginals[column][1], (rank - mean_rank) ** 2)))
+            matrix[column, column] = 1.0 if spread[-1] > 0 else np.nan
+        for p, (i, j) in enumerate(self.pairs):
+            keys, counts = self.joint[p]
+            rank_i = ranks[i][1][np.searchsorted(ranks[i][0], keys[:, 0])]
+            rank_j = ranks[j][1][np.searchsorted(ranks[j][0], keys[:, 1])]
+            co = float(np.dot(counts, (rank_i - mean_rank) * (rank_j - mean_rank)))
+            denominator = np.sqrt(spread[i] * spread[j])
+            matrix[i, j] = matrix[j, i] = co / denominator if denominator > 0 else np.nan
+        return self._frame(np.clip(matrix, -1, 1))
+
+    def correlation(self, method='pearson'):
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r}; expected one of {METHODS}")
+        return self.pearson() if method == 'pearson' else self.spearman()
+
+    def histogram(self, column):
+        """
+        Frame of (column value, 'count') per sketch bucket of one column, over
+        rows with every column present; values are accurate to alpha
+        """
+        keys, counts = self.marginals[self.columns.index(column)]
+        return pd.DataFrame({column: self._sketch.ordered_values(keys[:, 0]), 'count': counts})
+
+    def describe(self):
+        """describe()-style table (statistics x columns); quantiles come from the sketches"""
+        table = pd.DataFrame({column: summary.describe() for column, summary in zip(self.columns, self.summaries)})
+        return table.reindex(SUMMARY_STATS)
+
+
+class CohortCorrelations:
+    """CorrelationStats for all rows and for each value of each cohort column"""
+
+    def __init__(self, columns=NUMERIC_COLUMNS, cohort_columns=DEFAULT_COHORTS, alpha=DEFAULT_ALPHA):
+        self.columns = list(columns)
+        self.cohort_columns = list(cohort_columns)
+        self.alpha = alpha
+        self.stats = {OVERALL: CorrelationStats(self.columns, alpha)}
+
+    def _get(self, name):
+        if name not in self.stats:
+            self.stats[name] = CorrelationStats(self.columns, self.alpha)
+        return self.stats[name]
+
+    def update(self, chunk):
+        self.stats[OVERALL].update(chunk)
+        for column in self.cohort_columns:
+            for value, rows in chunk.groupby(column, observed=True):
+                self._get(f"{column}={value}").update(rows)
+        return self
+
+    def merge(self, other):
+        for name, stats in other.stats.items():
+            self._get(name).merge(stats)
+        return self
+
+    def cohorts(self):
+        return list(self.stats)
+
+    def __getitem__(self, name):
+        return self.stats[name]
+
+    def correlations(self, method='pearson', min_rows=3):
+        """{cohort: correlation matrix} for cohorts with at least min_rows complete rows"""
+        return {name: stats.correlation(method) for name, stats in self.stats.items() if stats.count >= min_rows}
+
+
+def _summarize_range(task):
+    path, start, end, names, columns, cohort_columns, alpha, chunk_size = task
+    result = CohortCorrelations(columns, cohort_columns, alpha)
+    usecols = FeaturePipeline.source_columns(columns + cohort_columns)
+    for chunk in iter_range_chunks(path, start, end, names, chunksize=chunk_size, usecols=usecols):
+        result.update(chunk)
+    return result
+
+
+def compute_correlations(path=DATA_FILE, columns=NUMERIC_COLUMNS, cohort_columns=DEFAULT_COHORTS,
+                         max_workers=None, chunk_size=DEFAULT_CHUNK_SIZE, alpha=DEFAULT_ALPHA):
+    """
+    CohortCorrelations over a commute CSV in one streaming pass; byte ranges
+    of the file are summarized in max_workers processes and merged
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    names, ranges = csv_ranges(path, max_workers)
+    tasks = [(path, start, end, names, list(columns), list(cohort_columns), alpha, chunk_size)
+             for start, end in ranges]
+    if max_workers == 1 or len(tasks) <= 1:
+        parts = [_summarize_range(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            parts = list(pool.map(_summarize_range, tasks))
+
+    result = CohortCorrelations(columns, cohort_columns, alpha)
+    for part in parts:
+        result.merge(part)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming correlation matrices per cohort")
+    parser.add_argument('--data', default=DATA_FILE)
+    parser.add_argument('--method', choices=METHODS, default='pearson')
+    parser.add_argument('--cohorts', nargs='*', default=DEFAULT_COHORTS)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = compute_correlations(args.data, cohort_columns=args.cohorts, max_workers=args.workers)
+    seconds = time.perf_counter() - start
+    rows = result[OVERALL].count
+    print(f"{rows:,} trips summarized in {seconds:.2f}s ({rows / seconds:,.0f} rows/sec)")
+    with pd.option_context('display.width', 140):
+        for name, matrix in result.correlations(args.method).items():
+            print(f"\n{args.method.capitalize()} correlation, {name} ({result[name].count:,} trips):")
+            print(matrix.round(3).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -4,17 +4,30 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
 
-# Load data
-df = pd.read_csv('../commute_data.csv')
-
-# Create correlation matrix and visualization
-numeric_df = df[['trip_duration', 'distance_km', 'fuel_efficiency_l_per_100km', 
-                'fuel_used_l', 'co2_emissions_kg']]
-correlation_matrix = numeric_df.corr()
-
-plt.figure(figsize=(10, 8))
-sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', fmt='.2f', linewidths=0.5)
-plt.title('Correlation Matrix of Commute Variables', fontsize=16)
-plt.tight_layout()
-plt.savefig('correlation_matrix.png', dpi=300)
-plt.show()
\ No newline at end of file
+from commute_loader import DATA_FILE, NUMERIC_COLUMNS
+from correlation_engine import OVERALL, CorrelationStats, compute_correlations
+
+
+def plot_correlation_heatmap(correlation_matrix, title='Correlation Matrix of Commute Variables'):
+    """Heatmap of a precomputed correlation matrix (e.g. from correlation_engine)"""
+    fig = plt.figure(figsize=(10, 8))
+    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', fmt='.2f', linewidths=0.5)
+    plt.title(title, fontsize=16)
+    plt.tight_layout()
+    return fig
+
+
+def plot_correlation_matrix(df):
+    """Heatmap of correlations between the numeric commute variables"""
+    # Create correlation matrix and visualization
+    correlation_matrix = CorrelationStats(NUMERIC_COLUMNS).update(df).pearson()
+    return plot_correlation_heatmap(correlation_matrix)
+
+
+if __name__ == "__main__":
+    # One streaming pass over the CSV; the whole dataset is never loaded
+    correlations = compute_correlations(DATA_FILE, NUMERIC_COLUMNS, cohort_columns=[])
+
+    plot_correlation_heatmap(correlations[OVERALL].pearson())
+    plt.savefig('correlation_matrix.png', dpi=300)
+    plt.show()
@@ -0,0 +1,146 @@
+import argparse
+import time
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from carbon_model import FEATURES, CarbonFootprintNN
+from commute_loader import DATA_FILE, load_commute_data
+from trainer import regression_metrics, train_model
+
+# K-fold cross-validation for CarbonFootprintNN. The feature matrix is built
+# once, shuffled once and placed in shared memory, so every fold is a
+# contiguous slice of it and worker processes attach to the same storage.
+# Fold-local scaler statistics come from whole-matrix sums minus the held-out
+# slice's sums, so no training subset is gathered just to fit a scaler.
+# Early stopping watches a validation slice of each fold's training rows;
+# the held-out fold only scores the final model.
+
+TARGET = 'co2_emissions_kg'
+VALIDATION_FRACTION = 0.2
+
+_shared = {}
+
+
+def load_shared_data(data_file=DATA_FILE, seed=42):
+    """Feature matrix and targets as float32 tensors in shared memory, rows shuffled once"""
+    df = load_commute_data(data_file, usecols=FEATURES + [TARGET], derived=False)
+    order = np.random.default_rng(seed).permutation(len(df))
+    X = torch.from_numpy(df[FEATURES].to_numpy(dtype=np.float32)[order]).share_memory_()
+    y = torch.from_numpy(df[TARGET].to_numpy(dtype=np.float32)[order]).reshape(-1, 1).share_memory_()
+    return X, y
+
+
+def fold_bounds(n, k):
+    """[(start, stop)] of k near-equal contiguous folds"""
+    edges = np.linspace(0, n, k + 1).round().astype(int)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def column_sums(X):
+    """Float64 per-column sums and sums of squares"""
+    X64 = X.double()
+    return X64.sum(0), (X64 ** 2).sum(0)
+
+
+def fold_scaler_stats(X, start, stop, totals=None):
+    """Mean/std of every row outside X[start:stop], from the totals minus the fold's sums"""
+    total_sum, total_sq = column_sums(X) if totals is None else totals
+    held_out = X[start:stop].double()
+    n_train = len(X) - (stop - start)
+    mean = (total_sum - held_out.sum(0)) / n_train
+    var = (total_sq - (held_out ** 2).sum(0)) / n_train - mean ** 2
+    scale = var.clamp_min(0).sqrt()
+    scale[scale == 0] = 1.0
+    return mean.float(), scale.float()
+
+
+def _init_worker(X, y, threads):
+    torch.set_num_threads(threads)
+    _shared.update(X=X, y=y, totals=column_sums(X))
+
+
+def run_fold(task):
+    fold, start, stop, params, seed = task
+    X, y = _shared['X'], _shared['y']
+    t0 = time.perf_counter()
+    mean, scale = fold_scaler_stats(X, start, stop, _shared['totals'])
+
+    # The training rows are the two slices around the held-out fold; they are
+    # joined (one copy per fold) and scaled in place
+    X_train = torch.cat([X[:start], X[stop:]]).sub_(mean).div_(scale)
+    y_train = torch.cat([y[:start], y[stop:]])
+    X_test = (X[start:stop] - mean) / scale
+    y_test = y[start:stop]
+    # Rows are already shuffled, so the last training rows are a random validation slice
+    n_val = max(1, round(len(X_train) * VALIDATION_FRACTION))
+
+    torch.manual_seed(seed + fold)
+    model = CarbonFootprintNN(X.shape[1], hidden_dims=params.get('hidden_dims', (32, 16)))
+    train_params = {k: v for k, v in params.items() if k != 'hidden_dims'}
+    history = train_model(model, X_train[:-n_val], y_train[:-n_val], X_train[-n_val:], y_train[-n_val:],
+                          seed=seed + fold, **train_params)
+    with torch.no_grad():
+        predictions = model(X_test).numpy()
+
+    metrics = regression_metrics(y_test.numpy(), predictions)
+    metrics.update(fold=fold, n_test=stop - start, epochs=history['epochs_run'],
+                   seconds=time.perf_counter() - t0)
+    return metrics
+
+
+def cross_validate(k=5, data_file=DATA_FILE, max_workers=None, threads_per_worker=1, seed=42, **params):
+    """
+    Train one model per fold concurrently. Returns (per-fold metrics list,
+    summary dict with mean/std of each metric and the total wall time).
+    """
+    start = time.perf_counter()
+    X, y = load_shared_data(data_file, seed)
+    tasks = [(fold, a, b, params, seed) for fold, (a, b) in enumerate(fold_bounds(len(X), k))]
+
+    workers = max_workers or min(k, mp.cpu_count())
+    if workers == 1:
+        _init_worker(X, y, threads_per_worker)
+        folds = [run_fold(task) for task in tasks]
+    else:
+        with mp.get_context('spawn').Pool(workers, initializer=_init_worker,
+                                          initargs=(X, y, threads_per_worker)) as pool:
+            folds = pool.map(run_fold, tasks)
+
+    summary = {}
+    for metric in ['rmse', 'mae', 'r2']:
+        values = np.array([fold[metric] for fold in folds])
+        summary[f'{metric}_mean'] = float(values.mean())
+        summary[f'{metric}_std'] = float(values.std(ddof=1)) if k > 1 else 0.0
+    summary['wall_time'] = time.perf_counter() - start
+    return folds, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="K-fold cross-validation of CarbonFootprintNN")
+    parser.add_argument('--data', default=DATA_FILE)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--epochs', type=int, default=500)
+    parser.add_argument('--patience', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    args = parser.parse_args()
+
+    folds, summary = cross_validate(
+        args.folds, args.data, args.workers, args.threads_per_worker,
+        num_epochs=args.epochs, patience=args.patience, batch_size=args.batch_size,
+    )
+    print(f"{args.folds}-fold cross-validation:")
+    for fold in folds:
+        print(f"  Fold {fold['fold'] + 1}: RMSE {fold['rmse']:.4f} kg, MAE {fold['mae']:.4f} kg, "
+              f"R² {fold['r2']:.4f} ({fold['n_test']} test trips, {fold['epochs']} epochs, {fold['seconds']:.1f}s)")
+    print(f"RMSE: {summary['rmse_mean']:.4f} ± {summary['rmse_std']:.4f} kg")
+    print(f"MAE:  {summary['mae_mean']:.4f} ± {summary['mae_std']:.4f} kg")
+    print(f"R²:   {summary['r2_mean']:.4f} ± {summary['r2_std']:.4f}")
+    print(f"Total wall time: {summary['wall_time']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
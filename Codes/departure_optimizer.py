@@ -0,0 +1,298 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from commute_loader import (DATA_FILE, DAYS, DEFAULT_CHUNK_SIZE, DIRECTIONS, TRAFFIC_LABELS, departure_hours,
+                            iter_range_chunks, last_complete_line_end)
+
+# "When should I leave to emit least?" The recorded trips are folded into a
+# per-(weekday, hour, direction, traffic level) table of trip counts,
+# distances and durations. commute_data.csv only grows by appended rows, so
+# like AggregateCache the profile remembers the byte offset it has read and
+# only parses what was appended since; a cheap stat() on each query notices
+# new rows. The cache also records the CSV's absolute path and a hash of its
+# first FINGERPRINT_BYTES, and starts over when either no longer matches.
+# Sparse cells are shrunk towards the same hour on any weekday, then towards
+# the direction as a whole.
+#
+# A query builds one model input per (candidate slot, traffic level), with
+# the duration taken from that slot's pace at that traffic level, scores
+# them all in one batch and ranks the slots by expected CO2.
+
+MODEL_FILE = '../commute_carbon_pytorch_model.pt'
+PROFILE_FILE = '../departure_profile.json'
+PROFILE_VERSION = 3
+FINGERPRINT_BYTES = 1 << 16
+
+HOURS = 24
+LEVELS = len(TRAFFIC_LABELS)
+SHAPE = (len(DAYS), HOURS, len(DIRECTIONS), LEVELS)
+PRIOR_TRIPS = 2.0  # weight of the pooled estimate, in trips, when smoothing a cell
+DEFAULT_TOP = 5
+
+PROFILE_COLUMNS = ['departure_time', 'trip_direction', 'trip_duration', 'distance_km',
+                   'traffic_condition', 'day_of_week']
+
+
+def _fingerprint(path, length):
+    """[length, SHA-1 of the first length bytes of path]"""
+    with open(path, 'rb') as f:
+        return [length, hashlib.sha1(f.read(length)).hexdigest()]
+
+
+def _shrink(num, den, prior, weight):
+    """(num + prior * weight) / (den + weight): a ratio pulled towards prior where den is small"""
+    return (num + prior * weight) / (den + weight)
+
+
+class TrafficProfile:
+    """Traffic mix and pace per departure slot of commute_data.csv, updated from appended rows only"""
+
+    def __init__(self, csv_path=DATA_FILE, cache_path=PROFILE_FILE):
+        self.csv_path = csv_path
+        self.cache_path = cache_path
+        self._reset()
+        if cache_path and os.path.exists(cache_path):
+            self._load()
+        self._stat = None
+        self._estimates = None
+
+    def _reset(self):
+        self.offset = 0
+        self.header = None
+        self.fingerprint = None
+        self.n_rows = 0
+        self.counts = np.zeros(SHAPE)
+        self.distance = np.zeros(SHAPE)
+        self.duration = np.zeros(SHAPE)
+        self._estimates = None
+
+    def _load(self):
+        with open(self.cache_path) as f:
+            data = json.load(f)
+        # The cache file is shared, so it may describe another CSV
+        if data.get('version') != PROFILE_VERSION or data['csv_path'] != os.path.abspath(self.csv_path):
+            return
+        self.offset = data['offset']
+        self.header = data['header']
+        self.fingerprint = data['fingerprint']
+        self.n_rows = data['n_rows']
+        for name in ('counts', 'distance', 'duration'):
+            setattr(self, name, np.array(data[name], dtype=np.float64).reshape(SHAPE))
+
+    def save(self):
+        data = {
+            'version': PROFILE_VERSION,
+            'csv_path': os.path.abspath(self.csv_path),
+            'offset': self.offset,
+            'header': self.header,
+            'fingerprint': self.fingerprint,
+            'n_rows': self.n_rows,
+            'counts': self.counts.ravel().tolist(),
+            'distance': self.distance.ravel().tolist(),
+            'duration': self.duration.ravel().tolist(),
+        }
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _add_chunk(self, chunk):
+        day = chunk['day_of_week'].cat.codes.to_numpy()
+        direction = chunk['trip_direction'].cat.codes.to_numpy()
+        hour = departure_hours(chunk['departure_time']).to_numpy()
+        traffic = chunk['traffic_condition'].to_numpy()
+        distance = chunk['distance_km'].to_numpy(dtype=np.float64)
+        duration = chunk['trip_duration'].to_numpy(dtype=np.float64)
+        valid = ((day >= 0) & (direction >= 0) & (hour >= 0) & (hour < HOURS) & (traffic >= 0)
+                 & ~np.isnan(distance) & ~np.isnan(duration))
+        cell = (day[valid], hour[valid], direction[valid], traffic[valid])
+        np.add.at(self.counts, cell, 1)
+        np.add.at(self.distance, cell, distance[valid])
+        np.add.at(self.duration, cell, duration[valid])
+        self.n_rows += int(valid.sum())
+
+    def update(self, chunksize=DEFAULT_CHUNK_SIZE, save=True):
+        """Fold rows appended since the last update into the profile; returns the row count added"""
+        size = os.path.getsize(self.csv_path)
+        with open(self.csv_path, 'rb') as f:
+            header = f.readline().decode().strip()
+            # A different header or prefix, or a shorter file, means the CSV was rewritten
+            if (header != self.header or size < self.offset
+                    or (self.fingerprint and _fingerprint(self.csv_path, self.fingerprint[0]) != self.fingerprint)):
+                self._reset()
+                self.header = header
+                self.offset = f.tell()
+
+            end = last_complete_line_end(f, size)
+        if end <= self.offset:
+            return 0
+
+        before = self.n_rows
+        names = header.split(',')
+        for chunk in iter_range_chunks(self.csv_path, self.offset, end, names, chunksize=chunksize,
+                                       usecols=PROFILE_COLUMNS, derived=False):
+            self._add_chunk(chunk)
+        self.offset = end
+        self.fingerprint = _fingerprint(self.csv_path, min(end, FINGERPRINT_BYTES))
+        self._estimates = None
+
+        if save and self.cache_path:
+            self.save()
+        return self.n_rows - before
+
+    def refresh(self):
+        """update() if the CSV changed since the last check; a single stat() otherwise"""
+        stat = os.stat(self.csv_path)
+        key = (stat.st_size, stat.st_mtime_ns)
+        if key != self._stat:
+            self.update()
+            self._stat = key
+        return self
+
+    def estimates(self):
+        """
+        (traffic probabilities, minutes per km, trips) per slot; the first
+        two have SHAPE, trips has SHAPE without the traffic level axis
+        """
+        if self._estimates is not None:
+            return self._estimates
+        if self.n_rows == 0:
+            raise ValueError(f"No usable trips in {self.csv_path}")
+
+        # Pooled levels: every trip per traffic level, per direction, per (hour, direction)
+        overall = [a.sum(axis=(0, 1, 2)) for a in (self.counts, self.distance, self.duration)]
+        per_direction = [a.sum(axis=(0, 1), keepdims=True) for a in (self.counts, self.distance, self.duration)]
+        per_hour = [a.sum(axis=0, keepdims=True) for a in (self.counts, self.distance, self.duration)]
+        cells = [self.counts, self.distance, self.duration]
+        mean_distance = overall[1].sum() / overall[0].sum()
+
+        # Traffic mix, add-one smoothed at the top level
+        probs = (overall[0] + 1) / (overall[0].sum() + LEVELS)
+        # Pace (minutes per km) per traffic level; a level never seen uses the overall pace
+        pace = np.where(overall[1] > 0, overall[2] / np.maximum(overall[1], 1e-9), overall[2].sum() / overall[1].sum())
+        for counts, distance, duration in (per_direction, per_hour, cells):
+            n = counts.sum(axis=-1, keepdims=True)
+            probs = _shrink(counts, n, probs, PRIOR_TRIPS)
+            pace = _shrink(duration, distance, pace, PRIOR_TRIPS * mean_distance)
+
+        self._estimates = (probs, pace, self.counts.sum(axis=-1))
+        return self._estimates
+
+
+def _day_index(day):
+    if isinstance(day, str):
+        # Full name or any prefix naming exactly one day ('Tu' yes, 'T' no), case-insensitive
+        key = day.strip().lower()
+        matches = [i for i, name in enumerate(DAYS) if key and name.lower().startswith(key)]
+        if len(matches) != 1:
+            raise ValueError(f"Unknown or ambiguous day {day!r}; expected one of {DAYS}")
+        return matches[0]
+    if not 0 <= int(day) < len(DAYS):
+        raise ValueError(f"Unknown day {day!r}")
+    return int(day)
+
+
+def _direction_index(direction):
+    if isinstance(direction, str):
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Unknown direction {direction!r}; expected one of {DIRECTIONS}")
+        return DIRECTIONS.index(direction)
+    if int(direction) not in (0, 1):
+        raise ValueError(f"Unknown direction {direction!r}")
+    return int(direction)
+
+
+class DepartureOptimizer:
+    """Ranks departure slots by the model's expected CO2 under each slot's traffic profile"""
+
+    def __init__(self, predictor, profile):
+        self.predictor = predictor
+        self.profile = profile
+
+    def candidates(self, direction, distance_km, fuel_efficiency, days=None, hours=None):
+        """
+        Model inputs for every candidate slot. days defaults to the whole
+        week; hours defaults to hours with recorded trips in this direction.
+        Returns a dict with 'X' ((slots * LEVELS, 4) in FEATURES order) and
+        what rank() needs to turn its predictions into a ranking.
+        """
+        probs, pace, trips = self.profile.refresh().estimates()
+        direction = _direction_index(direction)
+        days = range(len(DAYS)) if days is None else [_day_index(d) for d in np.atleast_1d(days)]
+        if hours is None:
+            hours = np.flatnonzero(trips[:, :, direction].sum(axis=0))
+        hours = [int(h) for h in np.atleast_1d(hours) if 0 <= int(h) < HOURS]
+        if not hours or distance_km <= 0:
+            raise ValueError("Need at least one hour in 0-23 and a positive distance")
+
+        day, hour = (a.ravel() for a in np.meshgrid(np.asarray(days), np.asarray(hours), indexing='ij'))
+        slot_probs = probs[day, hour, direction]
+        duration = pace[day, hour, direction] * distance_km
+        # One row per (slot, traffic level): level, duration at that level, distance, efficiency
+        X = np.empty((len(day), LEVELS, 4), dtype=np.float32)
+        X[:, :, 0] = np.arange(LEVELS)
+        X[:, :, 1] = duration
+        X[:, :, 2] = distance_km
+        X[:, :, 3] = fuel_efficiency
+        return {'X': X.reshape(-1, 4), 'day': day, 'hour': hour, 'probs': slot_probs,
+                'duration': duration, 'trips': trips[day, hour, direction]}
+
+    @staticmethod
+    def rank(candidates, predictions, top=DEFAULT_TOP):
+        """Slots sorted by expected CO2 (kg), lowest first"""
+        predictions = np.asarray(predictions, dtype=np.float64).reshape(-1, LEVELS)
+        probs = candidates['probs']
+        expected = (probs * predictions).sum(axis=1)
+        order = np.argsort(expected, kind='stable')[:top]
+        return [
+            {
+                'day_of_week': DAYS[candidates['day'][i]],
+                'departure_hour': int(candidates['hour'][i]),
+                'departure_time': f"{candidates['hour'][i]:02d}:00",
+                'expected_co2_kg': round(float(expected[i]), 4),
+                'expected_duration_min': round(float((probs[i] * candidates['duration'][i]).sum()), 1),
+                'traffic_probs': {label: round(float(p), 3) for label, p in zip(TRAFFIC_LABELS.values(), probs[i])},
+                'recorded_trips': int(candidates['trips'][i]),
+            }
+            for i in order
+        ]
+
+    def best_departures(self, direction, distance_km, fuel_efficiency, days=None, hours=None, top=DEFAULT_TOP):
+        """Lowest-CO2 departure slots for a trip, scored in a single predict() call"""
+        slots = self.candidates(direction, distance_km, fuel_efficiency, days, hours)
+        return self.rank(slots, self.predictor.predict(slots['X']), top)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank departure times by expected CO2")
+    parser.add_argument('--direction', choices=DIRECTIONS, default=DIRECTIONS[0])
+    parser.add_argument('--distance', type=float, required=True, help="Trip distance in km")
+    parser.add_argument('--efficiency', type=float, required=True, help="Fuel efficiency in l/100km")
+    parser.add_argument('--days', nargs='+', help="Days to consider (default: the whole week)")
+    parser.add_argument('--hours', nargs='+', type=int, help="Hours to consider (default: hours with recorded trips)")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP)
+    parser.add_argument('--checkpoint', default=MODEL_FILE)
+    parser.add_argument('--data', default=DATA_FILE)
+    args = parser.parse_args()
+
+    from carbon_model import CarbonPredictor
+
+    optimizer = DepartureOptimizer(CarbonPredictor.load(args.checkpoint), TrafficProfile(args.data))
+    start = time.perf_counter()
+    ranked = optimizer.best_departures(args.direction, args.distance, args.efficiency, args.days, args.hours,
+                                       args.top)
+    print(f"Best departures ({args.direction}, {args.distance:g} km, {args.efficiency:g} l/100km) "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms:")
+    for i, slot in enumerate(ranked, 1):
+        traffic = ', '.join(f"{label} {p:.0%}" for label, p in slot['traffic_probs'].items())
+        print(f"  {i}. {slot['day_of_week']:<10}{slot['departure_time']}  {slot['expected_co2_kg']:.3f} kg  "
+              f"~{slot['expected_duration_min']:.0f} min  ({traffic}; {slot['recorded_trips']} trips recorded)")
+
+
+if __name__ == '__main__':
+    main()
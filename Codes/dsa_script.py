@@ -1,17 +1,19 @@
-import csv
 from datetime import datetime
-import os
+
+import emissions
+from emissions import EMISSION_FACTORS
+from trip_ingest import REJECTED_FILE, TripWriter
 
 # Constants
-EMISSION_FACTOR = 2.31  # kg CO2 per liter of gasoline
+EMISSION_FACTOR = EMISSION_FACTORS['gasoline']  # kg CO2 per liter of gasoline
 DATA_FILE = "../commute_data.csv"
 
-def calculate_co2(fuel_consumption):
-    return fuel_consumption * EMISSION_FACTOR
+def calculate_co2(fuel_consumption, fuel_type='gasoline'):
+    return emissions.calculate_co2(fuel_consumption, fuel_type)
 
 def calculate_fuel_used(distance_km, fuel_efficiency):
     # Fuel efficiency is in liters per 100 km
-    return (distance_km * fuel_efficiency) / 100
+    return emissions.calculate_fuel_used(distance_km, fuel_efficiency)
 
 def collect_daily_data():
     # Ask user for trip direction
@@ -48,14 +50,15 @@ def collect_daily_data():
         "co2_emissions_kg": co2_emissions
     }
     
-    # Save to CSV
-    file_exists = os.path.isfile(DATA_FILE)
-    with open(DATA_FILE, "a", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=data.keys())
-        if not file_exists:
-            writer.writeheader()  # Write header if file is new
-        writer.writerow(data)
+    # Save to CSV (locked append, header written only if the file is new);
+    # a trip that fails validation is set aside in REJECTED_FILE instead
+    with TripWriter(DATA_FILE, rejected_path=REJECTED_FILE) as writer:
+        writer.add(data)
     
+    if writer.rows_rejected:
+        reasons = ', '.join(sorted(writer.validator.report.reasons))
+        print(f"Trip not saved ({reasons}); it was written to {REJECTED_FILE}")
+        return
     print("Data saved successfully!")
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+import numpy as np
+
+# kg CO2 released per liter of fuel burned. Hybrids burn gasoline; their lower
+# consumption is already captured by fuel_efficiency_l_per_100km.
+EMISSION_FACTORS = {
+    'gasoline': 2.31,
+    'diesel': 2.68,
+    'lpg': 1.51,
+    'hybrid': 2.31,
+}
+DEFAULT_FUEL = 'gasoline'
+
+
+def _as_array(values):
+    # Works for scalars, lists, NumPy arrays, pandas Series and pyarrow arrays
+    # (the last two expose __array__, which is zero-copy for null-free columns)
+    return np.asarray(values, dtype=np.float64)
+
+
+def _result(array, like):
+    return float(array) if np.ndim(like) == 0 and array.ndim == 0 else array
+
+
+def emission_factors(fuel_types=DEFAULT_FUEL, factors=None):
+    """
+    Emission factor per row for a fuel type name or an array of names.
+    Unknown fuel types raise ValueError instead of silently producing NaN.
+    """
+    factors = EMISSION_FACTORS if factors is None else factors
+    if isinstance(fuel_types, str):
+        if fuel_types.lower() not in factors:
+            raise ValueError(f"Unknown fuel type {fuel_types!r}; expected one of {sorted(factors)}")
+        return factors[fuel_types.lower()]
+
+    # One lookup per distinct fuel type, then a single gather over all rows.
+    # Categorical columns already carry the codes; anything else is hashed.
+    categorical = getattr(fuel_types, 'cat', fuel_types)
+    if hasattr(categorical, 'codes') and hasattr(categorical, 'categories'):
+        codes = np.asarray(categorical.codes)
+        names = list(categorical.categories)
+    else:
+        import pandas as pd
+        codes, names = pd.factorize(np.asarray(fuel_types))
+    if (codes < 0).any():
+        raise ValueError("Missing fuel type for some trips")
+    table = np.empty(len(names))
+    for i, name in enumerate(names):
+        name = str(name)
+        if name.lower() not in factors:
+            raise ValueError(f"Unknown fuel type {name!r}; expected one of {sorted(factors)}")
+        table[i] = factors[name.lower()]
+    return table[codes]
+
+
+def calculate_fuel_used(distance_km, fuel_efficiency):
+    # Fuel efficiency is in liters per 100 km
+    distance_km = _as_array(distance_km)
+    fuel_used = distance_km * _as_array(fuel_efficiency) / 100
+    return _result(fuel_used, distance_km)
+
+
+def calculate_co2(fuel_used, fuel_type=DEFAULT_FUEL, factors=None):
+    fuel_used = _as_array(fuel_used)
+    co2 = fuel_used * emission_factors(fuel_type, factors)
+    return _result(co2, fuel_used)
+
+
+def recompute_emissions(trips, fuel_type=DEFAULT_FUEL, factors=None):
+    """
+    Recompute fuel_used_l and co2_emissions_kg for every trip in one pass.
+
+    trips is anything indexable by column name (DataFrame, dict of arrays,
+    trip_store.load_columns result). fuel_type is a single fuel name, an array
+    of names per row, or the name of a column in trips holding them.
+    """
+    factors_used = EMISSION_FACTORS if factors is None else factors
+    if isinstance(fuel_type, str) and fuel_type.lower() not in factors_used:
+        if fuel_type not in trips:
+            raise ValueError(f"Unknown fuel type or column {fuel_type!r}; expected one of {sorted(factors_used)}")
+        fuel_type = trips[fuel_type]
+    fuel_used = calculate_fuel_used(trips['distance_km'], trips['fuel_efficiency_l_per_100km'])
+    co2 = calculate_co2(fuel_used, fuel_type, factors)
+    return fuel_used, co2
+
+
+def update_emissions(df, fuel_type=DEFAULT_FUEL, factors=None):
+    """recompute_emissions, written back into df's columns (in place)"""
+    fuel_used, co2 = recompute_emissions(df, fuel_type, factors)
+    df['fuel_used_l'] = fuel_used
+    df['co2_emissions_kg'] = co2
+    return df
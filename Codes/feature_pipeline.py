@@ -0,0 +1,233 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from commute_loader import DATA_FILE, DERIVED_INPUTS, DTYPES, file_hash, load_commute_data
+
+# Memoized preprocessing. The loaded frame (with derived columns), the
+# fitted scaler statistics and the scaled training arrays are each written
+# to a cache directory under a key built from:
+#   - a hash of the CSV's contents
+#   - PIPELINE_VERSION
+#   - the columns or features involved
+# A repeat run on an unchanged CSV loads them from disk instead of
+# preprocessing again. The CSV's hash is itself remembered by
+# (size, mtime), so an unchanged file is not re-read to hash it. Entries
+# are touched when used, and the least recently used ones are deleted once
+# the directory grows past max_bytes.
+#
+# Each artifact declares what it is built from:
+#   frame   <- CSV columns (derived columns pull in their inputs, DERIVED_INPUTS)
+#   scaler  <- frame[features]
+#   tensors <- frame[features + target], scaler
+
+CACHE_DIR = '../.feature_cache'
+HASHES_FILE = 'hashes.json'
+# Bump when loading, derived-column or scaling code changes so old entries are rebuilt
+PIPELINE_VERSION = 3
+DEFAULT_MAX_BYTES = 1 << 30
+TARGET = 'co2_emissions_kg'
+
+
+class FeaturePipeline:
+    """Cached frame / scaler / tensor preparation for one feature set"""
+
+    def __init__(self, features=None, target=TARGET, cache_dir=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 version=PIPELINE_VERSION):
+        self._features = None if features is None else list(features)
+        self.target = target
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def features(self):
+        # Defaults to the model's FEATURES; imported late so frame-only users don't load torch
+        if self._features is None:
+            from carbon_model import FEATURES
+            self._features = list(FEATURES)
+        return self._features
+
+    @staticmethod
+    def source_columns(columns):
+        """CSV columns needed to produce columns (raw or derived), in CSV order"""
+        needed = set()
+        for column in columns:
+            if column in DERIVED_INPUTS:
+                needed.update(DERIVED_INPUTS[column])
+            elif column in DTYPES:
+                needed.add(column)
+            else:
+                raise ValueError(f"Unknown column {column!r}")
+        return [c for c in DTYPES if c in needed]
+
+    # Cache plumbing
+
+    def _data_hash(self, data_file):
+        """file_hash(data_file), reused while the file's size and mtime are unchanged"""
+        path = os.path.join(self.cache_dir, HASHES_FILE)
+        try:
+            with open(path) as f:
+                hashes = json.load(f)
+        except (FileNotFoundError, ValueError):
+            hashes = {}
+        stat = os.stat(data_file)
+        name = os.path.abspath(data_file)
+        entry = hashes.get(name)
+        if entry and entry[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return entry[2]
+
+        digest = file_hash(data_file)
+        hashes[name] = [stat.st_size, stat.st_mtime_ns, digest]
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(hashes, f)
+        os.replace(tmp_path, path)
+        return digest
+
+    def _entry_path(self, kind, data_file, params, suffix):
+        key = json.dumps([self.version, self._data_hash(data_file), kind, params])
+        return os.path.join(self.cache_dir, f"{kind}-{hashlib.sha1(key.encode()).hexdigest()[:16]}{suffix}")
+
+    def _cached(self, kind, data_file, params, suffix, build, save, load):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._entry_path(kind, data_file, params, suffix)
+        if os.path.exists(path):
+            self.hits += 1
+            os.utime(path)  # mark as recently used
+            return load(path)
+
+        self.misses += 1
+        value = build()
+        # np.savez appends .npz to names without it
+        tmp_path = path + '.tmp' + suffix
+        save(tmp_path, value)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return value
+
+    def entries(self):
+        """(path, bytes, last used) of every cached artifact, least recently used first"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name == HASHES_FILE or '.tmp' in name:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            stat = os.stat(path)
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self, keep=None):
+        """Delete least recently used entries until the cache fits in max_bytes; returns the count deleted"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        deleted = 0
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            total -= size
+            deleted += 1
+        return deleted
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            os.remove(path)
+
+    # Artifacts
+
+    def frame(self, data_file=DATA_FILE, columns=None):
+        """load_commute_data() restricted to columns (raw or derived; default all)"""
+        usecols = None if columns is None else self.source_columns(columns)
+
+        def build():
+            df = load_commute_data(data_file, usecols=usecols)
+            return df if columns is None else df[list(columns)]
+
+        return self._cached('frame', data_file, columns, '.pkl', build,
+                            lambda path, df: df.to_pickle(path), pd.read_pickle)
+
+    def scaler(self, data_file=DATA_FILE):
+        """(mean, scale) of the features over every row, as StandardScaler fits them"""
+        def build():
+            X = self.frame(data_file, self.features)[self.features].to_numpy()
+            mean = X.mean(axis=0, dtype=np.float64)
+            scale = X.std(axis=0, dtype=np.float64)
+            scale[scale == 0] = 1.0
+            return mean, scale
+
+        def load(path):
+            with np.load(path) as data:
+                return data['mean'], data['scale']
+
+        return self._cached('scaler', data_file, self.features, '.npz', build,
+                            lambda path, value: np.savez(path, mean=value[0], scale=value[1]), load)
+
+    def arrays(self, data_file=DATA_FILE):
+        """
+        Ready-to-train float32 arrays: 'X' (unscaled), 'X_scaled', 'y' (n, 1),
+        plus the scaler's 'mean' and 'scale'
+        """
+        def build():
+            df = self.frame(data_file, self.features + [self.target])
+            mean, scale = self.scaler(data_file)
+            X = df[self.features].to_numpy(dtype=np.float32)
+            return {
+                'X': X,
+                'X_scaled': ((X - mean) / scale).astype(np.float32),
+                'y': df[self.target].to_numpy(dtype=np.float32).reshape(-1, 1),
+                'mean': mean,
+                'scale': scale,
+            }
+
+        def load(path):
+            with np.load(path) as data:
+                return {name: data[name] for name in data.files}
+
+        return self._cached('tensors', data_file, [self.features, self.target], '.npz', build,
+                            lambda path, value: np.savez(path, **value), load)
+
+    def tensors(self, data_file=DATA_FILE):
+        """(X_scaled, y) as torch tensors sharing memory with arrays()"""
+        import torch
+        arrays = self.arrays(data_file)
+        return torch.from_numpy(arrays['X_scaled']), torch.from_numpy(arrays['y'])
+
+
+def load_features(data_file=DATA_FILE, columns=None, cache_dir=CACHE_DIR):
+    """Cached drop-in for load_commute_data() in the analysis scripts"""
+    return FeaturePipeline(cache_dir=cache_dir).frame(data_file, columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the preprocessing cache")
+    parser.add_argument('--data', default=DATA_FILE)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--clear', action='store_true', help="Delete every cached artifact first")
+    args = parser.parse_args()
+
+    pipeline = FeaturePipeline(cache_dir=args.cache_dir)
+    if args.clear:
+        pipeline.clear()
+    start = time.perf_counter()
+    pipeline.frame(args.data)
+    pipeline.arrays(args.data)
+    print(f"Preprocessed {args.data} in {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({pipeline.hits} cache hits, {pipeline.misses} misses)")
+    for path, size, used in pipeline.entries():
+        print(f"  {os.path.basename(path):<32}{size / 1e6:>8.2f} MB  last used {time.ctime(used)}")
+
+
+if __name__ == '__main__':
+    main()
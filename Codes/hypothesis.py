@@ -4,21 +4,19 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
 
-# Load the commute data
-df = pd.read_csv('../commute_data.csv')
+from feature_pipeline import load_features
 
-# Map numeric traffic_condition values to strings
-traffic_map = {0: 'low', 1: 'moderate', 2: 'high'}
-df['traffic_condition'] = df['traffic_condition'].map(traffic_map)
+# Load the commute data (traffic_label holds Low/Moderate/High)
+df = load_features()
 
 print("\n===== HYPOTHESIS TEST 1: TRAFFIC CONDITION vs CO2 EMISSIONS =====")
 print("H0: Traffic conditions have no effect on CO2 emissions")
 print("H1: Different traffic conditions lead to different CO2 emission levels\n")
 
 # Group data by traffic condition
-low_traffic = df[df['traffic_condition'] == 'low']['co2_emissions_kg']
-moderate_traffic = df[df['traffic_condition'] == 'moderate']['co2_emissions_kg']
-high_traffic = df[df['traffic_condition'] == 'high']['co2_emissions_kg']
+low_traffic = df[df['traffic_label'] == 'Low']['co2_emissions_kg']
+moderate_traffic = df[df['traffic_label'] == 'Moderate']['co2_emissions_kg']
+high_traffic = df[df['traffic_label'] == 'High']['co2_emissions_kg']
 
 traffic_groups = [low_traffic, moderate_traffic, high_traffic]
 traffic_labels = ['low', 'moderate', 'high']
@@ -49,4 +47,14 @@ else:
     print(f"  Using Kruskal-Wallis (non-parametric alternative to ANOVA)")
     print(f"  Result: H={stat:.4f}, p={p_kw:.4f}")
     significant = "SIGNIFICANT" if p_kw < 0.05 else "NOT SIGNIFICANT"
-    print(f"  Conclusion: {significant} difference at α=0.05")
\ No newline at end of file
+    print(f"  Conclusion: {significant} difference at α=0.05")
+
+
+if __name__ == "__main__":
+    from hypothesis_engine import run_tests
+
+    print("\n===== ADDITIONAL TESTS: CO2 EMISSIONS ACROSS FACTORS =====")
+    print("Classic test plus permutation and bootstrap p-values for each factor\n")
+    results = run_tests(df)
+    with pd.option_context('display.width', 120, 'display.max_columns', None):
+        print(results[['factor', 'test', 'statistic', 'p_value', 'significant']].round(4).to_string(index=False))
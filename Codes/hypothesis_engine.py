@@ -0,0 +1,197 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# Runs the traffic-vs-CO2 test from hypothesis.py over many grouping factors.
+# Each test gets the classic path (Shapiro-Wilk per group, then ANOVA or
+# Kruskal-Wallis) plus permutation and bootstrap p-values for the F statistic.
+# Group index arrays are built once per factor and resampling is done in
+# vectorized batches. Independent tests run in a process pool.
+
+ALPHA = 0.05
+DEFAULT_RESAMPLES = 5000
+# Upper bound on resampled values held in memory at once (rows x resamples)
+BATCH_ELEMENTS = 4_000_000
+SHAPIRO_MAX = 5000
+
+DEPARTURE_PERIODS = {'Morning (<12)': (0, 12), 'Afternoon (12-17)': (12, 17), 'Evening (17+)': (17, 24)}
+EFFICIENCY_BANDS = ['Efficient', 'Average', 'Thirsty']
+
+
+def add_test_factors(df):
+    """Add the derived grouping columns the engine can test (in place)"""
+    hours = df['departure_hour']
+    period = pd.Series(pd.NA, index=df.index, dtype='object')
+    for name, (low, high) in DEPARTURE_PERIODS.items():
+        period[(hours >= low) & (hours < high)] = name
+    df['departure_period'] = pd.Categorical(period, categories=list(DEPARTURE_PERIODS), ordered=True)
+    # Tertiles; tied edges merge bins, so name whichever bins survive
+    codes = pd.qcut(df['fuel_efficiency_l_per_100km'], len(EFFICIENCY_BANDS), labels=False, duplicates='drop')
+    n_bins = int(codes.max()) + 1 if codes.notna().any() else 0
+    names = {3: EFFICIENCY_BANDS, 2: [EFFICIENCY_BANDS[0], EFFICIENCY_BANDS[-1]]}.get(n_bins, [EFFICIENCY_BANDS[1]])
+    df['efficiency_band'] = pd.Categorical.from_codes(codes.fillna(-1).astype(int), categories=names, ordered=True)
+    return df
+
+
+# Test name -> grouping column
+FACTORS = {
+    'traffic': 'traffic_label',
+    'direction': 'trip_direction',
+    'weekday': 'day_of_week',
+    'departure_hour': 'departure_period',
+    'efficiency_band': 'efficiency_band',
+}
+
+
+def build_groups(values, labels, min_size=2):
+    """Drop missing rows and encode labels once; returns (values, codes, names)"""
+    values = np.asarray(values, dtype=np.float64)
+    codes, names = pd.factorize(pd.Series(labels), sort=True)
+    keep = (codes >= 0) & ~np.isnan(values)
+    values, codes = values[keep], codes[keep]
+    counts = np.bincount(codes, minlength=len(names))
+    # Groups too small to test are removed and the codes renumbered
+    valid = np.flatnonzero(counts >= min_size)
+    remap = np.full(len(names), -1)
+    remap[valid] = np.arange(len(valid))
+    codes = remap[codes]
+    keep = codes >= 0
+    return values[keep], codes[keep], [str(names[i]) for i in valid]
+
+
+def f_statistic(group_sums, group_sumsq, counts):
+    """One-way ANOVA F from per-group sums; works on batches (last axis = group)"""
+    n = counts.sum()
+    k = counts.shape[-1]
+    total = group_sums.sum(axis=-1)
+    ss_between = (group_sums ** 2 / counts).sum(axis=-1) - total ** 2 / n
+    ss_within = (group_sumsq - group_sums ** 2 / counts).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (ss_between / (k - 1)) / (ss_within / (n - k))
+
+
+def _observed_f(values, codes, k):
+    counts = np.bincount(codes, minlength=k).astype(np.float64)
+    sums = np.bincount(codes, weights=values, minlength=k)
+    sumsq = np.bincount(codes, weights=values ** 2, minlength=k)
+    return float(f_statistic(sums, sumsq, counts)), counts
+
+
+def _batches(n_resamples, n_rows):
+    batch = max(1, BATCH_ELEMENTS // max(n_rows, 1))
+    for start in range(0, n_resamples, batch):
+        yield min(batch, n_resamples - start)
+
+
+def permutation_pvalue(values, codes, k, n_resamples=DEFAULT_RESAMPLES, seed=0):
+    """P(F >= observed) when group labels are shuffled"""
+    rng = np.random.default_rng(seed)
+    observed, counts = _observed_f(values, codes, k)
+    onehot = np.eye(k)[codes]  # n x k, built once
+    exceed = 0
+    for size in _batches(n_resamples, len(values)):
+        shuffled = rng.permuted(np.broadcast_to(values, (size, len(values))), axis=1)
+        sums = shuffled @ onehot
+        sumsq = (shuffled ** 2) @ onehot
+        exceed += int(np.count_nonzero(f_statistic(sums, sumsq, counts) >= observed))
+    return observed, (exceed + 1) / (n_resamples + 1)
+
+
+def bootstrap_pvalue(values, codes, k, n_resamples=DEFAULT_RESAMPLES, seed=0):
+    """
+    Bootstrap test of equal means: each group is shifted to the pooled mean and
+    resampled with replacement; p = P(F* >= observed).
+    """
+    rng = np.random.default_rng(seed)
+    observed, counts = _observed_f(values, codes, k)
+    grand_mean = values.mean()
+    groups = []
+    for g in range(k):
+        group = values[codes == g]
+        groups.append(group - group.mean() + grand_mean)
+
+    exceed = 0
+    for size in _batches(n_resamples, len(values)):
+        sums = np.empty((size, k))
+        sumsq = np.empty((size, k))
+        for g, group in enumerate(groups):
+            sample = group[rng.integers(0, len(group), (size, len(group)))]
+            sums[:, g] = sample.sum(axis=1)
+            sumsq[:, g] = (sample ** 2).sum(axis=1)
+        exceed += int(np.count_nonzero(f_statistic(sums, sumsq, counts) >= observed))
+    return observed, (exceed + 1) / (n_resamples + 1)
+
+
+def classic_test(values, codes, k):
+    """Shapiro-Wilk on every group, then ANOVA if all look normal, else Kruskal-Wallis"""
+    groups = [values[codes == g] for g in range(k)]
+    # Shapiro-Wilk p-values aren't reliable beyond 5000 points, so large groups
+    # are checked on a fixed random subsample
+    rng = np.random.default_rng(0)
+    samples = [g if len(g) <= SHAPIRO_MAX else rng.choice(g, SHAPIRO_MAX, replace=False) for g in groups]
+    normal = all(len(g) < 3 or stats.shapiro(g)[1] > ALPHA for g in samples)
+    if normal:
+        statistic, p_value = stats.f_oneway(*groups)
+        return 'ANOVA', float(statistic), float(p_value)
+    statistic, p_value = stats.kruskal(*groups)
+    return 'Kruskal-Wallis', float(statistic), float(p_value)
+
+
+def _run_one(task):
+    factor, method, values, codes, names, n_resamples, seed = task
+    k = len(names)
+    start = time.perf_counter()
+    if method == 'classic':
+        test, statistic, p_value = classic_test(values, codes, k)
+        resamples = 0
+    elif method == 'permutation':
+        statistic, p_value = permutation_pvalue(values, codes, k, n_resamples, seed)
+        test, resamples = 'Permutation F', n_resamples
+    elif method == 'bootstrap':
+        statistic, p_value = bootstrap_pvalue(values, codes, k, n_resamples, seed)
+        test, resamples = 'Bootstrap F', n_resamples
+    else:
+        raise ValueError(f"Unknown method {method!r}")
+    return {
+        'factor': factor,
+        'method': method,
+        'test': test,
+        'groups': ', '.join(names),
+        'n': len(values),
+        'statistic': statistic,
+        'p_value': p_value,
+        'significant': p_value < ALPHA,
+        'resamples': resamples,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def run_tests(df, target='co2_emissions_kg', factors=None,
+              methods=('classic', 'permutation', 'bootstrap'),
+              n_resamples=DEFAULT_RESAMPLES, max_workers=None, seed=42):
+    """
+    Test whether target differs between the groups of every factor.
+    Returns one row per (factor, method) as a DataFrame.
+    """
+    df = add_test_factors(df.copy()) if 'efficiency_band' not in df else df
+    factors = FACTORS if factors is None else {name: FACTORS.get(name, name) for name in factors}
+
+    tasks = []
+    for i, (factor, column) in enumerate(factors.items()):
+        values, codes, names = build_groups(df[target], df[column])
+        if len(names) < 2:
+            continue
+        for j, method in enumerate(methods):
+            tasks.append((factor, method, values, codes, names, n_resamples, seed + 100 * i + j))
+
+    if max_workers == 1 or len(tasks) <= 1:
+        rows = [_run_one(task) for task in tasks]
+    else:
+        max_workers = max_workers or min(len(tasks), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            rows = list(pool.map(_run_one, tasks))
+    return pd.DataFrame(rows)
@@ -0,0 +1,240 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import torch
+
+from carbon_model import FEATURES, build_model, load_checkpoint, save_checkpoint
+from commute_loader import DATA_FILE, iter_range_chunks, last_complete_line_end
+from trainer import evaluate_loss, train_model
+
+# Warm-start retraining from rows appended to commute_data.csv. Besides the
+# weights, the checkpoint carries what a daily update needs:
+#   - Adam's state
+#   - the scaler's row count (its mean/scale become running moments)
+#   - the byte offset and header of the CSV it has consumed
+#   - a fixed-size reservoir sample of past rows for replay
+# A retrain reads only the new rows, drops any with a missing or non-finite
+# value and folds the rest into the scaler moments. It rewrites the first layer so the network's function is
+# unchanged under the new scaler, then fine-tunes on the new rows plus a
+# replay sample. The checkpoint is only replaced when the fine-tuned loss is
+# finite.
+
+MODEL_FILE = '../commute_carbon_pytorch_model.pt'
+TARGET = 'co2_emissions_kg'
+REPLAY_CAPACITY = 5000
+REPLAY_RATIO = 4  # replayed rows per new row
+DEFAULT_EPOCHS = 50
+DEFAULT_LR = 1e-4
+
+
+def data_watermark(data_file=DATA_FILE):
+    """(header, byte offset just past the last complete row) of the CSV"""
+    size = os.path.getsize(data_file)
+    with open(data_file, 'rb') as f:
+        header = f.readline().decode().strip()
+        return header, max(last_complete_line_end(f, size), f.tell())
+
+
+def merge_moments(count, mean, m2, X):
+    """Chan et al. combination of running (count, mean, M2) with the rows of X"""
+    X = np.asarray(X, dtype=np.float64)
+    n = len(X)
+    if n == 0:
+        return count, mean, m2
+    batch_mean = X.mean(axis=0)
+    batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+    total = count + n
+    delta = batch_mean - mean
+    return total, mean + delta * n / total, m2 + batch_m2 + delta ** 2 * count * n / total
+
+
+def rescale_first_layer(model, old_mean, old_scale, new_mean, new_scale):
+    """
+    Rewrite layer1 in place so model(scaled with new stats) equals
+    model(scaled with old stats) for every input
+    """
+    layer = model.layer1
+    old_mean, old_scale, new_mean, new_scale = (
+        torch.as_tensor(np.asarray(v), dtype=layer.weight.dtype) for v in (old_mean, old_scale, new_mean, new_scale)
+    )
+    # W (x - m0) / s0 + b  ==  (W s1 / s0) (x - m1) / s1 + b + W (m1 - m0) / s0
+    with torch.no_grad():
+        layer.bias.add_(layer.weight @ ((new_mean - old_mean) / old_scale))
+        layer.weight.mul_(new_scale / old_scale)
+
+
+def update_reservoir(replay_X, replay_y, seen, X, y, capacity=REPLAY_CAPACITY, rng=None):
+    """Algorithm R: keep a uniform sample of at most capacity rows of everything seen"""
+    rng = np.random.default_rng() if rng is None else rng
+    replay_X, replay_y = list(replay_X), list(replay_y)
+    for row, target in zip(X, y):
+        seen += 1
+        if len(replay_X) < capacity:
+            replay_X.append(row)
+            replay_y.append(target)
+        else:
+            slot = rng.integers(0, seen)
+            if slot < capacity:
+                replay_X[slot] = row
+                replay_y[slot] = target
+    return (np.asarray(replay_X, dtype=np.float32).reshape(-1, len(FEATURES)),
+            np.asarray(replay_y, dtype=np.float32).reshape(-1), seen)
+
+
+def retrain_state(X, y, watermark, capacity=REPLAY_CAPACITY, seed=0):
+    """
+    Checkpoint extras recording that the model (and its scaler) saw the rows
+    X, y of the CSV up to watermark; pass them to save_checkpoint
+    """
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32).reshape(-1)
+    rng = np.random.default_rng(seed)
+    keep = rng.permutation(len(X))[:capacity]
+    header, offset = watermark
+    return {
+        'scaler_count': len(X),
+        'data_header': header,
+        'data_offset': offset,
+        'replay_X': torch.from_numpy(X[keep]),
+        'replay_y': torch.from_numpy(y[keep]),
+        'replay_seen': len(X),
+    }
+
+
+def _read_rows(data_file, start, end, header):
+    X_parts, y_parts = [], []
+    for chunk in iter_range_chunks(data_file, start, end, header.split(','),
+                                   usecols=FEATURES + [TARGET], derived=False):
+        X_parts.append(chunk[FEATURES].to_numpy(dtype=np.float32))
+        y_parts.append(chunk[TARGET].to_numpy(dtype=np.float32))
+    if not X_parts:
+        return np.empty((0, len(FEATURES)), dtype=np.float32), np.empty(0, dtype=np.float32)
+    X, y = np.concatenate(X_parts), np.concatenate(y_parts)
+    finite = np.isfinite(X).all(axis=1) & np.isfinite(y)
+    return X[finite], y[finite]
+
+
+def _save(path, model, mean, scale, features, **state):
+    tmp_path = path + '.tmp'
+    state = {key: value for key, value in state.items() if value is not None}
+    save_checkpoint(tmp_path, model, mean, scale, features, **state)
+    os.replace(tmp_path, path)
+
+
+def initialize(checkpoint_path=MODEL_FILE, data_file=DATA_FILE, seed=0):
+    """
+    One full pass over the CSV to add retraining state to a checkpoint saved
+    without it; the weights and scaler are kept as they are
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+    watermark = data_watermark(data_file)
+    header, offset = watermark
+    with open(data_file, 'rb') as f:
+        f.readline()
+        start = f.tell()
+    X, y = _read_rows(data_file, start, offset, header)
+    model = build_model(checkpoint)
+    _save(checkpoint_path, model, checkpoint['scaler_mean'].numpy(), checkpoint['scaler_scale'].numpy(),
+          checkpoint.get('features', FEATURES), optimizer_state_dict=checkpoint.get('optimizer_state_dict'),
+          **retrain_state(X, y, watermark, seed=seed))
+    return len(X)
+
+
+def retrain(checkpoint_path=MODEL_FILE, data_file=DATA_FILE, num_epochs=DEFAULT_EPOCHS, lr=DEFAULT_LR,
+            batch_size=32, replay_ratio=REPLAY_RATIO, seed=0):
+    """
+    Fine-tune the checkpointed model on rows appended since it was saved.
+    Returns a dict describing the update (new_rows is 0 when there was nothing to do).
+    """
+    start_time = time.perf_counter()
+    checkpoint = load_checkpoint(checkpoint_path)
+    if 'data_offset' not in checkpoint:
+        raise ValueError(f"{checkpoint_path} has no retraining state; run initialize() first")
+
+    header, end = data_watermark(data_file)
+    offset = checkpoint['data_offset']
+    if header != checkpoint['data_header'] or end < offset:
+        raise ValueError(f"{data_file} was rewritten since the checkpoint was saved; a full retrain is needed")
+
+    X_new, y_new = _read_rows(data_file, offset, end, header)
+    if len(X_new) == 0:
+        return {'new_rows': 0, 'replay_rows': 0, 'seconds': time.perf_counter() - start_time}
+
+    # Running scaler moments
+    old_mean = checkpoint['scaler_mean'].numpy()
+    old_scale = checkpoint['scaler_scale'].numpy()
+    count = checkpoint['scaler_count']
+    count, mean, m2 = merge_moments(count, old_mean, old_scale ** 2 * count, X_new)
+    scale = np.sqrt(m2 / count)
+    scale[scale == 0] = 1.0
+
+    model = build_model(checkpoint)
+    rescale_first_layer(model, old_mean, old_scale, mean, scale)
+
+    rng = np.random.default_rng(seed)
+    replay_X = checkpoint['replay_X'].numpy()
+    replay_y = checkpoint['replay_y'].numpy()
+    n_replay = min(len(replay_X), replay_ratio * len(X_new))
+    replay_rows = rng.choice(len(replay_X), n_replay, replace=False)
+
+    def scaled(X):
+        return torch.from_numpy(((X - mean) / scale).astype(np.float32))
+
+    X_train = scaled(np.concatenate([X_new, replay_X[replay_rows]]))
+    y_train = torch.from_numpy(np.concatenate([y_new, replay_y[replay_rows]])).reshape(-1, 1)
+    # Loss on new rows plus the whole replay buffer tracks both fit and forgetting
+    X_eval = scaled(np.concatenate([X_new, replay_X]))
+    y_eval = torch.from_numpy(np.concatenate([y_new, replay_y])).reshape(-1, 1)
+
+    loss_before = evaluate_loss(model, X_eval, y_eval)
+    history = train_model(model, X_train, y_train, X_eval, y_eval, num_epochs=num_epochs,
+                          batch_size=batch_size, lr=lr, seed=seed,
+                          optimizer_state=checkpoint.get('optimizer_state_dict'))
+
+    loss_after = history['test_losses'][-1]
+    if not np.isfinite(loss_after):
+        raise ValueError(f"Fine-tuning diverged (loss {loss_after}); {checkpoint_path} was left unchanged")
+
+    replay_X, replay_y, seen = update_reservoir(replay_X, replay_y, checkpoint['replay_seen'],
+                                                X_new, y_new, rng=rng)
+    _save(checkpoint_path, model, mean, scale, checkpoint.get('features', FEATURES),
+          optimizer_state_dict=history['optimizer_state'], scaler_count=count, data_header=header, data_offset=end,
+          replay_X=torch.from_numpy(replay_X), replay_y=torch.from_numpy(replay_y), replay_seen=seen)
+
+    return {
+        'new_rows': len(X_new),
+        'replay_rows': n_replay,
+        'epochs': history['epochs_run'],
+        'loss_before': loss_before,
+        'loss_after': loss_after,
+        'seconds': time.perf_counter() - start_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tune the saved model on newly appended trips")
+    parser.add_argument('--checkpoint', default=MODEL_FILE)
+    parser.add_argument('--data', default=DATA_FILE)
+    parser.add_argument('--epochs', type=int, default=DEFAULT_EPOCHS)
+    parser.add_argument('--lr', type=float, default=DEFAULT_LR)
+    parser.add_argument('--replay-ratio', type=int, default=REPLAY_RATIO)
+    args = parser.parse_args()
+
+    if 'data_offset' not in load_checkpoint(args.checkpoint):
+        rows = initialize(args.checkpoint, args.data)
+        print(f"Added retraining state to {args.checkpoint} ({rows} existing trips marked as seen)")
+        return
+
+    result = retrain(args.checkpoint, args.data, args.epochs, args.lr, replay_ratio=args.replay_ratio)
+    if result['new_rows'] == 0:
+        print("No new trips since the last training run")
+        return
+    print(f"Fine-tuned on {result['new_rows']} new + {result['replay_rows']} replayed trips "
+          f"for {result['epochs']} epochs in {result['seconds']:.2f}s")
+    print(f"Loss on new + replay rows: {result['loss_before']:.4f} -> {result['loss_after']:.4f}")
+
+
+if __name__ == '__main__':
+    main()
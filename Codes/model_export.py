@@ -0,0 +1,109 @@
+import argparse
+import contextlib
+import json
+import os
+import warnings
+
+import torch
+
+from carbon_model import FEATURES, build_model, fold_scaler, load_checkpoint
+
+# Exports CarbonFootprintNN as a self-contained TorchScript artifact. The
+# scaler is folded into the first layer, so the artifact takes raw FEATURES
+# columns and can be loaded with torch.jit.load without carbon_model or
+# sklearn. The feature order and scaler statistics travel inside the archive
+# as metadata.json.
+
+MODEL_FILE = '../commute_carbon_pytorch_model.pt'
+EXPORT_FILE = '../commute_carbon_model_scripted.pt'
+QUANTIZED_EXPORT_FILE = '../commute_carbon_model_scripted_int8.pt'
+METADATA_NAME = 'metadata.json'
+
+
+@contextlib.contextmanager
+def _quiet_torch_warnings():
+    # torch.jit and torch.ao.quantization warn about their deprecation on every
+    # call in recent releases; they still work and callers can't act on it
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        warnings.simplefilter('ignore', DeprecationWarning)
+        warnings.filterwarnings('ignore', message='torch.quantize_per_tensor')
+        yield
+
+
+def quantize_model(model):
+    """
+    Dynamic int8 quantization (int8 weights, float activations) of every Linear
+    layer after the first. The first layer carries the folded scaler, whose
+    per-feature weights span orders of magnitude and lose too much precision
+    under a single per-tensor int8 scale.
+    """
+    layers = {f'layer{i}' for i in range(2, model.n_layers + 1)}
+    return torch.ao.quantization.quantize_dynamic(model, layers, dtype=torch.qint8)
+
+
+def export_model(model, mean, scale, path, features=FEATURES, quantize=False):
+    """Trace a scaler-folded copy of model and save it as TorchScript; returns the path"""
+    folded = fold_scaler(model, mean, scale)
+    # CarbonFootprintNN builds its layers dynamically, so it is traced rather
+    # than scripted; the traced graph works for any batch size
+    example = torch.zeros((2, len(features)), dtype=torch.float32)
+    with _quiet_torch_warnings(), torch.no_grad():
+        if quantize:
+            folded = quantize_model(folded)
+        traced = torch.jit.freeze(torch.jit.trace(folded, example).eval())
+
+    metadata = {
+        'features': list(features),
+        'scaler_mean': [float(v) for v in mean],
+        'scaler_scale': [float(v) for v in scale],
+        'quantized': bool(quantize),
+    }
+    tmp_path = path + '.tmp'
+    with _quiet_torch_warnings():
+        torch.jit.save(traced, tmp_path, _extra_files={METADATA_NAME: json.dumps(metadata)})
+    os.replace(tmp_path, path)
+    return path
+
+
+def export_checkpoint(checkpoint_path=MODEL_FILE, path=EXPORT_FILE, quantize=False):
+    """Export the model stored in a save_checkpoint file"""
+    checkpoint = load_checkpoint(checkpoint_path)
+    model = build_model(checkpoint)
+    return export_model(
+        model,
+        checkpoint['scaler_mean'].numpy(),
+        checkpoint['scaler_scale'].numpy(),
+        path,
+        features=checkpoint.get('features', FEATURES),
+        quantize=quantize,
+    )
+
+
+def load_exported(path):
+    """(TorchScript module, metadata dict) of an exported artifact"""
+    extra_files = {METADATA_NAME: ''}
+    with _quiet_torch_warnings():
+        module = torch.jit.load(path, _extra_files=extra_files)
+    module.eval()
+    return module, json.loads(extra_files[METADATA_NAME])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export CarbonFootprintNN as a standalone TorchScript artifact")
+    parser.add_argument('--checkpoint', default=MODEL_FILE)
+    parser.add_argument('--output', default=EXPORT_FILE)
+    parser.add_argument('--quantized-output', default=QUANTIZED_EXPORT_FILE)
+    parser.add_argument('--no-quantized', action='store_true', help="Skip the int8 variant")
+    args = parser.parse_args()
+
+    for quantize, path in [(False, args.output), (True, args.quantized_output)]:
+        if quantize and args.no_quantized:
+            continue
+        export_checkpoint(args.checkpoint, path, quantize=quantize)
+        label = 'int8 dynamic-quantized' if quantize else 'float32'
+        print(f"Wrote {label} TorchScript model to {path} ({os.path.getsize(path) / 1024:.1f} KiB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import hashlib
+import itertools
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from carbon_model import FEATURES
+from commute_loader import DATA_FILE, file_hash, load_commute_data
+
+# Trains many CarbonFootprintNN configurations and classic baselines in
+# parallel worker processes and writes a leaderboard. The train/validation/
+# test split and fitted scaler statistics are computed once per (CSV
+# contents, seed, fractions) and cached on disk as .npy files; workers
+# memory-map them instead of re-reading the CSV. Early stopping and the
+# leaderboard ranking use the validation rows, so the test metrics are an
+# unbiased estimate for the chosen model.
+
+CACHE_DIR = '../.sweep_cache'
+LEADERBOARD_FILE = '../sweep_leaderboard.csv'
+TARGET = 'co2_emissions_kg'
+
+DEFAULT_GRID = {
+    'hidden_dims': [(16, 8), (32, 16), (64, 32, 16)],
+    'lr': [0.001, 0.01],
+    'batch_size': [4, None],
+    'weight_decay': [1e-5, 1e-4],
+}
+BASELINES = ['linear', 'ridge', 'random_forest', 'gradient_boosting']
+SPLIT_ARRAYS = ['X_train', 'X_val', 'X_test', 'y_train', 'y_val', 'y_test', 'mean', 'scale']
+
+
+def prepare_split(data_file=DATA_FILE, test_fraction=0.2, val_fraction=0.2, seed=42, cache_dir=CACHE_DIR):
+    """
+    Directory holding X/y for train, val and test (unscaled) plus the scaler
+    mean/scale fitted on the training rows, one .npy file per array (see
+    SPLIT_ARRAYS). Reused while the CSV is unchanged.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key = f"{file_hash(data_file)}-{seed}-{test_fraction}-{val_fraction}"
+    path = os.path.join(cache_dir, f"split-{hashlib.sha1(key.encode()).hexdigest()[:16]}")
+    if os.path.isdir(path):
+        return path
+
+    df = load_commute_data(data_file, usecols=FEATURES + [TARGET], derived=False)
+    X = df[FEATURES].to_numpy(dtype=np.float32)
+    y = df[TARGET].to_numpy(dtype=np.float32)
+    order = np.random.default_rng(seed).permutation(len(X))
+    n_test = max(1, int(round(test_fraction * len(X))))
+    n_val = max(1, int(round(val_fraction * len(X))))
+    test_idx, val_idx, train_idx = order[:n_test], order[n_test:n_test + n_val], order[n_test + n_val:]
+
+    mean = X[train_idx].mean(axis=0, dtype=np.float64)
+    scale = X[train_idx].std(axis=0, dtype=np.float64)
+    scale[scale == 0] = 1.0
+    arrays = {'X_train': X[train_idx], 'X_val': X[val_idx], 'X_test': X[test_idx],
+              'y_train': y[train_idx], 'y_val': y[val_idx], 'y_test': y[test_idx], 'mean': mean, 'scale': scale}
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    os.makedirs(tmp_path, exist_ok=True)
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_path, name + '.npy'), values)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another process finished the same split first
+        shutil.rmtree(tmp_path)
+    return path
+
+
+def load_split(path):
+    """{name: read-only memory-mapped array} of a prepare_split() directory"""
+    return {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r') for name in SPLIT_ARRAYS}
+
+
+def build_configs(grid=None, baselines=BASELINES, num_epochs=500, patience=50):
+    """Every combination of the grid as an 'nn' config, plus one config per baseline"""
+    grid = DEFAULT_GRID if grid is None else grid
+    configs = []
+    names = list(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(zip(names, values))
+        params.update(num_epochs=num_epochs, patience=patience)
+        label = '-'.join(map(str, params['hidden_dims']))
+        batch = 'full' if params['batch_size'] is None else params['batch_size']
+        configs.append({
+            'name': f"nn[{label}] lr={params['lr']} bs={batch} wd={params['weight_decay']}",
+            'kind': 'nn',
+            'params': params,
+        })
+    for baseline in baselines:
+        configs.append({'name': baseline, 'kind': baseline, 'params': {}})
+    return configs
+
+
+def _make_baseline(kind, seed):
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from sklearn.linear_model import LinearRegression, Ridge
+
+    if kind == 'linear':
+        return LinearRegression()
+    if kind == 'ridge':
+        return Ridge(alpha=1.0)
+    if kind == 'random_forest':
+        return RandomForestRegressor(n_estimators=200, random_state=seed, n_jobs=1)
+    if kind == 'gradient_boosting':
+        return GradientBoostingRegressor(random_state=seed)
+    raise ValueError(f"Unknown model kind {kind!r}")
+
+
+def _init_worker(threads):
+    # Pin each worker to a fixed number of intra-op threads so parallel
+    # workers don't oversubscribe the CPU. sklearn is imported here too so
+    # its multi-second import isn't paid inside the first baseline's task
+    import sklearn.ensemble
+    import sklearn.linear_model
+    import torch
+    torch.set_num_threads(threads)
+
+
+def run_config(task):
+    """Train one config on the cached split and return its leaderboard row"""
+    config, split_path, seed = task
+    from trainer import regression_metrics
+
+    split = load_split(split_path)
+    X_train, X_val, X_test = ((split[name] - split['mean']) / split['scale'] for name in ('X_train', 'X_val', 'X_test'))
+    y_train, y_val, y_test = (np.asarray(split[name]) for name in ('y_train', 'y_val', 'y_test'))
+
+    # train_time_s covers fitting and prediction only; the clock starts once
+    # the model is built so imports and construction aren't counted
+    epochs = None
+    if config['kind'] == 'nn':
+        import torch
+        from carbon_model import CarbonFootprintNN
+        from trainer import train_model
+
+        def tensor(values):
+            return torch.tensor(values, dtype=torch.float32)
+
+        params = dict(config['params'])
+        torch.manual_seed(seed)
+        model = CarbonFootprintNN(X_train.shape[1], hidden_dims=params.pop('hidden_dims'))
+        start = time.perf_counter()
+        # Early stopping watches the validation rows; the test rows stay unseen
+        history = train_model(model, tensor(X_train), tensor(y_train).reshape(-1, 1),
+                              tensor(X_val), tensor(y_val).reshape(-1, 1), seed=seed, **params)
+        epochs = history['epochs_run']
+        with torch.no_grad():
+            val_predictions = model(tensor(X_val)).numpy().reshape(-1)
+            predictions = model(tensor(X_test)).numpy().reshape(-1)
+    else:
+        model = _make_baseline(config['kind'], seed)
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        val_predictions = model.predict(X_val)
+        predictions = model.predict(X_test)
+    train_time = time.perf_counter() - start
+
+    metrics = regression_metrics(y_test, predictions)
+    return {
+        'model': config['name'],
+        'kind': config['kind'],
+        'val_rmse': regression_metrics(y_val, val_predictions)['rmse'],
+        'rmse': metrics['rmse'],
+        'mae': metrics['mae'],
+        'r2': metrics['r2'],
+        'train_time_s': train_time,
+        'epochs': epochs,
+    }
+
+
+def run_sweep(configs, data_file=DATA_FILE, max_workers=None, threads_per_worker=1, seed=42,
+              output=LEADERBOARD_FILE):
+    """
+    Run every config in a process pool; returns the leaderboard sorted by
+    validation RMSE (rmse/mae/r2 are on the test rows)
+    """
+    split_path = prepare_split(data_file, seed=seed)
+    tasks = [(config, split_path, seed) for config in configs]
+    max_workers = max_workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(threads_per_worker,)) as pool:
+        rows = list(pool.map(run_config, tasks))
+    leaderboard = pd.DataFrame(rows).sort_values('val_rmse').reset_index(drop=True)
+    leaderboard.index += 1
+    if output:
+        leaderboard.to_csv(output, index_label='rank')
+    return leaderboard
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for CarbonFootprintNN and baselines")
+    parser.add_argument('--data', default=DATA_FILE)
+    parser.add_argument('--epochs', type=int, default=500)
+    parser.add_argument('--patience', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--output', default=LEADERBOARD_FILE)
+    args = parser.parse_args()
+
+    configs = build_configs(num_epochs=args.epochs, patience=args.patience)
+    print(f"Running {len(configs)} configurations...")
+    start = time.perf_counter()
+    leaderboard = run_sweep(configs, args.data, args.workers, args.threads_per_worker, output=args.output)
+    print(f"Done in {time.perf_counter() - start:.1f}s, leaderboard written to {args.output}\n")
+    with pd.option_context('display.width', 140, 'display.max_colwidth', 50):
+        print(leaderboard.round(4).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import collections
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from carbon_model import FEATURES, CarbonPredictor
+from commute_loader import DATA_FILE
+from departure_optimizer import DEFAULT_TOP, DepartureOptimizer, TrafficProfile
+
+# Minimal asyncio HTTP/1.1 service around CarbonPredictor. Concurrent requests
+# are queued and coalesced into micro-batches (up to max_batch_size trips, or
+# whatever arrived within max_wait_ms of the first one), so the model runs once
+# per batch instead of once per request.
+#
+#   POST /predict  {"traffic_condition": 1, "trip_duration": 50, ...}
+#                  or {"trips": [{...}, {...}]}
+#   POST /departures  {"trip_direction": "Home to Campus", "distance_km": 30,
+#                      "fuel_efficiency_l_per_100km": 5, "days": ["Monday"], "top": 5}
+#                  lowest-CO2 departure times; every candidate slot goes
+#                  through the same micro-batches as /predict
+#   GET  /stats    latency percentiles, queue depth, batch sizes
+#   GET  /health
+
+MODEL_FILE = '../commute_carbon_pytorch_model.pt'
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_MAX_WAIT_MS = 2.0
+LATENCY_WINDOW = 10000
+
+
+class MicroBatcher:
+    """Collects queued trips into batches and scores them on one model thread"""
+
+    def __init__(self, predictor, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        # One thread: the predictor reuses a single input buffer
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._task = None
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.batch_sizes = collections.deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    async def predict(self, rows):
+        """Queue an (n, 4) array of trips and wait for its predictions"""
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        result = await future
+        self.latencies.append(time.perf_counter() - start)
+        self.requests += 1
+        return result
+
+    async def _next_batch(self):
+        items = [await self.queue.get()]
+        size = len(items[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._next_batch()
+            batch = np.concatenate([rows for rows, _ in items])
+            self.batch_sizes.append(len(batch))
+            try:
+                predictions = await loop.run_in_executor(self._executor, self.predictor.predict, batch)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            start = 0
+            for rows, future in items:
+                if not future.done():
+                    future.set_result(predictions[start:start + len(rows)])
+                start += len(rows)
+
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000
+        batch_sizes = np.array(self.batch_sizes)
+
+        def percentile(q):
+            return float(np.percentile(latencies, q)) if len(latencies) else None
+
+        return {
+            'requests': self.requests,
+            'queue_depth': self.queue.qsize(),
+            'latency_ms': {'p50': percentile(50), 'p95': percentile(95), 'p99': percentile(99)},
+            'mean_batch_size': float(batch_sizes.mean()) if len(batch_sizes) else None,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+        }
+
+
+def parse_trips(payload):
+    """JSON body -> (n, 4) float32 array in FEATURES order"""
+    trips = payload['trips'] if 'trips' in payload else [payload]
+    if not trips:
+        raise ValueError("No trips given")
+    return np.array([[float(trip[name]) for name in FEATURES] for trip in trips], dtype=np.float32)
+
+
+def parse_departure_query(payload):
+    """JSON body -> keyword arguments for DepartureOptimizer.candidates, plus top"""
+    query = {
+        'direction': payload['trip_direction'],
+        'distance_km': float(payload['distance_km']),
+        'fuel_efficiency': float(payload['fuel_efficiency_l_per_100km']),
+        'days': payload.get('days'),
+        'hours': payload.get('hours'),
+    }
+    return query, int(payload.get('top', DEFAULT_TOP))
+
+
+class PredictionServer:
+    def __init__(self, batcher, optimizer=None):
+        self.batcher = batcher
+        self.optimizer = optimizer
+        # Building candidates may refresh the traffic profile (parsing appended
+        # rows and rewriting its cache), so it runs off the event loop, one at a time
+        self._profile_executor = ThreadPoolExecutor(max_workers=1)
+        self.routes = {
+            ('POST', '/predict'): self.handle_predict,
+            ('POST', '/departures'): self.handle_departures,
+            ('GET', '/stats'): self.handle_stats,
+            ('GET', '/health'): self.handle_health,
+        }
+
+    async def handle_predict(self, body):
+        try:
+            rows = parse_trips(json.loads(body))
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {'error': f"Invalid request: {e}"}
+        predictions = await self.batcher.predict(rows)
+        return 200, {'co2_emissions_kg': [round(float(p), 4) for p in predictions]}
+
+    async def handle_departures(self, body):
+        if self.optimizer is None:
+            return 404, {'error': 'Departure optimizer not enabled'}
+        try:
+            query, top = parse_departure_query(json.loads(body))
+            loop = asyncio.get_running_loop()
+            slots = await loop.run_in_executor(self._profile_executor, lambda: self.optimizer.candidates(**query))
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {'error': f"Invalid request: {e}"}
+        predictions = await self.batcher.predict(slots['X'])
+        return 200, {'departures': self.optimizer.rank(slots, predictions, top)}
+
+    async def handle_stats(self, body):
+        return 200, self.batcher.stats()
+
+    async def handle_health(self, body):
+        return 200, {'status': 'ok'}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+
+                handler = self.routes.get((method, path.split('?', 1)[0]))
+                if handler is None:
+                    status, response = 404, {'error': 'Not found'}
+                else:
+                    status, response = await handler(body)
+
+                data = json.dumps(response).encode()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def start_server(predictor, host='127.0.0.1', port=8000,
+                       max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS, profile=None):
+    """Start serving; returns (asyncio server, batcher). /departures needs a TrafficProfile."""
+    batcher = MicroBatcher(predictor, max_batch_size, max_wait_ms)
+    batcher.start()
+    optimizer = DepartureOptimizer(predictor, profile) if profile is not None else None
+    app = PredictionServer(batcher, optimizer)
+    server = await asyncio.start_server(app.handle_connection, host, port)
+    return server, batcher
+
+
+async def serve(model_file, host, port, max_batch_size, max_wait_ms, data_file=DATA_FILE):
+    predictor = CarbonPredictor.load(model_file, chunk_size=max_batch_size)
+    profile = TrafficProfile(data_file).refresh() if data_file else None
+    server, _ = await start_server(predictor, host, port, max_batch_size, max_wait_ms, profile)
+    print(f"Serving CO2 predictions on http://{host}:{port} "
+          f"(max batch {max_batch_size}, max wait {max_wait_ms} ms)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP CO2 prediction service with micro-batching")
+    parser.add_argument('--model', default=MODEL_FILE)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS)
+    parser.add_argument('--data', default=DATA_FILE, help="Trip history for /departures ('' to disable)")
+    args = parser.parse_args()
+    asyncio.run(serve(args.model, args.host, args.port, args.max_batch_size, args.max_wait_ms, args.data))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+import argparse
+import os
+
+import numpy as np
+
+# Lookup-table mode for CO2 predictions. The trained network is evaluated once
+# on a regular grid over (duration, distance, efficiency) for each traffic
+# level; afterwards predictions are trilinear interpolation in that grid,
+# which needs only NumPy and a few array lookups per trip. Tables are saved as
+# .npz so clients can load them without torch.
+
+MODEL_FILE = '../commute_carbon_pytorch_model.pt'
+TABLE_FILE = '../commute_carbon_lookup.npz'
+
+TRAFFIC_LEVELS = (0, 1, 2)
+GRID_FEATURES = ['trip_duration', 'distance_km', 'fuel_efficiency_l_per_100km']
+# (low, high, points) per grid feature; covers the observed data with margin
+DEFAULT_GRID = {
+    'trip_duration': (20.0, 110.0, 91),
+    'distance_km': (30.0, 46.0, 33),
+    'fuel_efficiency_l_per_100km': (2.5, 7.0, 46),
+}
+# Fraction of each feature's observed span added on both sides by grid_from_data
+GRID_MARGIN = 0.1
+# Positions this far (in cells) past an edge still count as on the grid, so
+# float32 rounding of boundary values doesn't turn them into NaN
+EDGE_TOLERANCE = 1e-4
+
+
+def grid_from_data(df, points=None, margin=GRID_MARGIN):
+    """
+    Grid spec whose bounds span df's GRID_FEATURES plus margin of each span.
+    points gives the per-axis point counts (default: DEFAULT_GRID's).
+    """
+    points = [DEFAULT_GRID[name][2] for name in GRID_FEATURES] if points is None else points
+    grid = {}
+    for name, n in zip(GRID_FEATURES, points):
+        low, high = float(df[name].min()), float(df[name].max())
+        pad = (high - low) * margin or 1.0
+        grid[name] = (low - pad, high + pad, n)
+    return grid
+
+
+class PredictionTable:
+    """Per-traffic-level grid of model outputs, queried by trilinear interpolation"""
+
+    def __init__(self, values, lows, highs, traffic_levels=TRAFFIC_LEVELS):
+        self.values = np.ascontiguousarray(values, dtype=np.float32)
+        self.lows = np.asarray(lows, dtype=np.float64)
+        self.highs = np.asarray(highs, dtype=np.float64)
+        self.traffic_levels = np.asarray(traffic_levels, dtype=np.int64)
+        self.shape = np.array(self.values.shape[1:])
+        self.steps = (self.highs - self.lows) / (self.shape - 1)
+        # Flat-index offsets of the 8 cell corners, in (d, k, e) bit order
+        strides = np.array([self.shape[1] * self.shape[2], self.shape[2], 1])
+        corners = np.array([[(c >> 2) & 1, (c >> 1) & 1, c & 1] for c in range(8)])
+        self._corner_offsets = corners @ strides
+        self._flat = self.values.reshape(len(self.traffic_levels), -1)
+        # Plain-Python copies of the grid geometry for predict_one
+        self._levels = self.traffic_levels.tolist()
+        self._axes = (self.lows.tolist(), self.steps.tolist(), self.shape.tolist(), strides.tolist())
+        self._offsets = self._corner_offsets.tolist()
+        self._corner_bits = corners.tolist()
+
+    @classmethod
+    def build(cls, predict, grid=None, traffic_levels=TRAFFIC_LEVELS):
+        """
+        Evaluate predict (a function of an (n, 4) float32 FEATURES array, e.g.
+        BatchPredictor.predict) on every grid point.
+        """
+        grid = DEFAULT_GRID if grid is None else grid
+        axes = [np.linspace(*grid[name]) for name in GRID_FEATURES]
+        points = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3)
+        values = []
+        for level in traffic_levels:
+            X = np.column_stack([np.full(len(points), level), points]).astype(np.float32)
+            values.append(np.asarray(predict(X)).reshape([len(axis) for axis in axes]))
+        lows = [grid[name][0] for name in GRID_FEATURES]
+        highs = [grid[name][1] for name in GRID_FEATURES]
+        return cls(np.stack(values), lows, highs, traffic_levels)
+
+    def save(self, path=TABLE_FILE):
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, values=self.values, lows=self.lows, highs=self.highs,
+                 traffic_levels=self.traffic_levels)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=TABLE_FILE):
+        with np.load(path) as data:
+            return cls(data['values'], data['lows'], data['highs'], data['traffic_levels'])
+
+    def _positions(self, X):
+        """Fractional grid coordinates of X's duration/distance/efficiency columns"""
+        return (X[:, 1:] - self.lows.astype(np.float32)) / self.steps.astype(np.float32)
+
+    def in_range(self, X):
+        """Boolean mask of the rows of X that lie inside the grid"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        position = self._positions(X)
+        return ((position >= -EDGE_TOLERANCE) & (position <= self.shape - 1 + EDGE_TOLERANCE)).all(axis=1)
+
+    def predict(self, X):
+        """
+        CO2 (kg) for an (n, 4) array of FEATURES rows. Traffic is snapped to
+        the nearest tabulated level; rows outside the grid give NaN rather
+        than an extrapolated value (see in_range).
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(self.traffic_levels) == 3 and (self.traffic_levels == TRAFFIC_LEVELS).all():
+            level = np.clip(np.rint(X[:, 0]), 0, 2).astype(np.int64)
+        else:
+            level = np.abs(X[:, :1] - self.traffic_levels).argmin(axis=1)
+
+        position = self._positions(X)
+        inside = ((position >= -EDGE_TOLERANCE) & (position <= self.shape - 1 + EDGE_TOLERANCE)).all(axis=1)
+        # Park outside (and NaN) rows on cell 0 so the gather stays in bounds
+        position[~inside] = 0
+        np.clip(position, 0, self.shape - 1, out=position)
+        cell = np.minimum(position.astype(np.int64), self.shape - 2)
+        frac = position - cell
+
+        base = level * self._flat.shape[1] + (cell[:, 0] * self.shape[1] + cell[:, 1]) * self.shape[2] + cell[:, 2]
+        v = self._flat.ravel()[base[:, None] + self._corner_offsets]
+        # Separable lerps: collapse the duration bit, then distance, then efficiency
+        fd, fk, fe = frac[:, 0:1], frac[:, 1:2], frac[:, 2]
+        v = v[:, :4] + (v[:, 4:] - v[:, :4]) * fd
+        v = v[:, :2] + (v[:, 2:] - v[:, :2]) * fk
+        result = v[:, 0] + (v[:, 1] - v[:, 0]) * fe
+        result[~inside] = np.nan
+        return result
+
+    def predict_one(self, traffic_condition, trip_duration, distance_km, fuel_efficiency):
+        """
+        Single-trip path in plain Python floats; NumPy per-call overhead
+        dominates at n=1. Returns NaN for trips outside the grid.
+        """
+        levels = self._levels
+        level = min(range(len(levels)), key=lambda i: abs(levels[i] - traffic_condition))
+        index = 0
+        fracs = []
+        for value, low, step, n, stride in zip((trip_duration, distance_km, fuel_efficiency), *self._axes):
+            position = (value - low) / step
+            if not -EDGE_TOLERANCE <= position <= n - 1 + EDGE_TOLERANCE:
+                return float('nan')
+            position = min(max(position, 0.0), n - 1)
+            cell = min(int(position), n - 2)
+            index += cell * stride
+            fracs.append(position - cell)
+
+        flat = self._flat[level]
+        result = 0.0
+        for offset, (bd, bk, be) in zip(self._offsets, self._corner_bits):
+            weight = ((fracs[0] if bd else 1 - fracs[0]) * (fracs[1] if bk else 1 - fracs[1])
+                      * (fracs[2] if be else 1 - fracs[2]))
+            result += weight * flat.item(index + offset)
+        return result
+
+    def max_error(self, predict, X):
+        """
+        (max, mean, outside) absolute difference from predict over the rows
+        of X inside the grid, and the number of rows outside it
+        """
+        X = np.asarray(X, dtype=np.float32)
+        inside = self.in_range(X)
+        X = X[inside]
+        if not len(X):
+            return float('nan'), float('nan'), int((~inside).sum())
+        error = np.abs(self.predict(X) - np.asarray(predict(X)).reshape(-1))
+        return float(error.max()), float(error.mean()), int((~inside).sum())
+
+    def random_points(self, n, seed=0):
+        """n uniformly random FEATURES rows inside the grid"""
+        rng = np.random.default_rng(seed)
+        return np.column_stack([
+            rng.choice(self.traffic_levels, n),
+            rng.uniform(self.lows, self.highs, (n, len(GRID_FEATURES))),
+        ]).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute a CO2 lookup table from the trained model")
+    parser.add_argument('--checkpoint', default=MODEL_FILE)
+    parser.add_argument('--output', default=TABLE_FILE)
+    parser.add_argument('--points', type=int, nargs=3, metavar=('DURATION', 'DISTANCE', 'EFFICIENCY'),
+                        help="Grid points per axis (default %s)" % [DEFAULT_GRID[n][2] for n in GRID_FEATURES])
+    parser.add_argument('--range', nargs=3, action='append', default=[], metavar=('FEATURE', 'LOW', 'HIGH'),
+                        help="Override one grid feature's bounds (default: observed range plus %d%%)"
+                        % (GRID_MARGIN * 100))
+    parser.add_argument('--check-samples', type=int, default=200_000)
+    args = parser.parse_args()
+
+    from carbon_model import CarbonPredictor
+    from commute_loader import DATA_FILE, load_commute_data
+
+    predictor = CarbonPredictor.load(args.checkpoint)
+    data = load_commute_data(DATA_FILE, derived=False)
+    grid = grid_from_data(data, args.points)
+    for name, low, high in args.range:
+        if name not in grid:
+            parser.error(f"--range feature must be one of {GRID_FEATURES}, got {name!r}")
+        if float(low) >= float(high):
+            parser.error(f"--range {name}: LOW must be below HIGH")
+        grid[name] = (float(low), float(high), grid[name][2])
+    table = PredictionTable.build(predictor.predict, grid)
+    table.save(args.output)
+    print(f"Wrote {table.values.size:,}-point table to {args.output} "
+          f"({os.path.getsize(args.output) / 1024:.1f} KiB)")
+
+    max_error, mean_error, _ = table.max_error(predictor.predict, table.random_points(args.check_samples))
+    print(f"Random points:  max error {max_error:.2e} kg, mean error {mean_error:.2e} kg")
+    observed = data[predictor.features].to_numpy(dtype=np.float32)
+    max_error, mean_error, outside = table.max_error(predictor.predict, observed)
+    print(f"Observed trips: max error {max_error:.2e} kg, mean error {mean_error:.2e} kg, "
+          f"{outside:,} outside the grid")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Lightweight span timers for the load / feature / train / predict pipeline.
+# Profiling is off unless enable() is called or CARBON_PROFILE is set in the
+# environment. While off, span() returns a shared no-op context manager and
+# iterate() returns its argument unchanged, so instrumented hot paths pay for
+# one flag check. Recorded spans can be summarized, written as JSON, or
+# written in Chrome trace format (open in chrome://tracing or ui.perfetto.dev).
+
+PROFILE_ENV = 'CARBON_PROFILE'
+TRACE_FILE = '../profile_trace.json'
+
+_enabled = bool(os.environ.get(PROFILE_ENV))
+_events = []
+_origin_ns = time.perf_counter_ns()
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+
+def _record(name, start, end, args=None):
+    _events.append((name, start, end - start, threading.get_ident(), args))
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Drop all recorded spans"""
+    global _origin_ns
+    _events.clear()
+    _origin_ns = time.perf_counter_ns()
+
+
+def span(name, **args):
+    """Context manager timing the enclosed block as one span named name"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args or None)
+
+
+def iterate(name, iterable):
+    """
+    Yield from iterable, recording the time spent fetching each item as a span
+    (e.g. DataLoader or CSV-chunk iteration). Returns iterable itself when
+    profiling is off.
+    """
+    if not _enabled:
+        return iterable
+    return _timed_iteration(name, iterable)
+
+
+def _timed_iteration(name, iterable):
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter_ns()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        _record(name, start, time.perf_counter_ns())
+        yield item
+
+
+def summary():
+    """{name: {'count', 'total_s', 'mean_ms', 'max_ms'}} ordered by total time"""
+    totals = defaultdict(lambda: [0, 0, 0])
+    for name, _, duration, _, _ in _events:
+        entry = totals[name]
+        entry[0] += 1
+        entry[1] += duration
+        entry[2] = max(entry[2], duration)
+    rows = {
+        name: {
+            'count': count,
+            'total_s': total / 1e9,
+            'mean_ms': total / count / 1e6,
+            'max_ms': longest / 1e6,
+        }
+        for name, (count, total, longest) in totals.items()
+    }
+    return dict(sorted(rows.items(), key=lambda item: -item[1]['total_s']))
+
+
+def print_summary():
+    rows = summary()
+    if not rows:
+        print("No profiling spans recorded")
+        return
+    width = max(len(name) for name in rows)
+    print(f"{'Span':<{width}} {'Calls':>8} {'Total (s)':>10} {'Mean (ms)':>10} {'Max (ms)':>10}")
+    for name, row in rows.items():
+        print(f"{name:<{width}} {row['count']:>8} {row['total_s']:>10.4f} "
+              f"{row['mean_ms']:>10.4f} {row['max_ms']:>10.4f}")
+
+
+def _write_json(path, payload):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def save_json(path):
+    """Write the summary plus every span (start/duration in seconds from reset)"""
+    spans = [
+        {'name': name, 'start_s': (start - _origin_ns) / 1e9, 'duration_s': duration / 1e9,
+         'thread': tid, **({'args': args} if args else {})}
+        for name, start, duration, tid, args in _events
+    ]
+    _write_json(path, {'summary': summary(), 'spans': spans})
+
+
+def save_chrome_trace(path=TRACE_FILE):
+    """Write spans as Chrome trace 'complete' events (timestamps in microseconds)"""
+    events = [
+        {'name': name, 'ph': 'X', 'ts': (start - _origin_ns) / 1e3, 'dur': duration / 1e3,
+         'pid': os.getpid(), 'tid': tid, **({'args': args} if args else {})}
+        for name, start, duration, tid, args in _events
+    ]
+    _write_json(path, {'traceEvents': events, 'displayTimeUnit': 'ms'})
@@ -0,0 +1,157 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Select the non-interactive backend before any module imports pyplot
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from bar_chart import plot_co2_histogram
+from box_plot import plot_emissions_boxplot
+from commute_loader import DATA_FILE
+from correlation_matrix import plot_correlation_matrix
+from feature_pipeline import load_features
+from scatter_plot import plot_fuel_distribution
+
+# Renders every chart for every cohort without opening a window. Data is loaded
+# once; each (chart, cohort) figure is drawn in a worker process and skipped
+# when the rows it is drawn from hash the same as on the previous run.
+
+OUTPUT_DIR = '../reports'
+MANIFEST_FILE = 'manifest.json'
+# Bump when chart code changes so old figures are redrawn
+RENDER_VERSION = 1
+
+CHARTS = {
+    'co2_histogram': plot_co2_histogram,
+    'emissions_boxplot': plot_emissions_boxplot,
+    'fuel_distribution': plot_fuel_distribution,
+    'correlation_matrix': plot_correlation_matrix,
+}
+
+# Columns each chart reads; the input hash only covers these
+CHART_COLUMNS = {
+    'co2_histogram': ['traffic_condition', 'co2_emissions_kg'],
+    'emissions_boxplot': ['traffic_label', 'co2_emissions_kg'],
+    'fuel_distribution': ['fuel_used_l'],
+    'correlation_matrix': ['trip_duration', 'distance_km', 'fuel_efficiency_l_per_100km',
+                           'fuel_used_l', 'co2_emissions_kg'],
+}
+
+DEFAULT_COHORTS = ['trip_direction', 'day_of_week', 'traffic_label']
+MIN_COHORT_ROWS = 3
+
+
+def iter_cohorts(df, cohort_columns):
+    """Yield (name, rows) for all trips and for each value of each cohort column"""
+    yield 'all', df
+    for column in cohort_columns:
+        for value, rows in df.groupby(column, observed=True):
+            if len(rows) >= MIN_COHORT_ROWS:
+                name = f"{column}={value}".replace(' ', '_').replace('/', '-')
+                yield name, rows
+
+
+def input_hash(chart, rows):
+    digest = hashlib.sha1(f"{chart}:{RENDER_VERSION}".encode())
+    hashed = pd.util.hash_pandas_object(rows[CHART_COLUMNS[chart]], index=False)
+    digest.update(hashed.to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def render_figure(task):
+    chart, rows, path, dpi = task
+    start = time.perf_counter()
+    fig = CHARTS[chart](rows)
+    fig.savefig(path, dpi=dpi)
+    plt.close(fig)
+    return path, time.perf_counter() - start
+
+
+def _load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def render_reports(df, output_dir=OUTPUT_DIR, cohort_columns=DEFAULT_COHORTS,
+                   charts=None, max_workers=None, dpi=150, force=False):
+    """
+    Render charts for every cohort into output_dir. Returns a DataFrame with one
+    row per figure: chart, cohort, path, status (rendered/skipped), seconds.
+    """
+    charts = list(CHARTS) if charts is None else charts
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = _load_manifest(output_dir)
+
+    tasks, results, hashes = [], [], {}
+    for cohort, rows in iter_cohorts(df, cohort_columns):
+        for chart in charts:
+            filename = f"{chart}__{cohort}.png"
+            path = os.path.join(output_dir, filename)
+            digest = input_hash(chart, rows)
+            hashes[filename] = digest
+            if not force and manifest.get(filename, {}).get('hash') == digest and os.path.exists(path):
+                results.append({'chart': chart, 'cohort': cohort, 'path': path, 'status': 'skipped',
+                                'seconds': 0.0})
+            else:
+                tasks.append((chart, cohort, rows, path))
+
+    render_tasks = [(chart, rows, path, dpi) for chart, _, rows, path in tasks]
+    if max_workers == 1 or len(render_tasks) <= 1:
+        rendered = [render_figure(task) for task in render_tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            rendered = list(pool.map(render_figure, render_tasks))
+
+    for (chart, cohort, _, path), (_, seconds) in zip(tasks, rendered):
+        filename = os.path.basename(path)
+        manifest[filename] = {'hash': hashes[filename], 'seconds': round(seconds, 4)}
+        results.append({'chart': chart, 'cohort': cohort, 'path': path, 'status': 'rendered',
+                        'seconds': seconds})
+    _save_manifest(output_dir, manifest)
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render all commute charts per cohort (headless)")
+    parser.add_argument('--data', default=DATA_FILE)
+    parser.add_argument('--output', default=OUTPUT_DIR)
+    parser.add_argument('--cohorts', nargs='*', default=DEFAULT_COHORTS,
+                        help="columns whose values define cohorts (an 'all' cohort is always drawn)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--dpi', type=int, default=150)
+    parser.add_argument('--force', action='store_true', help="redraw figures even if their data is unchanged")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = load_features(args.data)
+    results = render_reports(df, args.output, args.cohorts, max_workers=args.workers,
+                             dpi=args.dpi, force=args.force)
+    total = time.perf_counter() - start
+
+    rendered = results[results['status'] == 'rendered']
+    print(results[['chart', 'cohort', 'status', 'seconds']].round(3).to_string(index=False))
+    print(f"\n{len(rendered)} figures rendered, {len(results) - len(rendered)} unchanged and skipped, "
+          f"{total:.2f}s total")
+    if len(rendered):
+        print("Render time per chart (mean seconds):")
+        print(rendered.groupby('chart')['seconds'].mean().round(3).to_string())
+
+
+if __name__ == '__main__':
+    main()
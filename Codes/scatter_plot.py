@@ -3,39 +3,51 @@ import pandas as pd
 import numpy as np
 import seaborn as sns
 
-# Assume the data is loaded from a CSV file
-# Instead of hardcoding the entire dataset, we'll use this approach:
-df = pd.read_csv('../commute_data.csv')  # Replace with your actual file path
-
-traffic_mapping = {0: 'Low', 1: 'Moderate', 2: 'High'}
-df['traffic_category'] = df['traffic_condition'].map(traffic_mapping)
-
-# Create a figure with multiple subplots
-fig, axes = plt.subplots(figsize=(7, 5))
+from commute_loader import DATA_FILE
+from correlation_engine import OVERALL, compute_correlations
 
 # Color mapping for consistency
 color_mapping = {'Low': 'green', 'Moderate': 'orange', 'High': 'red'}
 
-# 1. Trip Duration Distribution - Histogram
-# 2. Fuel Consumption Distribution - Histogram
-sns.histplot(data=df, x='fuel_used_l',  
-             bins=10, kde=True, palette=color_mapping,
-             ax=axes)
-axes.set_title('Distribution of Fuel Consumption')
-axes.set_xlabel('Fuel Used (liters)')
-axes.set_ylabel('Frequency')
-
-
-
-
-print("\nSummary Statistics for Fuel Consumption (liters):")
-fuel_stats = df.groupby('traffic_category')['fuel_used_l'].describe().round(2)
-# Reorder to have Low, Moderate, High sequence
-fuel_stats = fuel_stats.reindex(['Low', 'Moderate', 'High'])
-print(fuel_stats)
-
-# Optional: Calculate correlations
-print("\nCorrelation between Trip Duration and Fuel Consumption:")
-print(df[['trip_duration', 'fuel_used_l', 'distance_km', 'fuel_efficiency_l_per_100km']].corr().round(3))
 
-plt.show()
\ No newline at end of file
+def plot_fuel_distribution(df, weights=None):
+    """
+    Histogram (with KDE) of fuel used per trip; weights names a column of
+    per-row counts when df is already binned
+    """
+    # Create a figure with multiple subplots
+    fig, axes = plt.subplots(figsize=(7, 5))
+
+    # 1. Trip Duration Distribution - Histogram
+    # 2. Fuel Consumption Distribution - Histogram
+    sns.histplot(data=df, x='fuel_used_l', weights=weights,
+                 bins=10, kde=True, palette=color_mapping,
+                 ax=axes)
+    axes.set_title('Distribution of Fuel Consumption')
+    axes.set_xlabel('Fuel Used (liters)')
+    axes.set_ylabel('Frequency')
+    return fig
+
+
+if __name__ == "__main__":
+    # Histogram, summaries and correlations all come from one streaming pass
+    # (quantiles and histogram bins are sketched), so the CSV is read once
+    columns = ['trip_duration', 'fuel_used_l', 'distance_km', 'fuel_efficiency_l_per_100km']
+    summary = compute_correlations(DATA_FILE, columns, cohort_columns=['traffic_label'])
+
+    plot_fuel_distribution(summary[OVERALL].histogram('fuel_used_l'), weights='count')
+
+    print("\nSummary Statistics for Fuel Consumption (liters):")
+    fuel_stats = pd.DataFrame({
+        label: summary[f'traffic_label={label}'].describe()['fuel_used_l']
+        for label in ['Low', 'Moderate', 'High']
+        if f'traffic_label={label}' in summary.stats
+    }).T.round(2)
+    fuel_stats.index.name = 'traffic_label'
+    print(fuel_stats)
+
+    # Optional: Calculate correlations
+    print("\nCorrelation between Trip Duration and Fuel Consumption:")
+    print(summary[OVERALL].pearson().round(3))
+
+    plt.show()
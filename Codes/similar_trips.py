@@ -0,0 +1,84 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Index for "similar historical trips" lookups. Trips are partitioned by
+# traffic level. Within a level they are sorted by duration with running
+# sums of CO2 and of how many CO2 values are present, so the average over a
+# duration window takes two binary searches and, like Series.mean, skips
+# missing values.
+# A KD-tree over standardized duration/distance/efficiency answers k-nearest
+# queries.
+
+KNN_FEATURES = ['trip_duration', 'distance_km', 'fuel_efficiency_l_per_100km']
+DURATION_WINDOW = 0.2  # +/-20% of the queried duration
+
+
+class SimilarTripIndex:
+    """Built once from a DataFrame or dict of columns, then queried many times"""
+
+    def __init__(self, trips, target='co2_emissions_kg'):
+        traffic = np.asarray(trips['traffic_condition'])
+        duration = np.asarray(trips['trip_duration'], dtype=np.float64)
+        features = np.column_stack([np.asarray(trips[c], dtype=np.float64) for c in KNN_FEATURES])
+        values = np.asarray(trips[target], dtype=np.float64)
+        present = np.isfinite(values)
+        values = np.where(present, values, 0.0)
+
+        # Standardize so one minute, one km and one L/100km aren't weighted alike
+        self.feature_mean = features.mean(axis=0)
+        self.feature_scale = features.std(axis=0)
+        self.feature_scale[self.feature_scale == 0] = 1.0
+        scaled = (features - self.feature_mean) / self.feature_scale
+
+        self.n_trips = len(values)
+        self.levels = {}
+        for level in np.unique(traffic):
+            rows = np.flatnonzero(traffic == level)
+            order = rows[np.argsort(duration[rows], kind='stable')]
+            self.levels[int(level)] = {
+                'rows': rows,
+                'tree': cKDTree(scaled[rows]),
+                'sorted_rows': order,
+                'sorted_duration': duration[order],
+                'cumsum': np.concatenate([[0.0], np.cumsum(values[order])]),
+                'cumcount': np.concatenate([[0], np.cumsum(present[order])]),
+            }
+
+    def duration_window(self, traffic, duration, window=DURATION_WINDOW):
+        """(mean target, count) over trips at this traffic level within +/-window of duration"""
+        level = self.levels.get(int(traffic))
+        if level is None:
+            return float('nan'), 0
+        durations = level['sorted_duration']
+        # Both ends inclusive, like Series.between
+        lo = np.searchsorted(durations, duration * (1 - window), side='left')
+        hi = np.searchsorted(durations, duration * (1 + window), side='right')
+        count = int(hi - lo)
+        present = level['cumcount'][hi] - level['cumcount'][lo]
+        if present == 0:
+            return float('nan'), count
+        return float((level['cumsum'][hi] - level['cumsum'][lo]) / present), count
+
+    def nearest(self, traffic, duration, distance, efficiency, k=5):
+        """Row positions and distances of the k most similar trips at this traffic level"""
+        level = self.levels.get(int(traffic))
+        if level is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        point = (np.array([duration, distance, efficiency]) - self.feature_mean) / self.feature_scale
+        k = min(k, len(level['rows']))
+        distances, positions = level['tree'].query(point, k=k)
+        positions = np.atleast_1d(positions)
+        return level['rows'][positions], np.atleast_1d(distances)
+
+    def query(self, traffic, duration, distance=None, efficiency=None, k=5):
+        """
+        Comparison average over the duration window plus (when distance and
+        efficiency are given) the row positions of the k nearest trips.
+        """
+        average, count = self.duration_window(traffic, duration)
+        result = {'comparison_avg': average, 'comparison_count': count}
+        if distance is not None and efficiency is not None:
+            rows, distances = self.nearest(traffic, duration, distance, efficiency, k)
+            result['nearest_rows'] = rows
+            result['nearest_distances'] = distances
+        return result
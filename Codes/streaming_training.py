@@ -0,0 +1,209 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+import profiling
+from carbon_model import FEATURES, CarbonFootprintNN, save_checkpoint
+from commute_loader import DATA_FILE, DEFAULT_CHUNK_SIZE, csv_layout, csv_ranges, iter_range_chunks
+from incremental_training import merge_moments
+
+# Out-of-core training. Rows are streamed from the CSV (split into byte
+# ranges aligned to line ends) or from the memory-mapped trip store (split
+# into row ranges). Ranges are shared out between DataLoader workers and
+# reshuffled every epoch. Each worker scales rows with precomputed global
+# statistics and shuffles them within a bounded buffer before emitting
+# mini-batches. Memory per worker is about one chunk plus the shuffle
+# buffer, however large the data grows.
+
+TARGET = 'co2_emissions_kg'
+MODEL_FILE = '../commute_carbon_streamed_model.pt'
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_SHUFFLE_BUFFER = 100_000
+PARTS_PER_WORKER = 4
+
+
+def _is_store(source):
+    return os.path.isdir(source)
+
+
+def _store_ranges(store_dir, n_parts):
+    import trip_store
+    n_rows = trip_store.read_meta(store_dir)['n_rows']
+    edges = np.linspace(0, n_rows, n_parts + 1).astype(np.int64)
+    return [(a, b) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+def iter_source_chunks(source, ranges=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield (X, y) float32 arrays from a CSV path or trip-store directory.
+    ranges restricts reading to byte ranges (CSV) or row ranges (store).
+    """
+    if _is_store(source):
+        import trip_store
+        arrays = trip_store.load_columns(FEATURES + [TARGET], source)
+        for start, stop in ranges or _store_ranges(source, 1):
+            for a in range(start, stop, chunk_size):
+                b = min(a + chunk_size, stop)
+                X = np.column_stack([arrays[name][a:b] for name in FEATURES]).astype(np.float32)
+                yield X, np.asarray(arrays[TARGET][a:b], dtype=np.float32)
+    else:
+        names, start, end = csv_layout(source)
+        for a, b in ranges or [(start, end)]:
+            for chunk in iter_range_chunks(source, a, b, names, chunksize=chunk_size,
+                                           usecols=FEATURES + [TARGET], derived=False):
+                yield chunk[FEATURES].to_numpy(dtype=np.float32), chunk[TARGET].to_numpy(dtype=np.float32)
+
+
+def scaler_stats(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """(mean, scale, row count) of FEATURES over the whole source in one streaming pass"""
+    count, mean, m2 = 0, np.zeros(len(FEATURES)), np.zeros(len(FEATURES))
+    for X, _ in iter_source_chunks(source, chunk_size=chunk_size):
+        count, mean, m2 = merge_moments(count, mean, m2, X)
+    if count == 0:
+        raise ValueError(f"No rows in {source}")
+    scale = np.sqrt(m2 / count)
+    scale[scale == 0] = 1.0
+    return mean, scale, count
+
+
+class TripStream(IterableDataset):
+    """
+    Scaled, buffer-shuffled mini-batches of (X, y) tensors. Use with
+    DataLoader(batch_size=None); call set_epoch() before each epoch.
+    """
+
+    def __init__(self, source, mean, scale, batch_size=DEFAULT_BATCH_SIZE, chunk_size=DEFAULT_CHUNK_SIZE,
+                 shuffle_buffer=DEFAULT_SHUFFLE_BUFFER, seed=0):
+        super().__init__()
+        self.source = source
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def _worker_ranges(self):
+        info = get_worker_info()
+        worker_id, num_workers = (0, 1) if info is None else (info.id, info.num_workers)
+        n_parts = num_workers * PARTS_PER_WORKER
+        if _is_store(self.source):
+            ranges = _store_ranges(self.source, n_parts)
+        else:
+            ranges = csv_ranges(self.source, n_parts)[1]
+        order = np.random.default_rng([self.seed, self.epoch]).permutation(len(ranges))
+        return [ranges[i] for i in order[worker_id::num_workers]], worker_id
+
+    def _batches(self, X, y):
+        for start in range(0, len(X), self.batch_size):
+            yield torch.from_numpy(X[start:start + self.batch_size]), \
+                torch.from_numpy(y[start:start + self.batch_size]).reshape(-1, 1)
+
+    def __iter__(self):
+        ranges, worker_id = self._worker_ranges()
+        rng = np.random.default_rng([self.seed, self.epoch, worker_id])
+        buffer_X = np.empty((0, len(FEATURES)), dtype=np.float32)
+        buffer_y = np.empty(0, dtype=np.float32)
+
+        for X, y in iter_source_chunks(self.source, ranges, self.chunk_size):
+            X -= self.mean
+            X /= self.scale
+            buffer_X = np.concatenate([buffer_X, X])
+            buffer_y = np.concatenate([buffer_y, y])
+            # Once the buffer overflows, emit a random selection of whole
+            # batches and keep the rest for mixing with later chunks
+            n_emit = (len(buffer_X) - self.shuffle_buffer) // self.batch_size * self.batch_size
+            if n_emit > 0:
+                order = rng.permutation(len(buffer_X))
+                emit, keep = order[:n_emit], order[n_emit:]
+                yield from self._batches(buffer_X[emit], buffer_y[emit])
+                buffer_X, buffer_y = buffer_X[keep], buffer_y[keep]
+
+        order = rng.permutation(len(buffer_X))
+        yield from self._batches(buffer_X[order], buffer_y[order])
+
+
+def train_streaming(model, dataset, num_epochs=5, lr=0.001, weight_decay=1e-5, num_workers=2,
+                    prefetch_factor=4, log_every=1):
+    """Train model from a TripStream; returns a history dict like trainer.train_model"""
+    criterion = nn.MSELoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr, weight_decay=weight_decay)
+    loader_args = {'num_workers': num_workers, 'batch_size': None}
+    if num_workers > 0:
+        loader_args['prefetch_factor'] = prefetch_factor
+    loader = DataLoader(dataset, **loader_args)
+
+    train_losses = []
+    rows = 0
+    start_time = time.perf_counter()
+    for epoch in range(num_epochs):
+        dataset.set_epoch(epoch)
+        model.train()
+        epoch_loss = torch.zeros((), dtype=torch.float64)
+        epoch_rows = 0
+        for X, y in profiling.iterate('dataloader', loader):
+            with profiling.span('forward'):
+                loss = criterion(model(X), y)
+            with profiling.span('backward'):
+                optimizer.zero_grad(set_to_none=True)
+                loss.backward()
+                optimizer.step()
+            epoch_loss += loss.detach() * len(X)
+            epoch_rows += len(X)
+        train_losses.append((epoch_loss / max(epoch_rows, 1)).item())
+        rows += epoch_rows
+        if log_every and (epoch + 1) % log_every == 0:
+            print(f"Epoch {epoch + 1}/{num_epochs}, Train Loss: {train_losses[-1]:.4f} ({epoch_rows:,} rows)")
+
+    wall_time = time.perf_counter() - start_time
+    model.eval()
+    return {
+        'train_losses': train_losses,
+        'epochs_run': num_epochs,
+        'rows_seen': rows,
+        'wall_time': wall_time,
+        'rows_per_sec': rows / wall_time if wall_time > 0 else float('inf'),
+        'optimizer_state': optimizer.state_dict(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train CarbonFootprintNN by streaming a CSV or trip store")
+    parser.add_argument('--source', default=DATA_FILE, help="CSV file or trip_store directory")
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--lr', type=float, default=0.001)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--prefetch', type=int, default=4, help="Batches prefetched per worker")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--shuffle-buffer', type=int, default=DEFAULT_SHUFFLE_BUFFER)
+    parser.add_argument('--output', default=MODEL_FILE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    mean, scale, count = scaler_stats(args.source, args.chunk_size)
+    print(f"Scaler statistics over {count:,} trips in {time.perf_counter() - start:.2f}s")
+
+    torch.manual_seed(42)
+    model = CarbonFootprintNN(len(FEATURES))
+    dataset = TripStream(args.source, mean, scale, args.batch_size, args.chunk_size, args.shuffle_buffer)
+    history = train_streaming(model, dataset, args.epochs, args.lr, num_workers=args.workers,
+                              prefetch_factor=args.prefetch)
+    print(f"Trained {history['epochs_run']} epochs in {history['wall_time']:.2f}s "
+          f"({history['rows_per_sec']:,.0f} rows/sec)")
+
+    save_checkpoint(args.output, model, mean, scale, FEATURES, optimizer_state_dict=history['optimizer_state'])
+    print(f"Model saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from commute_loader import DAYS, DIRECTIONS
+
+# Synthetic commute trips in the commute_data.csv schema, for exercising the
+# pipeline at volumes the real 33-row file can't. Distributions are fitted
+# to the recorded trips:
+#   - traffic level drives duration and fuel efficiency
+#   - fuel_used = distance * efficiency / 100
+#   - co2 = fuel_used * 2.31 (gasoline)
+#   - departures home->campus run earlier than campus->home
+#   - dates fall on their weekday
+# Large volumes are produced chunk by chunk, so memory stays bounded.
+
+COLUMNS = ['date', 'departure_time', 'trip_direction', 'trip_duration', 'distance_km',
+           'fuel_efficiency_l_per_100km', 'fuel_used_l', 'traffic_condition', 'day_of_week',
+           'co2_emissions_kg']
+EMISSION_FACTOR = 2.31
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+TRAFFIC_PROBS = [0.15, 0.5, 0.35]
+# Per traffic level (0, 1, 2): (mean, std)
+DURATION = [(37.0, 5.0), (47.0, 7.0), (70.0, 16.0)]
+EFFICIENCY = [(3.66, 0.42), (4.38, 0.45), (4.48, 0.69)]
+DISTANCE = (39.6, 1.2)
+# Per direction (DIRECTIONS order): departure hour (mean, std)
+DEPARTURE_HOUR = [(15.4, 3.2), (17.0, 3.6)]
+WEEKDAY_PROBS = [0.1, 0.35, 0.1, 0.35, 0.1]  # Monday..Friday
+FIRST_MONDAY = np.datetime64('2025-03-03')
+N_WEEKS = 52
+
+
+def generate_columns(n, rng):
+    """Dict of numpy arrays for n trips; dates/times stay numeric (days, minutes)"""
+    traffic = rng.choice(3, n, p=TRAFFIC_PROBS).astype(np.int8)
+    duration_mean, duration_std = np.array(DURATION).T
+    efficiency_mean, efficiency_std = np.array(EFFICIENCY).T
+
+    duration = rng.normal(duration_mean[traffic], duration_std[traffic])
+    duration = np.clip(duration, 10, None).round().astype(np.int32)
+    efficiency = rng.normal(efficiency_mean[traffic], efficiency_std[traffic])
+    efficiency = np.clip(efficiency, 2.5, 7.0).round(1)
+    distance = np.clip(rng.normal(*DISTANCE, n), 33.0, 42.0).round(1)
+    fuel_used = distance * efficiency / 100
+
+    direction = rng.integers(0, 2, n, dtype=np.int8)
+    hour_mean, hour_std = np.array(DEPARTURE_HOUR).T
+    hours = np.clip(rng.normal(hour_mean[direction], hour_std[direction]), 6, 23).astype(np.int16)
+    minutes = hours * 60 + rng.integers(0, 60, n, dtype=np.int16)
+
+    weekday = rng.choice(5, n, p=WEEKDAY_PROBS).astype(np.int8)
+    dates = FIRST_MONDAY + (rng.integers(0, N_WEEKS, n) * 7 + weekday).astype('timedelta64[D]')
+
+    return {
+        'date': dates,
+        'departure_minute': minutes,
+        'trip_direction': direction,
+        'trip_duration': duration,
+        'distance_km': distance,
+        'fuel_efficiency_l_per_100km': efficiency,
+        'fuel_used_l': fuel_used,
+        'traffic_condition': traffic,
+        'day_of_week': weekday,
+        'co2_emissions_kg': fuel_used * EMISSION_FACTOR,
+    }
+
+
+def _clock_strings(minutes):
+    # 'HH:MM' for every minute of the day, indexed rather than formatted per row
+    clock = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)], dtype=object)
+    return clock[minutes]
+
+
+def to_frame(columns):
+    """DataFrame in the CSV schema (string dates/times/labels) from generate_columns output"""
+    return pd.DataFrame({
+        'date': np.datetime_as_string(columns['date'], unit='D'),
+        'departure_time': _clock_strings(columns['departure_minute']),
+        'trip_direction': pd.Categorical.from_codes(columns['trip_direction'], categories=DIRECTIONS),
+        'trip_duration': columns['trip_duration'],
+        'distance_km': columns['distance_km'],
+        'fuel_efficiency_l_per_100km': columns['fuel_efficiency_l_per_100km'],
+        'fuel_used_l': columns['fuel_used_l'],
+        'traffic_condition': columns['traffic_condition'],
+        'day_of_week': pd.Categorical.from_codes(columns['day_of_week'], categories=DAYS[:5]),
+        'co2_emissions_kg': columns['co2_emissions_kg'],
+    }, columns=COLUMNS)
+
+
+def iter_frames(n, chunk_size=DEFAULT_CHUNK_SIZE, seed=0):
+    """
+    Yield CSV-schema DataFrames totalling n trips; each chunk has its own
+    seeded stream. n == 0 yields one empty frame, so the schema survives.
+    """
+    if n == 0:
+        yield to_frame(generate_columns(0, np.random.default_rng(seed)))
+        return
+    chunk_seeds = np.random.SeedSequence(seed).spawn((n + chunk_size - 1) // chunk_size)
+    for start, chunk_seed in zip(range(0, n, chunk_size), chunk_seeds):
+        rng = np.random.default_rng(chunk_seed)
+        yield to_frame(generate_columns(min(chunk_size, n - start), rng))
+
+
+def generate_trips(n, seed=0):
+    """n synthetic trips as one DataFrame (for sizes that fit in memory)"""
+    frames = list(iter_frames(n, seed=seed))
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def write_csv(path, n, chunk_size=DEFAULT_CHUNK_SIZE, seed=0):
+    """Write n synthetic trips to path in the commute_data.csv format"""
+    with open(path, 'w', newline='') as f:
+        for i, frame in enumerate(iter_frames(n, chunk_size, seed)):
+            frame.to_csv(f, header=(i == 0), index=False, float_format='%.6g')
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic commute trips in the commute_data.csv format")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+    write_csv(args.output, args.rows, args.chunk_size, args.seed)
+    print(f"Wrote {args.rows:,} synthetic trips to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+import profiling
+
+
+def evaluate_loss(model, X, y, batch_size=65536):
+    """Mean squared error of model on (X, y), scored in large chunks"""
+    model.eval()
+    total = torch.zeros((), dtype=torch.float64)
+    with profiling.span('evaluate'), torch.no_grad():
+        for start in range(0, len(X), batch_size):
+            outputs = model(X[start:start + batch_size])
+            total += ((outputs - y[start:start + batch_size]) ** 2).sum(dtype=torch.float64)
+    return (total / max(len(X), 1)).item()
+
+
+def train_model(model, X_train, y_train, X_test, y_test,
+                num_epochs=500, batch_size=None, lr=0.001, weight_decay=1e-5,
+                patience=None, min_delta=0.0, num_threads=None, seed=42,
+                log_every=None, optimizer_state=None):
+    """
+    Train model on already-scaled tensors and return a history dict.
+
+    batch_size=None trains full-batch. Mini-batches are contiguous slices of a
+    tensor reshuffled once per epoch, so no DataLoader is involved. Losses are
+    summed on-device and read back once per epoch. With patience set, training
+    stops after that many epochs without test-loss improvement and the best
+    weights are restored.
+
+    optimizer_state resumes Adam from a saved state_dict (lr and weight_decay
+    still come from the arguments); the final state is returned in the history
+    as 'optimizer_state'.
+    """
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+
+    criterion = nn.MSELoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr, weight_decay=weight_decay)
+    if optimizer_state is not None:
+        optimizer.load_state_dict(optimizer_state)
+        for group in optimizer.param_groups:
+            group['lr'] = lr
+            group['weight_decay'] = weight_decay
+    generator = torch.Generator().manual_seed(seed)
+
+    n_train = len(X_train)
+    batch_size = n_train if batch_size is None else min(batch_size, n_train)
+    n_batches = (n_train + batch_size - 1) // batch_size
+
+    train_losses = []
+    test_losses = []
+    best_loss = float('inf')
+    best_epoch = 0
+    best_state = None
+    epochs_without_improvement = 0
+
+    start_time = time.perf_counter()
+    for epoch in range(num_epochs):
+        model.train()
+        if n_batches > 1:
+            order = torch.randperm(n_train, generator=generator)
+            X_epoch, y_epoch = X_train[order], y_train[order]
+        else:
+            X_epoch, y_epoch = X_train, y_train
+
+        epoch_loss = torch.zeros(())
+        for start in range(0, n_train, batch_size):
+            with profiling.span('forward'):
+                outputs = model(X_epoch[start:start + batch_size])
+                loss = criterion(outputs, y_epoch[start:start + batch_size])
+
+            with profiling.span('backward'):
+                optimizer.zero_grad(set_to_none=True)
+                loss.backward()
+                optimizer.step()
+
+            epoch_loss += loss.detach()
+
+        train_loss = (epoch_loss / n_batches).item()
+        test_loss = evaluate_loss(model, X_test, y_test)
+        train_losses.append(train_loss)
+        test_losses.append(test_loss)
+
+        if log_every and (epoch + 1) % log_every == 0:
+            print(f"Epoch {epoch+1}/{num_epochs}, Train Loss: {train_loss:.4f}, Test Loss: {test_loss:.4f}")
+
+        if test_loss < best_loss - min_delta:
+            best_loss = test_loss
+            best_epoch = epoch + 1
+            epochs_without_improvement = 0
+            if patience is not None:
+                best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+        else:
+            epochs_without_improvement += 1
+            if patience is not None and epochs_without_improvement >= patience:
+                break
+
+    wall_time = time.perf_counter() - start_time
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    model.eval()
+
+    epochs_run = len(train_losses)
+    return {
+        'train_losses': train_losses,
+        'test_losses': test_losses,
+        'best_epoch': best_epoch,
+        'best_test_loss': best_loss,
+        'epochs_run': epochs_run,
+        'stopped_early': epochs_run < num_epochs,
+        'wall_time': wall_time,
+        'epochs_per_sec': epochs_run / wall_time if wall_time > 0 else float('inf'),
+        'optimizer_state': optimizer.state_dict(),
+    }
+
+
+def regression_metrics(y_true, y_pred):
+    """MSE, RMSE, MAE and R² of predictions against targets"""
+    y_true = np.asarray(y_true, dtype=np.float64).reshape(-1)
+    y_pred = np.asarray(y_pred, dtype=np.float64).reshape(-1)
+    mse = np.mean((y_pred - y_true) ** 2)
+    ss_total = np.sum((y_true - y_true.mean()) ** 2)
+    ss_residual = np.sum((y_true - y_pred) ** 2)
+    return {
+        'mse': float(mse),
+        'rmse': float(np.sqrt(mse)),
+        'mae': float(np.mean(np.abs(y_pred - y_true))),
+        'r2': float(1 - ss_residual / ss_total) if ss_total > 0 else float('nan'),
+    }
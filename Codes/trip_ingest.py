@@ -0,0 +1,162 @@
+import csv
+import io
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, threads are still safe
+    fcntl = None
+
+# Column order of commute_data.csv, as written by dsa_script.py
+FIELDNAMES = [
+    'date', 'departure_time', 'trip_direction', 'trip_duration', 'distance_km',
+    'fuel_efficiency_l_per_100km', 'fuel_used_l', 'traffic_condition',
+    'day_of_week', 'co2_emissions_kg',
+]
+
+DEFAULT_BATCH_SIZE = 1000
+# Rows that fail validation, with the reasons, as written by dsa_script.py
+REJECTED_FILE = '../commute_rejected.csv'
+
+
+def _append(path, fieldnames, text, fsync=False):
+    """Append CSV text under an exclusive flock, writing the header first if the file is empty"""
+    with open(path, 'a', newline='') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            # Check for the header under the lock so only one writer adds it
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                f.write(','.join(fieldnames) + '\n')
+            f.write(text)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class TripWriter:
+    """
+    Buffers trip records and appends them to the CSV in batches.
+
+    Each flush takes an exclusive flock on the data file, writes the header only
+    if the file is still empty, and appends the whole batch with one write, so
+    rows from several processes never interleave. add()/add_many() are safe to
+    call from multiple threads. With flush_interval set, a background thread
+    also flushes partially filled buffers.
+
+    With validate, each batch is checked by trip_validation.TripValidator
+    first; rows that fail are not appended but counted in rows_rejected (and
+    validator.report), and written with their reasons to rejected_path if set.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, flush_interval=None, fsync=False, validate=True,
+                 rejected_path=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.rejected_path = rejected_path
+        self.validator = None
+        if validate:
+            # Imported here: trip_validation needs FIELDNAMES from this module
+            from trip_validation import TripValidator
+            self.validator = TripValidator()
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.rows_written = 0
+        self.rows_rejected = 0
+        self.flush_latencies = []
+        self._started = time.perf_counter()
+
+        self._stop = threading.Event()
+        self._thread = None
+        if flush_interval:
+            self._thread = threading.Thread(target=self._flush_periodically, args=(flush_interval,), daemon=True)
+            self._thread.start()
+
+    def _flush_periodically(self, interval):
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def add(self, record):
+        self.add_many([record])
+
+    def add_many(self, records):
+        rows = [['' if record.get(name) is None else str(record[name]) for name in FIELDNAMES]
+                for record in records]
+        with self._lock:
+            self._rows.extend(rows)
+            full = len(self._rows) >= self.batch_size
+        if full:
+            self.flush()
+
+    def _reject(self, rows):
+        """Split off the rows that fail validation; returns the rows to append"""
+        import pandas as pd
+
+        _, rejected = self.validator.validate(pd.DataFrame(rows, columns=FIELDNAMES), first_line=0)
+        if len(rejected) == 0:
+            return rows
+        self.rows_rejected += len(rejected)
+        if self.rejected_path:
+            _append(self.rejected_path, ['reasons'] + FIELDNAMES,
+                    rejected.drop(columns='line').to_csv(header=False, index=False))
+        bad = set(rejected['line'])
+        return [row for i, row in enumerate(rows) if i not in bad]
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if rows and self.validator is not None:
+                rows = self._reject(rows)
+            if not rows:
+                return 0
+
+            start = time.perf_counter()
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            _append(self.path, FIELDNAMES, buffer.getvalue(), self.fsync)
+
+            self.flush_latencies.append(time.perf_counter() - start)
+            self.rows_written += len(rows)
+            return len(rows)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def stats(self):
+        """Ingest throughput and flush latency percentiles (seconds)"""
+        elapsed = time.perf_counter() - self._started
+        latencies = sorted(self.flush_latencies)
+
+        def percentile(q):
+            if not latencies:
+                return float('nan')
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+        return {
+            'rows_written': self.rows_written,
+            'rows_rejected': self.rows_rejected,
+            'flushes': len(latencies),
+            'rows_per_sec': self.rows_written / elapsed if elapsed > 0 else float('nan'),
+            'flush_p50': percentile(0.50),
+            'flush_p95': percentile(0.95),
+            'flush_max': latencies[-1] if latencies else float('nan'),
+        }
@@ -0,0 +1,155 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from commute_loader import DATA_FILE, DAYS, DIRECTIONS, DEFAULT_CHUNK_SIZE, iter_chunks
+from trip_validation import QUARANTINE_FILE, TripValidator, iter_validated_chunks
+
+# Columnar on-disk copy of commute_data.csv. Each column is a raw little-endian
+# binary file that is opened with np.memmap, so readers only touch the columns
+# they ask for and nothing is parsed or copied on load. meta.json records the
+# dtype of every column, the row count, the category labels and the report of
+# the validation pass that rows go through on their way in.
+
+STORE_DIR = '../commute_data_store'
+META_FILE = 'meta.json'
+
+COLUMNS = {
+    'date': 'datetime64[D]',
+    'departure_minute': 'int16',  # minutes after midnight
+    'departure_hour': 'int8',
+    'trip_direction': 'int8',     # index into DIRECTIONS
+    'trip_duration': 'float32',
+    'distance_km': 'float32',
+    'fuel_efficiency_l_per_100km': 'float32',
+    'fuel_used_l': 'float32',
+    'traffic_condition': 'int8',  # 0/1/2
+    'day_of_week': 'int8',        # index into DAYS
+    'co2_emissions_kg': 'float32',
+}
+
+CATEGORIES = {
+    'trip_direction': DIRECTIONS,
+    'day_of_week': DAYS,
+}
+
+
+def _column_path(store_dir, name):
+    return os.path.join(store_dir, name + '.bin')
+
+
+def read_meta(store_dir=STORE_DIR):
+    with open(os.path.join(store_dir, META_FILE)) as f:
+        return json.load(f)
+
+
+def _write_meta(store_dir, meta):
+    tmp_path = os.path.join(store_dir, META_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(store_dir, META_FILE))
+
+
+def create_store(store_dir=STORE_DIR):
+    """Create an empty store (any existing columns are truncated)"""
+    os.makedirs(store_dir, exist_ok=True)
+    for name in COLUMNS:
+        open(_column_path(store_dir, name), 'wb').close()
+    _write_meta(store_dir, {'n_rows': 0, 'columns': COLUMNS, 'categories': CATEGORIES})
+
+
+def _encode(chunk):
+    """Turn a loader chunk into one compact array per store column"""
+    # A missing or malformed time is stored as -1
+    parts = chunk['departure_time'].str.split(':', n=1)
+    minutes = pd.to_numeric(parts.str[0], errors='coerce') * 60 + pd.to_numeric(parts.str[1], errors='coerce')
+    return {
+        'date': chunk['date'].to_numpy(dtype='datetime64[D]'),
+        'departure_minute': minutes.fillna(-1).to_numpy(dtype='int16'),
+        'departure_hour': chunk['departure_hour'].to_numpy(dtype='int8'),
+        'trip_direction': chunk['trip_direction'].cat.codes.to_numpy(dtype='int8'),
+        'trip_duration': chunk['trip_duration'].to_numpy(dtype='float32'),
+        'distance_km': chunk['distance_km'].to_numpy(dtype='float32'),
+        'fuel_efficiency_l_per_100km': chunk['fuel_efficiency_l_per_100km'].to_numpy(dtype='float32'),
+        'fuel_used_l': chunk['fuel_used_l'].to_numpy(dtype='float32'),
+        'traffic_condition': chunk['traffic_condition'].to_numpy(dtype='int8'),
+        'day_of_week': chunk['day_of_week'].cat.codes.to_numpy(dtype='int8'),
+        'co2_emissions_kg': chunk['co2_emissions_kg'].to_numpy(dtype='float32'),
+    }
+
+
+def append_frame(chunk, store_dir=STORE_DIR):
+    """Append a DataFrame chunk (as produced by commute_loader) to the store"""
+    meta = read_meta(store_dir)
+    arrays = _encode(chunk)
+    for name, dtype in COLUMNS.items():
+        with open(_column_path(store_dir, name), 'r+b') as f:
+            # Drop bytes left by an append that crashed before meta.json was updated
+            f.truncate(meta['n_rows'] * np.dtype(dtype).itemsize)
+            f.seek(0, os.SEEK_END)
+            np.ascontiguousarray(arrays[name], dtype=dtype).tofile(f)
+    # Row count is only bumped after every column is written
+    meta['n_rows'] += len(chunk)
+    _write_meta(store_dir, meta)
+    return meta['n_rows']
+
+
+def convert_csv(csv_path=DATA_FILE, store_dir=STORE_DIR, chunksize=DEFAULT_CHUNK_SIZE, validate=True,
+                quarantine_path=QUARANTINE_FILE):
+    """
+    Convert a commute CSV (the dsa_script.py schema) into a columnar store.
+    With validate, invalid rows are quarantined instead of stored (see
+    trip_validation.py) and the validation report is kept in meta.json.
+    """
+    create_store(store_dir)
+    n_rows = 0
+    if not validate:
+        for chunk in iter_chunks(csv_path, chunksize=chunksize, validate=False):
+            n_rows = append_frame(chunk, store_dir)
+        return n_rows
+
+    validator = TripValidator()
+    for chunk in iter_validated_chunks(csv_path, chunksize, quarantine_path, validator):
+        if len(chunk):
+            n_rows = append_frame(chunk, store_dir)
+    meta = read_meta(store_dir)
+    meta['validation'] = validator.report.to_dict()
+    _write_meta(store_dir, meta)
+    return n_rows
+
+
+def load_columns(columns=None, store_dir=STORE_DIR):
+    """Memory-map the requested columns; returns {name: read-only array}"""
+    meta = read_meta(store_dir)
+    n_rows = meta['n_rows']
+    columns = list(meta['columns']) if columns is None else columns
+    arrays = {}
+    for name in columns:
+        dtype = np.dtype(meta['columns'][name])
+        if n_rows == 0:
+            arrays[name] = np.empty(0, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(_column_path(store_dir, name), dtype=dtype, mode='r', shape=(n_rows,))
+    return arrays
+
+
+def load_frame(columns=None, store_dir=STORE_DIR):
+    """Load columns as a DataFrame with the categorical labels restored"""
+    meta = read_meta(store_dir)
+    arrays = load_columns(columns, store_dir)
+    data = {}
+    for name, values in arrays.items():
+        if name in meta['categories']:
+            data[name] = pd.Categorical.from_codes(values, categories=meta['categories'][name])
+        else:
+            data[name] = values
+    return pd.DataFrame(data)
+
+
+if __name__ == '__main__':
+    rows = convert_csv()
+    validation = read_meta()['validation']
+    print(f"Wrote {rows} trips to {STORE_DIR} ({validation['quarantined']} quarantined to {QUARANTINE_FILE}, "
+          f"{validation['rows_per_sec']:,.0f} rows/sec validated)")
@@ -0,0 +1,266 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from commute_loader import (DATA_FILE, DAYS, DEFAULT_CHUNK_SIZE, DIRECTIONS, UNKNOWN_TRAFFIC, add_derived_features,
+                            normalize_traffic)
+from emissions import DEFAULT_FUEL, EMISSION_FACTORS
+from trip_ingest import FIELDNAMES
+
+# Validation and normalization of raw commute CSV rows, run once at ingest:
+# TripWriter checks every batch before appending it and
+# trip_store.convert_csv checks every row it stores. Every field is read as
+# a string, so a malformed value is caught here and can't abort the load or
+# turn into a silent NaN further down. Each chunk is checked with
+# column-wide operations:
+#   - missing / unparseable values per column
+#   - plausible ranges (RANGES)
+#   - fuel_used_l == distance_km * efficiency / 100
+#   - co2_emissions_kg == fuel_used_l * 2.31
+#   - exact duplicates of a trip already seen
+# validate_csv() / main() write the rows that fail to a quarantine CSV with
+# their line number and reasons.
+# The rest come out in commute_loader's schema: traffic as 0/1/2,
+# categorical direction and weekday, float32 numbers and the derived
+# columns.
+
+QUARANTINE_FILE = '../commute_quarantine.csv'
+
+NUMERIC = ['trip_duration', 'distance_km', 'fuel_efficiency_l_per_100km', 'fuel_used_l', 'co2_emissions_kg']
+# Inclusive plausible range per numeric column
+RANGES = {
+    'trip_duration': (1, 600),                # minutes
+    'distance_km': (0.1, 500),
+    'fuel_efficiency_l_per_100km': (1, 30),
+    'fuel_used_l': (0, 150),
+    'co2_emissions_kg': (0, 400),
+}
+EMISSION_FACTOR = EMISSION_FACTORS[DEFAULT_FUEL]
+# A recorded value matches its identity within ABS_TOLERANCE + REL_TOLERANCE * expected
+ABS_TOLERANCE = 0.01
+REL_TOLERANCE = 0.005
+
+DEPARTURE_PATTERN = r'^(\d{1,2}):(\d{2})$'
+DAY_NAMES = {day.lower(): day for day in DAYS}
+
+
+class ValidationReport:
+    """Row counts, quarantine reasons and throughput of a validation run"""
+
+    def __init__(self):
+        self.rows = 0
+        self.valid = 0
+        self.reasons = {}
+        self.seconds = 0.0
+
+    @property
+    def quarantined(self):
+        return self.rows - self.valid
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds > 0 else float('inf')
+
+    def to_dict(self):
+        return {'rows': self.rows, 'valid': self.valid, 'quarantined': self.quarantined,
+                'reasons': dict(sorted(self.reasons.items())), 'seconds': self.seconds,
+                'rows_per_sec': self.rows_per_sec}
+
+
+def _per_unique(values, parse):
+    """
+    parse (Series -> array) applied once per distinct value and gathered back
+    to every row; dates, clock times and labels repeat heavily
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return np.asarray(parse(pd.Series(uniques, dtype='string')))[codes]
+
+
+def _parse_clock(times):
+    clock = times.str.extract(DEPARTURE_PATTERN).astype('float64')
+    return np.where((clock[0] <= 23) & (clock[1] <= 59), clock[0] * 60 + clock[1], np.nan)
+
+
+def _parse_number(values):
+    try:
+        # Fast path for columns that are all well-formed numbers
+        return values.to_numpy(dtype=object).astype(np.float64)
+    except (TypeError, ValueError):
+        return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def _matches(recorded, expected):
+    return np.abs(recorded - expected) <= ABS_TOLERANCE + REL_TOLERANCE * np.abs(expected)
+
+
+class TripValidator:
+    """
+    Validates raw string chunks; remembers the trips it has passed so
+    duplicates are caught across chunks
+    """
+
+    def __init__(self):
+        self.report = ValidationReport()
+        # Hashes of passed trips as sorted runs of decreasing size; a new run
+        # is merged into the last one while it is at least as long, so each
+        # hash is merged O(log n) times and a lookup searches O(log n) runs
+        self._seen = []
+
+    def _duplicates(self, fields, candidates):
+        hashes = pd.util.hash_pandas_object(fields, index=False).to_numpy()
+        duplicate = np.zeros(len(fields), dtype=bool)
+        duplicate[candidates] = pd.Series(hashes[candidates]).duplicated().to_numpy()
+        for run in self._seen:
+            position = np.minimum(np.searchsorted(run, hashes), len(run) - 1)
+            duplicate |= run[position] == hashes
+        duplicate &= candidates
+
+        run = np.sort(hashes[candidates & ~duplicate])
+        if len(run):
+            while self._seen and len(self._seen[-1]) <= len(run):
+                last = self._seen.pop()
+                run = np.insert(last, np.searchsorted(last, run), run)
+            self._seen.append(run)
+        return duplicate
+
+    def validate(self, raw, first_line=2):
+        """
+        Split a chunk of string columns (FIELDNAMES) into (clean, quarantined).
+        clean follows the commute_loader schema; quarantined holds the raw
+        fields plus 'line' (1-based line number in the CSV) and 'reasons'.
+        """
+        start = time.perf_counter()
+        absent = [name for name in FIELDNAMES if name not in raw]
+        if absent:
+            raise ValueError(f"Trips are missing columns {absent}")
+        raw = raw.reset_index(drop=True)
+        text = {name: raw[name].astype('string').str.strip() for name in FIELDNAMES}
+        checks = []  # (reason, boolean mask of failing rows)
+
+        for name in FIELDNAMES:
+            checks.append((f'missing:{name}', (text[name].isna() | (text[name] == '')).to_numpy()))
+        missing = {reason.split(':', 1)[1]: mask for reason, mask in checks}
+
+        date = _per_unique(text['date'], lambda v: pd.to_datetime(v, format='%Y-%m-%d', errors='coerce'))
+        checks.append(('invalid:date', np.isnat(date) & ~missing['date']))
+
+        minutes = _per_unique(text['departure_time'], _parse_clock)
+        checks.append(('invalid:departure_time', np.isnan(minutes) & ~missing['departure_time']))
+
+        direction = pd.Categorical(text['trip_direction'], categories=DIRECTIONS)
+        checks.append(('invalid:trip_direction', (direction.codes < 0) & ~missing['trip_direction']))
+
+        day = pd.Categorical(_per_unique(text['day_of_week'], lambda v: v.str.lower().map(DAY_NAMES)), categories=DAYS)
+        checks.append(('invalid:day_of_week', (day.codes < 0) & ~missing['day_of_week']))
+
+        traffic = _per_unique(text['traffic_condition'], normalize_traffic)
+        checks.append(('invalid:traffic_condition', (traffic == UNKNOWN_TRAFFIC) & ~missing['traffic_condition']))
+
+        numbers = {}
+        for name in NUMERIC:
+            values = _parse_number(text[name])
+            parsed = np.isfinite(values)
+            low, high = RANGES[name]
+            checks.append((f'invalid:{name}', ~parsed & ~missing[name]))
+            checks.append((f'out_of_range:{name}', parsed & ((values < low) | (values > high))))
+            numbers[name] = values
+
+        # Identities, only where every input parsed (NaN compares as a mismatch otherwise)
+        fuel = numbers['distance_km'] * numbers['fuel_efficiency_l_per_100km'] / 100
+        has_fuel = np.isfinite(fuel) & np.isfinite(numbers['fuel_used_l'])
+        checks.append(('fuel_mismatch', has_fuel & ~_matches(numbers['fuel_used_l'], fuel)))
+        co2 = numbers['fuel_used_l'] * EMISSION_FACTOR
+        has_co2 = np.isfinite(co2) & np.isfinite(numbers['co2_emissions_kg'])
+        checks.append(('co2_mismatch', has_co2 & ~_matches(numbers['co2_emissions_kg'], co2)))
+
+        clean = pd.DataFrame({
+            'date': date,
+            'departure_time': text['departure_time'],
+            'trip_direction': direction,
+            **{name: numbers[name].astype(np.float32) for name in NUMERIC},
+            'traffic_condition': traffic,
+            'day_of_week': day,
+        })[FIELDNAMES]
+
+        failed = np.column_stack([mask for _, mask in checks])
+        ok = ~failed.any(axis=1)
+        # Compared at full precision; float32 would merge trips that differ in the last digits
+        duplicate = self._duplicates(clean.assign(**{name: numbers[name] for name in NUMERIC}), ok)
+        checks.append(('duplicate', duplicate))
+        ok &= ~duplicate
+
+        bad = np.flatnonzero(~ok)
+        quarantined = raw.iloc[bad].copy()
+        if len(bad):
+            failed = np.column_stack([mask[bad] for _, mask in checks])
+            names = np.array([reason for reason, _ in checks])
+            quarantined.insert(0, 'reasons', [';'.join(names[row]) for row in failed])
+            for reason, count in zip(names, failed.sum(axis=0)):
+                if count:
+                    self.report.reasons[str(reason)] = self.report.reasons.get(str(reason), 0) + int(count)
+        else:
+            quarantined.insert(0, 'reasons', pd.Series(dtype='object'))
+        quarantined.insert(0, 'line', bad + first_line)
+
+        clean = add_derived_features(clean[ok].reset_index(drop=True))
+        self.report.rows += len(raw)
+        self.report.valid += len(clean)
+        self.report.seconds += time.perf_counter() - start
+        return clean, quarantined
+
+
+def iter_validated_chunks(path=DATA_FILE, chunksize=DEFAULT_CHUNK_SIZE, quarantine_path=QUARANTINE_FILE,
+                          validator=None):
+    """
+    Yield clean chunks of a commute CSV (commute_loader schema) and write
+    rejected rows to quarantine_path (None to discard them). Pass a
+    TripValidator to read its report afterwards.
+    """
+    validator = TripValidator() if validator is None else validator
+    reader = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize)
+    quarantine = open(quarantine_path, 'w', newline='') if quarantine_path else None
+    try:
+        with reader:
+            line = 2  # first data row, after the header
+            for raw in reader:
+                clean, rejected = validator.validate(raw, first_line=line)
+                line += len(raw)
+                if quarantine is not None and len(rejected):
+                    rejected.to_csv(quarantine, header=quarantine.tell() == 0, index=False)
+                yield clean
+    finally:
+        if quarantine is not None:
+            quarantine.close()
+
+
+def validate_csv(path=DATA_FILE, quarantine_path=QUARANTINE_FILE, chunksize=DEFAULT_CHUNK_SIZE):
+    """Validate a whole CSV without keeping the clean rows; returns the ValidationReport"""
+    validator = TripValidator()
+    for _ in iter_validated_chunks(path, chunksize, quarantine_path, validator):
+        pass
+    return validator.report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate commute trips and quarantine invalid rows")
+    parser.add_argument('--data', default=DATA_FILE)
+    parser.add_argument('--quarantine', default=QUARANTINE_FILE)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = validate_csv(args.data, args.quarantine, args.chunk_size)
+    total = time.perf_counter() - start
+    print(f"{report.rows:,} trips checked in {total:.2f}s ({report.rows / total:,.0f} rows/sec, "
+          f"{report.rows_per_sec:,.0f} rows/sec in checks)")
+    print(f"{report.valid:,} valid, {report.quarantined:,} quarantined")
+    for reason, count in sorted(report.reasons.items(), key=lambda item: -item[1]):
+        print(f"  {reason:<40}{count:>10,}")
+    if report.quarantined:
+        print(f"Quarantined rows written to {args.quarantine}")
+
+
+if __name__ == '__main__':
+    main()